@@ -0,0 +1,188 @@
+"""
+Консоль оператора для обслуживания базы: все массовые операции идут пачками,
+каждая пачка в отдельной короткой транзакции, чтобы не держать блокировку записи.
+
+Запуск:
+    python admin.py requeue-reminders --from 01-06-2025 --to 07-06-2025 [--type 30min]
+    python admin.py deactivate-user 123456789
+    python admin.py cleanup-notifications
+    python admin.py reconcile [--dry-run] [--show 20]
+    python admin.py archive [--days 30]
+    python admin.py analyze | vacuum | checkpoint [--mode TRUNCATE]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+
+from database import Database
+
+
+def meet_date(value):
+    try:
+        return datetime.strptime(value, '%d-%m-%Y')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"дата должна быть в формате ДД-ММ-ГГГГ: {value}")
+
+
+def progress(label, done, total=None):
+    if total:
+        sys.stdout.write(f"\r   {label}: {done}/{total} ({done * 100 // total}%)")
+    else:
+        sys.stdout.write(f"\r   {label}: {done}")
+    sys.stdout.flush()
+
+
+async def run_batches(label, batch, pause):
+    """Повторяет batch(), пока он что-то обрабатывает, и печатает накопленный итог"""
+    total = 0
+    while True:
+        processed = await batch()
+        if not processed:
+            break
+        total += processed
+        progress(label, total)
+        await asyncio.sleep(pause)
+    print(f"\r   {label}: {total}" + " " * 10)
+    return total
+
+
+async def run_id_ranges(label, bounds, batch_size, batch, pause, counted="исправлено"):
+    """Проходит диапазон id пачками по batch_size и печатает прогресс по id"""
+    first_id, last_id = bounds
+    fixed = 0
+    after_id = first_id - 1 if first_id else 0
+    while after_id < last_id:
+        fixed += await batch(after_id, batch_size)
+        after_id = min(after_id + batch_size, last_id)
+        progress(f"{label} ({counted} {fixed})", after_id - first_id + 1, last_id - first_id + 1)
+        await asyncio.sleep(pause)
+    print()
+    return fixed
+
+
+async def requeue_reminders(db, args):
+    starts_from = args.date_from
+    starts_to = args.date_to + timedelta(days=1)
+    print(f"🔁 Повторная отправка напоминаний для комнат с {starts_from:%d-%m-%Y} по {args.date_to:%d-%m-%Y}")
+    await run_batches(
+        "снято отметок",
+        lambda: db.requeue_notifications(int(starts_from.timestamp()), int(starts_to.timestamp()),
+                                         args.type, args.batch_size),
+        args.pause
+    )
+
+
+async def deactivate_user(db, args):
+    print(f"⏹ Отмена встреч пользователя {args.user_id}")
+    await run_batches("отменено встреч", lambda: db.deactivate_user_meets(args.user_id, args.batch_size), args.pause)
+
+
+async def cleanup_notifications(db, args):
+    print("🧹 Очистка отметок об уведомлениях для прошедших встреч")
+    await run_batches("удалено", lambda: db.cleanup_old_notifications(args.batch_size), args.pause)
+
+
+async def reconcile(db, args):
+    bounds = await db.get_id_bounds()
+    drifted = []
+
+    async def rooms_batch(after_id, batch_size):
+        drift = await db.reconcile_room_counters(after_id, batch_size, args.dry_run)
+        drifted.extend(drift)
+        return len(drift)
+
+    print("🧮 Сверка счетчиков участников комнат" + (" без исправления" if args.dry_run else ""))
+    await run_id_ranges("комнаты", bounds['rooms'], args.batch_size, rooms_batch, args.pause,
+                        "найдено" if args.dry_run else "исправлено")
+    for room_id, counter, actual in drifted[:args.show]:
+        print(f"   комната {room_id}: счетчик {counter}, участников {actual}")
+    if len(drifted) > args.show:
+        print(f"   ... и еще {len(drifted) - args.show}")
+
+    if args.dry_run:
+        return
+    print("🧮 Сверка статистики встреч")
+    await run_id_ranges("встречи", bounds['meets'], args.batch_size, db.reconcile_meet_stats, args.pause)
+
+
+async def archive(db, args):
+    print(f"🗄 Перенос в архив встреч старше {args.days} дней и отмененных ({db.archive_path})")
+    await run_batches("перенесено встреч", lambda: db.archive_meets(args.days, args.batch_size), args.pause)
+
+
+async def analyze(db, args):
+    print("📊 ANALYZE...")
+    print("   ✅ готово" if await db.analyze() else "   ❌ ошибка")
+
+
+async def vacuum(db, args):
+    print("🗜 VACUUM блокирует базу на всё время работы, запускайте его в период низкой нагрузки...")
+    print("   ✅ готово" if await db.vacuum() else "   ❌ ошибка")
+
+
+async def checkpoint(db, args):
+    print(f"💾 wal_checkpoint({args.mode})...")
+    result = await db.wal_checkpoint(args.mode)
+    if result is None:
+        print("   ❌ ошибка")
+        return
+    busy, log_pages, checkpointed = result
+    print(f"   страниц в WAL: {log_pages}, перенесено: {checkpointed}" + (", база была занята" if busy else ""))
+
+
+COMMANDS = {
+    "requeue-reminders": requeue_reminders,
+    "deactivate-user": deactivate_user,
+    "cleanup-notifications": cleanup_notifications,
+    "reconcile": reconcile,
+    "archive": archive,
+    "analyze": analyze,
+    "vacuum": vacuum,
+    "checkpoint": checkpoint,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание базы meetsburg")
+    parser.add_argument("--db", default="meetsburg.db", help="путь к базе")
+    parser.add_argument("--batch-size", type=int, default=1000, help="строк в одной транзакции")
+    parser.add_argument("--pause", type=float, default=0.05, help="пауза между пачками, с")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    requeue = subparsers.add_parser("requeue-reminders", help="отправить напоминания повторно")
+    requeue.add_argument("--from", dest="date_from", type=meet_date, required=True, help="дата начала, ДД-ММ-ГГГГ")
+    requeue.add_argument("--to", dest="date_to", type=meet_date, required=True, help="дата окончания включительно, ДД-ММ-ГГГГ")
+    requeue.add_argument("--type", choices=["tomorrow", "30min"], help="только этот тип напоминаний")
+
+    deactivate = subparsers.add_parser("deactivate-user", help="отменить все встречи пользователя")
+    deactivate.add_argument("user_id", type=int)
+
+    subparsers.add_parser("cleanup-notifications", help="удалить отметки об уведомлениях прошедших встреч")
+    reconcile_parser = subparsers.add_parser("reconcile", help="пересчитать счетчики участников и статистику встреч")
+    reconcile_parser.add_argument("--dry-run", action="store_true",
+                                  help="только показать расхождения счетчиков участников, ничего не исправлять")
+    reconcile_parser.add_argument("--show", type=int, default=20, help="сколько расхождений вывести")
+    archive_parser = subparsers.add_parser("archive", help="перенести прошедшие и отмененные встречи в архив")
+    archive_parser.add_argument("--days", type=int, default=30, help="возраст встречи в днях")
+
+    subparsers.add_parser("analyze", help="обновить статистику планировщика запросов")
+    subparsers.add_parser("vacuum", help="пересобрать файл базы")
+
+    wal = subparsers.add_parser("checkpoint", help="перенести WAL в основной файл")
+    wal.add_argument("--mode", default="TRUNCATE", choices=["PASSIVE", "FULL", "RESTART", "TRUNCATE"])
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    db = Database(args.db)
+
+    started = time.perf_counter()
+    asyncio.run(COMMANDS[args.command](db, args))
+    print(f"⏱ Выполнено за {time.perf_counter() - started:.1f} c")
+
+
+if __name__ == "__main__":
+    main()
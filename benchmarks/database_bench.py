@@ -0,0 +1,285 @@
+"""
+Микробенчмарк публичных методов Database на синтетических объёмах данных.
+
+По умолчанию заполняет временную базу: 100k встреч, 1M комнат, 5M участников
+(масштаб меняется через --scale) и пишет результаты в JSON для отслеживания регрессий.
+
+Запуск:
+    python benchmarks/database_bench.py --scale 0.01 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+MEETS = 100_000
+ROOMS_PER_MEET = 10
+PARTICIPANTS_PER_ROOM = 5
+USERS = 200_000
+DAYS_RANGE = 60
+BATCH = 50_000
+# Тяжёлые сканирующие запросы гоняем меньше раз, чтобы прогон укладывался в разумное время
+SLOW_CASES = ("cleanup_old_notifications", "get_tomorrow_rooms", "get_upcoming_rooms", "analyze", "vacuum")
+
+
+def fill_database(db_path, scale, seed):
+    rng = random.Random(seed)
+    meets_count = max(1, int(MEETS * scale))
+    users_count = max(10, int(USERS * scale))
+    today = datetime.now().date()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous=OFF")
+    cursor = conn.cursor()
+
+    meet_dates = [
+        datetime.combine(today + timedelta(days=rng.randint(-DAYS_RANGE, DAYS_RANGE)), datetime.min.time())
+        for _ in range(meets_count)
+    ]
+
+    def meets():
+        for meet_id in range(1, meets_count + 1):
+            date = meet_dates[meet_id - 1]
+            yield (
+                meet_id, rng.randint(1, users_count), f"Встреча {meet_id}", date.strftime('%d-%m-%Y'),
+                f"Описание встречи {meet_id}", "09:00",
+                "secret" if rng.random() < 0.2 else None, rng.random() > 0.05,
+            )
+
+    def rooms():
+        for meet_id in range(1, meets_count + 1):
+            for number in range(1, ROOMS_PER_MEET + 1):
+                start = 9 * 60 + (number - 1) * 20
+                starts_at = meet_dates[meet_id - 1] + timedelta(minutes=start)
+                yield (
+                    (meet_id - 1) * ROOMS_PER_MEET + number, meet_id, number,
+                    f"{start // 60:02d}:{start % 60:02d}", f"{(start + 20) // 60:02d}:{(start + 20) % 60:02d}",
+                    PARTICIPANTS_PER_ROOM + 1, PARTICIPANTS_PER_ROOM,
+                    int(starts_at.timestamp()), int((starts_at + timedelta(minutes=20)).timestamp()),
+                )
+
+    def participants():
+        for room_id in range(1, meets_count * ROOMS_PER_MEET + 1):
+            for _ in range(PARTICIPANTS_PER_ROOM):
+                user_id = rng.randint(1, users_count)
+                yield room_id, user_id, f"User_{user_id}"
+
+    inserts = [
+        ("meets", meets(), '''
+            INSERT INTO meets (id, user_id, title, date, description, start_time, password, is_active)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        '''),
+        ("rooms", rooms(), '''
+            INSERT INTO rooms (id, meet_id, room_number, start_time, end_time, max_participants, current_participants,
+                starts_at, ends_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        '''),
+        ("room_participants", participants(), '''
+            INSERT INTO room_participants (room_id, user_id, user_name) VALUES (?, ?, ?)
+        '''),
+    ]
+
+    counts = {}
+    for table, rows, sql in inserts:
+        started = time.perf_counter()
+        total = 0
+        while True:
+            batch = [row for _, row in zip(range(BATCH), rows)]
+            if not batch:
+                break
+            cursor.executemany(sql, batch)
+            total += len(batch)
+        conn.commit()
+        counts[table] = total
+        print(f"   {table}: {total} строк за {time.perf_counter() - started:.1f} c")
+
+    cursor.execute('''
+        INSERT INTO sent_notifications (room_id, notification_type)
+        SELECT id, 'tomorrow' FROM rooms WHERE id % 7 = 0
+    ''')
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+    return {"meets": meets_count, "users": users_count, **counts}
+
+
+def benchmark_cases(db, sizes, rng):
+    meets = sizes["meets"]
+    rooms = sizes["rooms"]
+    users = sizes["users"]
+    today = datetime.now()
+    schedule = [
+        {"room_number": i + 1, "start_time": "10:00", "end_time": "10:20"}
+        for i in range(ROOMS_PER_MEET)
+    ]
+
+    def any_date():
+        return (today + timedelta(days=rng.randint(-DAYS_RANGE, DAYS_RANGE))).strftime('%d-%m-%Y')
+
+    return {
+        "add_meet_with_rooms": lambda: db.add_meet_with_rooms(
+            rng.randint(1, users), "Бенчмарк", any_date(), "Описание", "10:00", schedule, 3),
+        "add_meet": lambda: db.add_meet(rng.randint(1, users), "Бенчмарк", any_date(), "Описание", "10:00"),
+        "add_rooms": lambda: db.add_rooms(rng.randint(1, meets), schedule[:2], 3),
+        "add_meet_series": lambda: db.add_meet_series(
+            rng.randint(1, users), "Серия", any_date(), "Описание", "10:00", schedule, ROOMS_PER_MEET, 20, 3),
+        "get_series_to_materialize": lambda: db.get_series_to_materialize(today.date().isoformat()),
+        "materialize_series": lambda: db.materialize_series(1, [(any_date(), schedule)], today.date().isoformat()),
+        "stop_meet_series": lambda: db.stop_meet_series(rng.randint(1, 100), 0),
+        "get_user_meets": lambda: db.get_user_meets(rng.randint(1, users)),
+        "get_meet_by_id": lambda: db.get_meet_by_id(rng.randint(1, meets)),
+        "get_meet_access": lambda: db.get_meet_access(rng.randint(1, meets)),
+        "get_meet_rooms": lambda: db.get_meet_rooms(rng.randint(1, meets)),
+        "get_busy_windows": lambda: db.get_busy_windows(rng.randint(1, users)),
+        "join_room": lambda: db.join_room(rng.randint(1, rooms), rng.randint(1, users), "Бенчмарк"),
+        "join_earliest_room": lambda: db.join_earliest_room(rng.randint(1, meets), rng.randint(1, users), "Бенчмарк"),
+        "join_waitlist": lambda: db.join_waitlist(rng.randint(1, rooms), users + rng.randint(1, users), "Бенчмарк"),
+        "get_waitlist_user_ids": lambda: db.get_waitlist_user_ids(rng.randint(1, rooms)),
+        "leave_room": lambda: db.leave_room(rng.randint(1, rooms), rng.randint(1, users)),
+        "archive_meets": lambda: db.archive_meets(DAYS_RANGE // 2, 50),
+        "get_archived_bookings": lambda: db.get_archived_bookings(rng.randint(1, users)),
+        "get_room_participants": lambda: db.get_room_participants(rng.randint(1, rooms)),
+        "delete_meet": lambda: db.delete_meet(rng.randint(1, meets), 0),
+        "get_meet_stats": lambda: db.get_meet_stats(rng.randint(1, meets)),
+        "get_organizer_stats": lambda: db.get_organizer_stats(rng.randint(1, users)),
+        "get_meet_fill_history": lambda: db.get_meet_fill_history(rng.randint(1, meets)),
+        "get_user_bookings": lambda: db.get_user_bookings(rng.randint(1, users), int(time.time())),
+        "is_meet_active": lambda: db.is_meet_active(rng.randint(1, meets)),
+        "search_meets": lambda: db.search_meets(f"встреча {rng.randint(1, meets)}"),
+        "get_meets_by_date": lambda: db.get_meets_by_date(any_date()),
+        "get_room_participant_ids": lambda: db.get_room_participant_ids(rng.randint(1, rooms)),
+        "get_upcoming_meets": lambda: db.get_upcoming_meets(f"{any_date()} 10:00"),
+        "is_notification_sent": lambda: db.is_notification_sent(rng.randint(1, rooms), 'tomorrow'),
+        "mark_notification_sent": lambda: db.mark_notification_sent(rng.randint(1, rooms), '30min'),
+        "get_media_file_id": lambda: db.get_media_file_id(f"hash{rng.randint(1, 100)}"),
+        "save_media_file_id": lambda: db.save_media_file_id(f"hash{rng.randint(1, 100)}", "file_id"),
+        "delete_media_file_id": lambda: db.delete_media_file_id(f"hash{rng.randint(1, 100)}"),
+        "cleanup_old_notifications": lambda: db.cleanup_old_notifications(),
+        "requeue_notifications": lambda: db.requeue_notifications(
+            int(today.timestamp()), int((today + timedelta(days=1)).timestamp()), 'tomorrow', 1000),
+        "deactivate_user_meets": lambda: db.deactivate_user_meets(rng.randint(1, users)),
+        "get_id_bounds": lambda: db.get_id_bounds(),
+        "reconcile_room_counters": lambda: db.reconcile_room_counters(rng.randint(0, rooms), 1000),
+        "reconcile_meet_stats": lambda: db.reconcile_meet_stats(rng.randint(0, meets), 1000),
+        "get_change_cursor": lambda: db.get_change_cursor(),
+        "get_changes": lambda: db.get_changes(rng.randint(0, sizes["room_participants"]), 500),
+        "cleanup_changes": lambda: db.cleanup_changes(24, 5000),
+        "analyze": lambda: db.analyze(),
+        "vacuum": lambda: db.vacuum(),
+        "wal_checkpoint": lambda: db.wal_checkpoint('PASSIVE'),
+        "optimize": lambda: db.optimize(),
+        "incremental_vacuum": lambda: db.incremental_vacuum(100),
+        "get_storage_info": lambda: db.get_storage_info(),
+        "record_maintenance_run": lambda: db.record_maintenance_run("benchmark", 1.0),
+        "acquire_lease": lambda: db.acquire_lease("benchmark", f"holder{rng.randint(1, 3)}", 30),
+        "release_lease": lambda: db.release_lease("benchmark", f"holder{rng.randint(1, 3)}"),
+        "get_rooms_on_date": lambda: db.get_rooms_on_date(any_date()),
+        "get_tomorrow_rooms": lambda: db.get_tomorrow_rooms(),
+        "get_upcoming_rooms": lambda: db.get_upcoming_rooms(30),
+        "get_room_participants_with_creator": lambda: db.get_room_participants_with_creator(rng.randint(1, rooms)),
+    }
+
+
+def public_methods(db):
+    return sorted(
+        name for name in dir(db)
+        if not name.startswith("_") and asyncio.iscoroutinefunction(getattr(db, name))
+    )
+
+
+async def run_benchmarks(db, cases, repeat, slow_repeat):
+    results = {}
+    for name, case in cases.items():
+        iterations = slow_repeat if name in SLOW_CASES else repeat
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            await case()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        results[name] = {
+            "iterations": iterations,
+            "min_ms": round(timings[0], 4),
+            "median_ms": round(statistics.median(timings), 4),
+            "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+            "max_ms": round(timings[-1], 4),
+            "mean_ms": round(statistics.fmean(timings), 4),
+        }
+        print(f"   {name:<36} median {results[name]['median_ms']:>10.3f} мс   p95 {results[name]['p95_ms']:>10.3f} мс")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк методов Database")
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель объёмов (1.0 = 100k встреч / 1M комнат / 5M участников)")
+    parser.add_argument("--repeat", type=int, default=200, help="итераций на метод")
+    parser.add_argument("--slow-repeat", type=int, default=5, help="итераций для сканирующих методов")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", help="путь к уже заполненной базе (без повторного заполнения)")
+    parser.add_argument("--output", default="bench_output.json", help="куда записать результаты в JSON")
+    args = parser.parse_args()
+
+    output = Path(args.output).resolve()
+    existing_db = Path(args.db).resolve() if args.db else None
+
+    # При импорте database создаётся meetsburg.db в текущей директории, поэтому работаем во временной
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from database import Database
+
+        db_path = str(existing_db or Path(workdir) / "bench.db")
+        db = Database(db_path)
+
+        if existing_db:
+            conn = sqlite3.connect(db_path)
+            sizes = {
+                "meets": conn.execute("SELECT COUNT(*) FROM meets").fetchone()[0],
+                "rooms": conn.execute("SELECT COUNT(*) FROM rooms").fetchone()[0],
+                "room_participants": conn.execute("SELECT COUNT(*) FROM room_participants").fetchone()[0],
+                "users": conn.execute("SELECT MAX(user_id) FROM room_participants").fetchone()[0] or 1,
+            }
+            conn.close()
+        else:
+            print(f"🗄 Заполнение базы (scale={args.scale})...")
+            sizes = fill_database(db_path, args.scale, args.seed)
+
+        rng = random.Random(args.seed)
+        cases = benchmark_cases(db, sizes, rng)
+        uncovered = [name for name in public_methods(db) if name not in cases]
+
+        print("⏱ Замеры:")
+        results = asyncio.run(run_benchmarks(db, cases, args.repeat, args.slow_repeat))
+        os.chdir(ROOT)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "scale": args.scale,
+        "dataset": sizes,
+        "results": results,
+        "uncovered_methods": uncovered,
+    }
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if uncovered:
+        print(f"⚠️ Методы без бенчмарка: {', '.join(uncovered)}")
+    print(f"✅ Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Нагрузочный тест бота: прогоняет сценарии пользователей через тот же Dispatcher,
+что и main.py, но с фейковой сессией Bot и временной базой данных.
+
+Запуск:
+    python benchmarks/load_test.py --users 200 --concurrency 50
+    python benchmarks/load_test.py --users 200 --workers 4
+    python benchmarks/load_test.py --users 200 --storage memory
+    python benchmarks/load_test.py --users 200 --duplicates 0.2 --burst
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Message, Update, User
+
+
+class FakeSession(BaseSession):
+    """Сессия, которая ничего не отправляет в Telegram, а записывает исходящие вызовы."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        returning = method.__returning__
+
+        if returning is Message:
+            chat_id = getattr(method, "chat_id", 0)
+            return Message.model_validate(
+                {
+                    "message_id": next(self._message_ids),
+                    "date": datetime.now(),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "text": getattr(method, "text", None) or getattr(method, "caption", None),
+                },
+                context={"bot": bot},
+            )
+        if returning is User:
+            return User(id=0, is_bot=True, first_name="meetsburg", username="meetsburg_bot")
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+    def last_text_for(self, chat_id):
+        for method in reversed(self.calls):
+            if getattr(method, "chat_id", None) == chat_id and getattr(method, "text", None):
+                return method.text
+        return ""
+
+
+class LoadTest:
+    def __init__(self, dp, bot, session, db, supervisor=None, duplicates=0.0, burst=False, seed=1):
+        self.dp = dp
+        self.bot = bot
+        self.session = session
+        self.db = db
+        self.supervisor = supervisor
+        self.update_ids = itertools.count(1)
+        self.step_latencies = defaultdict(list)
+        self.journey_latencies = defaultdict(list)
+        self.db_time = defaultdict(float)
+        self.db_calls = defaultdict(int)
+        self.errors = 0
+        # Доля апдейтов, доставленных повторно, и отправка шагов сценария не дожидаясь ответа на предыдущий
+        self.duplicates = duplicates
+        self.burst = burst
+        self.duplicates_sent = 0
+        self.rng = random.Random(seed)
+
+    def instrument_db(self):
+        for name in dir(self.db):
+            method = getattr(self.db, name)
+            if name.startswith("_") or not asyncio.iscoroutinefunction(method):
+                continue
+            setattr(self.db, name, self._timed(name, method))
+
+    def _timed(self, name, method):
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self.db_time[name] += time.perf_counter() - started
+                self.db_calls[name] += 1
+        return wrapper
+
+    def make_update(self, user_id, text):
+        message = Message.model_validate(
+            {
+                "message_id": next(self.update_ids),
+                "date": datetime.now(),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+                "text": text,
+            },
+            context={"bot": self.bot},
+        )
+        return Update(update_id=next(self.update_ids), message=message)
+
+    async def send(self, journey, user_id, text):
+        started = time.perf_counter()
+        try:
+            update = self.make_update(user_id, text)
+            if self.supervisor:
+                await self.supervisor.feed(update)
+            elif self.rng.random() < self.duplicates:
+                # Повторная доставка того же апдейта, пока первый еще обрабатывается
+                self.duplicates_sent += 1
+                duplicate = asyncio.create_task(self.dp.feed_update(self.bot, update))
+                await self.dp.feed_update(self.bot, update)
+                await duplicate
+            else:
+                await self.dp.feed_update(self.bot, update)
+        except Exception:
+            self.errors += 1
+        self.step_latencies[journey].append(time.perf_counter() - started)
+
+    async def run_journey(self, journey, user_id, steps):
+        started = time.perf_counter()
+        if self.burst:
+            # Задачи создаются по порядку шагов, очередь пользователя в UserLaneMiddleware сохраняет этот порядок
+            await asyncio.gather(*[asyncio.create_task(self.send(journey, user_id, text)) for text in steps])
+        else:
+            for text in steps:
+                await self.send(journey, user_id, text)
+        self.journey_latencies[journey].append(time.perf_counter() - started)
+
+    async def newmeet(self, user_id, rooms_count, max_participants, password):
+        date = (datetime.now() + timedelta(days=1)).strftime('%d-%m-%Y')
+        await self.run_journey("newmeet", user_id, [
+            "/newmeet",
+            f"Встреча {user_id}",
+            date,
+            "10:00",
+            "Нагрузочный тест",
+            str(rooms_count),
+            "10",
+            str(max_participants),
+            "🔐 С паролем",
+            password,
+            "🔂 Один раз",
+            "✅ Да, всё верно",
+        ])
+        match = re.search(r"ID встречи:</b> (\d+)", self.session.last_text_for(user_id))
+        if match:
+            return int(match.group(1))
+
+        # В режиме нескольких процессов исходящие сообщения остаются в обработчиках, берем ID из базы
+        meets = await self.db.get_user_meets(user_id)
+        return meets[0][0] if meets else None
+
+    async def join(self, user_id, meet_id, password, room_number):
+        await self.run_journey("join", user_id, [
+            "/join",
+            str(meet_id),
+            password,
+            f"🏠 Комната {room_number}",
+        ])
+
+    async def my_bookings(self, user_id):
+        await self.run_journey("my_bookings", user_id, ["/my_bookings"])
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def print_report(test, elapsed):
+    total_steps = sum(len(v) for v in test.step_latencies.values())
+    print(f"\n📊 Итого: {total_steps} апдейтов за {elapsed:.2f} c "
+          f"({total_steps / elapsed:.1f} апдейтов/с), ошибок: {test.errors}")
+    if not test.supervisor:
+        print(f"📤 Исходящих вызовов Bot API: {len(test.session.calls)}")
+    if test.duplicates_sent:
+        from middlewares import UpdateDedupMiddleware
+        dedup = next(m for m in test.dp.update.outer_middleware if isinstance(m, UpdateDedupMiddleware))
+        print(f"🔁 Повторных доставок: {test.duplicates_sent}, отброшено middleware: {dedup.dropped}")
+
+    print(f"\n{'Сценарий':<14}{'шт':>7}{'в сек':>9}{'p50, мс':>10}{'p90, мс':>10}{'p99, мс':>10}{'шаг p99, мс':>14}")
+    for journey, latencies in test.journey_latencies.items():
+        steps = test.step_latencies[journey]
+        print(
+            f"{journey:<14}{len(latencies):>7}{len(latencies) / elapsed:>9.1f}"
+            f"{percentile(latencies, 50) * 1000:>10.1f}"
+            f"{percentile(latencies, 90) * 1000:>10.1f}"
+            f"{percentile(latencies, 99) * 1000:>10.1f}"
+            f"{percentile(steps, 99) * 1000:>14.1f}"
+        )
+
+    if test.supervisor:
+        print(f"\n🗄 Время в БД не измеряется в режиме {test.supervisor.workers} процессов")
+        return
+
+    total_db = sum(test.db_time.values())
+    print(f"\n🗄 Время в БД: {total_db:.3f} c ({total_db / elapsed * 100:.1f}% от общего)")
+    for name, spent in sorted(test.db_time.items(), key=lambda item: -item[1]):
+        calls = test.db_calls[name]
+        print(f"   {name:<36}{calls:>7} вызовов {spent * 1000:>10.1f} мс  ({spent / calls * 1000:.3f} мс/вызов)")
+
+
+async def run(args):
+    from main import create_dispatcher
+    from storage import db
+
+    backend = None
+    if args.storage == "memory":
+        from memory_database import InMemoryDatabase
+        backend = InMemoryDatabase()
+
+    session = FakeSession()
+    bot = Bot(token="42:TEST", session=session)
+    dp = create_dispatcher(backend)
+
+    supervisor = None
+    if args.workers > 1:
+        from supervisor import Supervisor
+        supervisor = Supervisor("42:TEST", args.workers, session_factory=FakeSession)
+        supervisor.start()
+        await supervisor.wait_ready()
+
+    test = LoadTest(dp, bot, session, db.backend, supervisor, args.duplicates, args.burst, args.seed)
+    if not supervisor:
+        test.instrument_db()
+
+    rng = random.Random(args.seed)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    organizers = max(1, args.users // 10)
+    password = "secret"
+
+    async def limited(coro):
+        async with semaphore:
+            return await coro
+
+    started = time.perf_counter()
+
+    meet_ids = await asyncio.gather(*[
+        limited(test.newmeet(user_id, args.rooms, args.max_participants, password))
+        for user_id in range(1, organizers + 1)
+    ])
+    meet_ids = [meet_id for meet_id in meet_ids if meet_id]
+    print(f"🗓 Создано встреч: {len(meet_ids)} из {organizers}")
+    if not meet_ids:
+        print("❌ Не удалось создать ни одной встречи")
+        return
+
+    async def participant(user_id):
+        await test.join(user_id, rng.choice(meet_ids), password, rng.randint(1, args.rooms))
+        await test.my_bookings(user_id)
+
+    await asyncio.gather(*[
+        limited(participant(user_id))
+        for user_id in range(organizers + 1, args.users + 1)
+    ])
+
+    print_report(test, time.perf_counter() - started)
+    if supervisor:
+        await supervisor.stop()
+    await bot.session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест Dispatcher на фейковых апдейтах")
+    parser.add_argument("--users", type=int, default=100, help="количество симулируемых пользователей")
+    parser.add_argument("--concurrency", type=int, default=20, help="сколько пользователей действуют одновременно")
+    parser.add_argument("--rooms", type=int, default=10, help="комнат во встрече")
+    parser.add_argument("--max-participants", type=int, default=5, help="мест в комнате")
+    parser.add_argument("--workers", type=int, default=1, help="прогнать апдейты через супервизор с N процессами")
+    parser.add_argument("--storage", choices=["sqlite", "memory"], default="sqlite", help="бэкенд хранилища")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="доля апдейтов, доставленных дважды")
+    parser.add_argument("--burst", action="store_true", help="отправлять шаги сценария, не дожидаясь ответа на предыдущий")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if args.storage == "memory" and args.workers > 1:
+        parser.error("хранилище в памяти не разделяется между процессами, используйте --workers 1")
+    if args.duplicates and args.workers > 1:
+        parser.error("повторная доставка моделируется только в одном процессе, используйте --workers 1")
+
+    # База создаётся в текущей директории при импорте database, поэтому работаем во временной
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        asyncio.run(run(args))
+        os.chdir(ROOT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Шардированное хранилище (sharded_database.py): проверка пересечений и выборок пользователя между шардами
+и сравнение пропускной способности конкурентных записей с одним файлом.
+
+Каждый вариант получает свою временную директорию и одинаковую нагрузку: встречи с комнатами,
+затем параллельные join_room от разных пользователей.
+
+Запуск:
+    python benchmarks/sharded_bench.py --shards 4 --joins 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def day(offset: int):
+    return (datetime.now() + timedelta(days=offset)).strftime('%d-%m-%Y')
+
+
+def rooms(count: int, start_hour: int = 10):
+    return [
+        {'room_number': number, 'start_time': f"{start_hour + (number - 1) // 2:02d}:{(number - 1) % 2 * 30:02d}",
+         'end_time': f"{start_hour + number // 2:02d}:{number % 2 * 30:02d}"}
+        for number in range(1, count + 1)
+    ]
+
+
+async def check_cross_shard(storage):
+    """Пересечения и выборки пользователя должны работать так же, как в одном файле"""
+    failures = []
+
+    def expect(name, condition):
+        print(f"{'✅' if condition else '❌'} {name}")
+        if not condition:
+            failures.append(name)
+
+    first, _ = await storage.add_meet_with_rooms(1, "Первая", day(3), "-", "10:00", rooms(2), 5)
+    second, _ = await storage.add_meet_with_rooms(2, "Вторая", day(3), "-", "10:00", rooms(2), 5)
+    own, _ = await storage.add_meet_with_rooms(10, "Своя", day(4), "-", "10:00", rooms(1), 5)
+    expect("встречи в разных шардах", len({storage.shard_number(meet_id) for meet_id in (first, second, own)}) > 1)
+
+    first_rooms = await storage.get_meet_rooms(first)
+    second_rooms = await storage.get_meet_rooms(second)
+    own_rooms = await storage.get_meet_rooms(own)
+    other, _ = await storage.add_meet_with_rooms(3, "Чужая", day(4), "-", "10:00", rooms(1), 5)
+    other_rooms = await storage.get_meet_rooms(other)
+
+    success, _, _ = await storage.join_room(first_rooms[0][0], 10, "Анна")
+    expect("запись в первом шарде", success)
+    success, message, _ = await storage.join_room(second_rooms[0][0], 10, "Анна")
+    expect("пересечение с записью из другого шарда", not success and "Первая" in message)
+    success, _, _ = await storage.join_room(second_rooms[1][0], 10, "Анна")
+    expect("соседний слот в другом шарде", success)
+    success, message, _ = await storage.join_room(other_rooms[0][0], 10, "Анна")
+    expect("пересечение со своей встречей из другого шарда",
+           storage.shard_number(other) == storage.shard_number(own) or (not success and "Своя" in message))
+
+    bookings = await storage.get_user_bookings(10)
+    expect("записи из всех шардов", {booking[8] for booking in bookings} == {first_rooms[0][0], second_rooms[1][0]})
+    meets = await storage.get_user_meets(10)
+    expect("встречи пользователя", [meet[0] for meet in meets] == [own])
+    expect("встреча по id", (await storage.get_meet_by_id(second))[0] == second)
+    expect("поиск по всем шардам", len(await storage.search_meets("первая")) == 1)
+    expect("встречи по дате", len(await storage.get_meets_by_date(day(3))) == 2)
+
+    # Переведенный из листа ожидания попадает в индекс своего нового шарда
+    small, _ = await storage.add_meet_with_rooms(4, "Маленькая", day(6), "-", "10:00", rooms(1), 1)
+    small_room = (await storage.get_meet_rooms(small))[0][0]
+    await storage.join_room(small_room, 21, "Борис")
+    await storage.join_waitlist(small_room, 20, "Вера")
+    _, _, promoted = await storage.leave_room(small_room, 21)
+    expect("перевод из листа ожидания", promoted and promoted[0] == 20)
+    expect("запись после перевода", small_room in {booking[8] for booking in await storage.get_user_bookings(20)})
+
+    # Кандидат из листа ожидания с пересекающейся записью в другом шарде пропускается
+    busy_meet, _ = await storage.add_meet_with_rooms(5, "Занятая", day(8), "-", "10:00", rooms(1), 1)
+    busy_room = (await storage.get_meet_rooms(busy_meet))[0][0]
+    while True:
+        clash_meet, _ = await storage.add_meet_with_rooms(6, "Пересечение", day(8), "-", "10:00", rooms(1), 5)
+        if storage.shard_number(clash_meet) != storage.shard_number(busy_meet):
+            break
+    clash_room = (await storage.get_meet_rooms(clash_meet))[0][0]
+    await storage.join_room(busy_room, 22, "Глеб")
+    await storage.join_waitlist(busy_room, 23, "Дина")
+    await storage.join_waitlist(busy_room, 24, "Егор")
+    await storage.join_room(clash_room, 23, "Дина")
+    _, _, promoted = await storage.leave_room(busy_room, 22)
+    expect("перевод пропускает пересечение в другом шарде", promoted and promoted[0] == 24)
+
+    # Одновременные записи одного пользователя в пересекающиеся комнаты разных шардов
+    first_meet, _ = await storage.add_meet_with_rooms(7, "Утро", day(9), "-", "10:00", rooms(1), 5)
+    while True:
+        second_meet, _ = await storage.add_meet_with_rooms(8, "Тоже утро", day(9), "-", "10:00", rooms(1), 5)
+        if storage.shard_number(second_meet) != storage.shard_number(first_meet):
+            break
+    morning_rooms = [(await storage.get_meet_rooms(meet_id))[0][0] for meet_id in (first_meet, second_meet)]
+    results = await asyncio.gather(*(storage.join_room(room_id, 25, "Жанна") for room_id in morning_rooms))
+    expect("одновременные записи в разные шарды", [success for success, _, _ in results].count(True) == 1)
+
+    # Индекс пишется до шарда: если он недоступен, встреча не создается вовсе
+    add_user_shard = storage.index.add_user_shard
+
+    async def failing(user_id, shard):
+        return False
+
+    storage.index.add_user_shard = failing
+    meet_id, success = await storage.add_meet_with_rooms(30, "Без индекса", day(7), "-", "10:00", rooms(1), 5)
+    storage.index.add_user_shard = add_user_shard
+    expect("отказ при сбое индекса", not success and not await storage.search_meets("индекса"))
+    return failures
+
+
+async def create_meets(storage, meets: int, rooms_per_meet: int, places: int):
+    room_ids = []
+    for number in range(meets):
+        meet_id, _ = await storage.add_meet_with_rooms(
+            number + 1, f"Встреча {number}", day(5 + number % 20), "Нагрузка", "09:00", rooms(rooms_per_meet, 9), places
+        )
+        room_ids += [room[0] for room in await storage.get_meet_rooms(meet_id)]
+    return room_ids
+
+
+async def join_workload(storage, room_ids, joins: int, concurrency: int, seed: int):
+    rng = random.Random(seed)
+    plan = [(rng.choice(room_ids), 100_000 + number) for number in range(joins)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def join(room_id, user_id):
+        async with semaphore:
+            success, _, _ = await storage.join_room(room_id, user_id, "Бенчмарк")
+            return success
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(join(room_id, user_id) for room_id, user_id in plan))
+    return time.perf_counter() - started, sum(results)
+
+
+def run_variant(workdir: str, shards: int, args):
+    from database import Database, STORAGE_PROFILES
+    from sharded_database import ShardedDatabase
+
+    profile = (args.profile, STORAGE_PROFILES[args.profile])
+    db_path = str(Path(workdir) / f"bench_{shards}.db")
+    if shards == 1:
+        storage = Database(db_path, profile=profile)
+    else:
+        storage = ShardedDatabase(shards, db_path, profile)
+
+    async def run():
+        room_ids = await create_meets(storage, args.meets, args.rooms, args.places)
+        return await join_workload(storage, room_ids, args.joins, args.concurrency, args.seed)
+
+    elapsed, joined = asyncio.run(run())
+    print(f"   шардов {shards}: {args.joins} записей за {elapsed:.2f} c, {args.joins / elapsed:.1f} оп/с, успешно {joined}")
+    return args.joins / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Шардированное хранилище: корректность и пропускная способность записи")
+    parser.add_argument("--shards", type=int, default=4, help="количество шардов")
+    parser.add_argument("--meets", type=int, default=40, help="встреч в нагрузке")
+    parser.add_argument("--rooms", type=int, default=10, help="комнат во встрече")
+    parser.add_argument("--places", type=int, default=50, help="мест в комнате")
+    parser.add_argument("--joins", type=int, default=2000, help="записей в нагрузке")
+    parser.add_argument("--concurrency", type=int, default=64, help="одновременных записей")
+    parser.add_argument("--profile", default="durable", help="профиль хранения из STORAGE_PROFILES")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.shards < 2:
+        parser.error("для сравнения нужно хотя бы 2 шарда")
+
+    # При импорте database создается meetsburg.db в текущей директории, поэтому работаем во временной
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from sharded_database import ShardedDatabase
+
+        print(f"🔀 Проверка между шардами ({args.shards} шарда)")
+        failures = asyncio.run(check_cross_shard(ShardedDatabase(args.shards, str(Path(workdir) / "check.db"))))
+
+        print(f"\n⏱ Конкурентные записи, профиль {args.profile}")
+        single = run_variant(workdir, 1, args)
+        sharded = run_variant(workdir, args.shards, args)
+        os.chdir(ROOT)
+
+    print(f"\n📈 Ускорение: x{sharded / single:.2f}")
+    if sharded < single:
+        print("⚠️ Шарды медленнее одного файла: оставьте \"shards\" выключенным на этом диске")
+    if failures:
+        print(f"❌ Не прошли проверки: {len(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
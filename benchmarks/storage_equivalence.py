@@ -0,0 +1,233 @@
+"""
+Проверка эквивалентности бэкендов хранилища: один и тот же сценарий выполняется на Database (SQLite)
+и InMemoryDatabase, результаты каждого шага сравниваются.
+
+Метки времени (created_at, joined_at, часы истории) заменяются на <ts>, у выборок без заданного
+порядка сравнивается отсортированный список.
+
+Запуск:
+    python benchmarks/storage_equivalence.py
+"""
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+TIMESTAMP = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}(:\d{2})?$')
+
+
+def day(offset: int):
+    return (datetime.now() + timedelta(days=offset)).strftime('%d-%m-%Y')
+
+
+def rooms(*slots):
+    return [
+        {'room_number': number, 'start_time': start_time, 'end_time': end_time}
+        for number, (start_time, end_time) in enumerate(slots, 1)
+    ]
+
+
+def normalize(value):
+    if isinstance(value, str) and TIMESTAMP.match(value):
+        return '<ts>'
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(normalize(item) for item in value)
+    return value
+
+
+def unordered(value):
+    return sorted(normalize(value), key=repr)
+
+
+def change_kinds(value):
+    # Порядок изменений внутри одной пачки архивации SQL не задает, сравниваем без seq
+    changes, _ = value
+    return unordered([change[1:] for change in changes])
+
+
+async def collect(rows):
+    return list(rows)
+
+
+SOON, LATER, PAST = day(3), day(4), day(-40)
+SOON_START = int(datetime.strptime(SOON, '%d-%m-%Y').timestamp())
+
+
+# (шаг, вызов, нормализация): нормализация unordered для выборок, порядок которых SQL не задает
+SCENARIO = [
+    ("meet 1", lambda s: s.add_meet_with_rooms(1, "Python-встреча", SOON, "Обсуждаем asyncio в Café", "10:00",
+                                                rooms(("10:00", "10:30"), ("10:30", "11:00"), ("11:00", "11:30")), 2), None),
+    ("meet 2", lambda s: s.add_meet_with_rooms(2, "Йога утром", SOON, "Ёжики и растяжка", "10:15",
+                                                rooms(("10:15", "10:45")), 1, "secret"), None),
+    ("past meet", lambda s: s.add_meet_with_rooms(1, "Прошедшая", PAST, "Давно", "09:00",
+                                                   rooms(("09:00", "09:30")), 5), None),
+    ("invalid date", lambda s: s.add_meet_with_rooms(3, "Ошибка", "31-02-2030", "-", "09:00",
+                                                      rooms(("09:00", "09:30"))), None),
+    ("add rooms", lambda s: s.add_rooms(1, [{'room_number': 4, 'start_time': "11:30", 'end_time': "12:00"}], 2), None),
+    ("add rooms to missing meet", lambda s: s.add_rooms(999, rooms(("09:00", "09:30"))), None),
+    ("add meet without rooms", lambda s: s.add_meet(4, "Без комнат", LATER, "Пусто", "12:00"), None),
+    ("series", lambda s: s.add_meet_series(3, "Книжный клуб", LATER, "Читаем вместе", "18:00",
+                                           rooms(("18:00", "18:30")), 1, 30, 3), None),
+    ("series to materialize", lambda s: s.get_series_to_materialize("2999-01-01"), None),
+    ("materialize", lambda s: s.materialize_series(1, [(LATER, rooms(("18:00", "18:30"))),
+                                                       (day(11), rooms(("18:00", "18:30")))], "2999-01-01"), None),
+    ("materialize again", lambda s: s.materialize_series(1, [(day(11), rooms(("18:00", "18:30")))], "2999-01-01"), None),
+
+    ("join", lambda s: s.join_room(1, 10, "Анна"), None),
+    ("join second", lambda s: s.join_room(1, 11, "Борис"), None),
+    ("join full room", lambda s: s.join_room(1, 12, "Вера"), None),
+    ("join twice", lambda s: s.join_room(1, 10, "Анна"), None),
+    ("join adjacent slot", lambda s: s.join_room(2, 10, "Анна"), None),
+    ("join overlapping booking", lambda s: s.join_room(4, 10, "Анна"), None),
+    ("join overlapping own meet", lambda s: s.join_room(4, 1, "Организатор"), None),
+    ("join missing room", lambda s: s.join_room(999, 10, "Анна"), None),
+    ("join past meet", lambda s: s.join_room(5, 10, "Анна"), None),
+    ("waitlist", lambda s: s.join_waitlist(1, 12, "Вера"), None),
+    ("waitlist second", lambda s: s.join_waitlist(1, 13, "Глеб"), None),
+    ("waitlist again", lambda s: s.join_waitlist(1, 12, "Вера"), None),
+    ("waitlist booked", lambda s: s.join_waitlist(1, 10, "Анна"), None),
+    ("waitlist free room", lambda s: s.join_waitlist(3, 14, "Дарья"), None),
+    ("waitlist missing room", lambda s: s.join_waitlist(999, 14, "Дарья"), None),
+    ("leave with promotion", lambda s: s.leave_room(1, 11), None),
+    ("leave twice", lambda s: s.leave_room(1, 11), None),
+    ("earliest room", lambda s: s.join_earliest_room(1, 20, "Дина"), None),
+    ("earliest room overlap", lambda s: s.join_earliest_room(2, 10, "Анна"), None),
+    ("earliest room in past meet", lambda s: s.join_earliest_room(3, 20, "Дина"), None),
+
+    ("meet by id", lambda s: s.get_meet_by_id(1), None),
+    ("missing meet by id", lambda s: s.get_meet_by_id(999), None),
+    ("meet rooms", lambda s: s.get_meet_rooms(1), None),
+    ("meet access", lambda s: s.get_meet_access(1), None),
+    ("meet access with password", lambda s: s.get_meet_access(2), None),
+    ("past meet access", lambda s: s.get_meet_access(3), None),
+    ("is meet active", lambda s: s.is_meet_active(1), None),
+    ("is past meet active", lambda s: s.is_meet_active(3), None),
+    ("user meets", lambda s: s.get_user_meets(1), unordered),
+    ("user bookings", lambda s: s.get_user_bookings(10), None),
+    ("upcoming bookings", lambda s: s.get_user_bookings(10, SOON_START + 45 * 60), None),
+    ("room participants", lambda s: s.get_room_participants(1), None),
+    ("room participant ids", lambda s: s.get_room_participant_ids(1), unordered),
+    ("participants with creator", lambda s: s.get_room_participants_with_creator(1), unordered),
+    ("export rows", lambda s: collect(s.iter_meet_export_rows(1)), None),
+    ("meet stats", lambda s: s.get_meet_stats(1), None),
+    ("stats of meet without rooms", lambda s: s.get_meet_stats(4), None),
+    ("organizer stats", lambda s: s.get_organizer_stats(1), unordered),
+    ("fill history", lambda s: s.get_meet_fill_history(1), None),
+    ("search prefix", lambda s: s.search_meets("встр"), None),
+    ("search two words", lambda s: s.search_meets("py обсужд"), None),
+    ("search latin diacritics", lambda s: s.search_meets("cafe"), None),
+    ("search cyrillic yo", lambda s: s.search_meets("ежики"), None),
+    ("search nothing", lambda s: s.search_meets("кванты"), None),
+    ("search past", lambda s: s.search_meets("прошедшая"), None),
+    ("meets by date", lambda s: s.get_meets_by_date(SOON), unordered),
+    ("upcoming meets", lambda s: s.get_upcoming_meets(f"{SOON} 10:00"), None),
+    ("rooms on date", lambda s: s.get_rooms_on_date(SOON), unordered),
+
+    ("mark notification", lambda s: s.mark_notification_sent(1, 'tomorrow'), None),
+    ("notification sent", lambda s: s.is_notification_sent(1, 'tomorrow'), None),
+    ("other notification", lambda s: s.is_notification_sent(1, '30min'), None),
+    ("requeue other type", lambda s: s.requeue_notifications(SOON_START, SOON_START + 86400 * 2, '30min'), None),
+    ("requeue", lambda s: s.requeue_notifications(SOON_START, SOON_START + 86400 * 2, 'tomorrow'), None),
+    ("requeued", lambda s: s.is_notification_sent(1, 'tomorrow'), None),
+    ("mark past notification", lambda s: s.mark_notification_sent(5, '30min'), None),
+    ("mark again", lambda s: s.mark_notification_sent(2, 'tomorrow'), None),
+    ("cleanup notifications", lambda s: s.cleanup_old_notifications(), None),
+    ("past notification cleaned", lambda s: s.is_notification_sent(5, '30min'), None),
+
+    ("media miss", lambda s: s.get_media_file_id("hash"), None),
+    ("media save", lambda s: s.save_media_file_id("hash", "file-1"), None),
+    ("media hit", lambda s: s.get_media_file_id("hash"), None),
+    ("media delete", lambda s: s.delete_media_file_id("hash"), None),
+    ("media deleted", lambda s: s.get_media_file_id("hash"), None),
+    ("lease acquire", lambda s: s.acquire_lease("scheduler", "a", 30), None),
+    ("lease busy", lambda s: s.acquire_lease("scheduler", "b", 30), None),
+    ("lease renew", lambda s: s.acquire_lease("scheduler", "a", 30), None),
+    ("lease release by other", lambda s: s.release_lease("scheduler", "b"), None),
+    ("lease still busy", lambda s: s.acquire_lease("scheduler", "b", 30), None),
+    ("lease release", lambda s: s.release_lease("scheduler", "a"), None),
+    ("lease free", lambda s: s.acquire_lease("scheduler", "b", 30), None),
+    ("lease expired", lambda s: s.acquire_lease("expiring", "a", -1), None),
+    ("lease take expired", lambda s: s.acquire_lease("expiring", "b", 30), None),
+
+    ("join meet to be deleted", lambda s: s.join_room(4, 30, "Ева"), None),
+    ("delete foreign meet", lambda s: s.delete_meet(2, 1), None),
+    ("delete meet", lambda s: s.delete_meet(2, 2), None),
+    ("deleted meet by id", lambda s: s.get_meet_by_id(2), None),
+    ("deleted meet search", lambda s: s.search_meets("йога"), None),
+    ("earliest room of deleted meet", lambda s: s.join_earliest_room(2, 31, "Жора"), None),
+    ("waitlist of deleted meet", lambda s: s.join_waitlist(4, 31, "Жора"), None),
+    ("bookings of deleted meet", lambda s: s.get_user_bookings(30), None),
+    ("stop foreign series", lambda s: s.stop_meet_series(1, 99), None),
+    ("stop series", lambda s: s.stop_meet_series(1, 3), None),
+    ("stopped series", lambda s: s.get_series_to_materialize("2999-12-31"), None),
+    ("deactivate user batch", lambda s: s.deactivate_user_meets(3, 1), None),
+    ("deactivate user rest", lambda s: s.deactivate_user_meets(3, 10), None),
+    ("deactivate user done", lambda s: s.deactivate_user_meets(3, 10), None),
+    ("reconcile rooms dry run", lambda s: s.reconcile_room_counters(0, 3, dry_run=True), None),
+    ("reconcile rooms", lambda s: s.reconcile_room_counters(0, 1000), None),
+    ("id bounds", lambda s: s.get_id_bounds(), None),
+    ("archive", lambda s: s.archive_meets(30), None),
+    ("archive again", lambda s: s.archive_meets(30), None),
+    ("archived bookings", lambda s: s.get_archived_bookings(10), None),
+    ("bookings after archive", lambda s: s.get_user_bookings(10), None),
+    ("id bounds after archive", lambda s: s.get_id_bounds(), None),
+    ("archived meet by id", lambda s: s.get_meet_by_id(3), None),
+
+    ("analyze", lambda s: s.analyze(), None),
+    ("optimize", lambda s: s.optimize(), None),
+    ("incremental vacuum", lambda s: s.incremental_vacuum(10), None),
+    ("record maintenance", lambda s: s.record_maintenance_run('optimize', 1.5), None),
+
+    ("change log", lambda s: s.get_changes(None, 10000), change_kinds),
+    ("change cursor", lambda s: s.get_change_cursor(), None),
+    ("changes after cursor", lambda s: s.get_changes(10**6, 10), None),
+    ("cleanup changes", lambda s: s.cleanup_changes(24), None),
+]
+
+
+async def run_scenario(storage):
+    results = []
+    started = time.perf_counter()
+    for name, call, normalizer in SCENARIO:
+        result = await call(storage)
+        results.append((normalizer or normalize)(result))
+    return results, time.perf_counter() - started
+
+
+def main():
+    # Database создает meetsburg.db в текущей директории при импорте, поэтому работаем во временной
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from database import Database
+        from memory_database import InMemoryDatabase
+
+        sqlite_results, sqlite_time = asyncio.run(run_scenario(Database(str(Path(workdir) / "equivalence.db"))))
+        memory_results, memory_time = asyncio.run(run_scenario(InMemoryDatabase()))
+        os.chdir(ROOT)
+
+    mismatches = 0
+    for (name, _, _), expected, actual in zip(SCENARIO, sqlite_results, memory_results):
+        if expected == actual:
+            print(f"✅ {name}")
+            continue
+        mismatches += 1
+        print(f"❌ {name}\n   sqlite: {expected!r}\n   memory: {actual!r}")
+
+    print(f"\n⏱ sqlite {sqlite_time * 1000:.1f} мс, memory {memory_time * 1000:.1f} мс на {len(SCENARIO)} шагов")
+    if mismatches:
+        print(f"❌ Расхождений: {mismatches}")
+        sys.exit(1)
+    print("✅ Бэкенды эквивалентны")
+
+
+if __name__ == "__main__":
+    main()
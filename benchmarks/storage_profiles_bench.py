@@ -0,0 +1,117 @@
+"""
+Сравнение профилей хранения SQLite (STORAGE_PROFILES в database.py) на двух нагрузках:
+запись в комнаты (join_room/leave_room) и проход планировщика напоминаний.
+
+Для каждого профиля заполняется отдельная временная база того же размера.
+
+Запуск:
+    python benchmarks/storage_profiles_bench.py --scale 0.01 --output profiles.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from database_bench import fill_database
+
+
+async def join_workload(db, sizes, rng, operations):
+    timings = []
+    for _ in range(operations):
+        room_id = rng.randint(1, sizes["rooms"])
+        user_id = sizes["users"] + rng.randint(1, sizes["users"])
+        started = time.perf_counter()
+        await db.join_room(room_id, user_id, "Бенчмарк")
+        await db.leave_room(room_id, user_id)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def reminder_workload(db, sizes, rng, operations):
+    # Один проход планировщика: выборка комнат и проверка/отметка отправки для каждой
+    timings = []
+    for _ in range(operations):
+        started = time.perf_counter()
+        for room in await db.get_tomorrow_rooms() + await db.get_upcoming_rooms(30):
+            if not await db.is_notification_sent(room[0], 'tomorrow'):
+                await db.mark_notification_sent(room[0], 'tomorrow')
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+WORKLOADS = {
+    "join": join_workload,
+    "reminders": reminder_workload,
+}
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    return {
+        "iterations": len(timings),
+        "median_ms": round(statistics.median(timings), 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        "ops_per_s": round(len(timings) / (sum(timings) / 1000), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение профилей хранения SQLite")
+    parser.add_argument("--scale", type=float, default=0.01, help="множитель объёмов как в database_bench.py")
+    parser.add_argument("--join-ops", type=int, default=500, help="пар join/leave на профиль")
+    parser.add_argument("--reminder-ops", type=int, default=5, help="проходов планировщика на профиль")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="profiles_output.json", help="куда записать результаты в JSON")
+    args = parser.parse_args()
+
+    output = Path(args.output).resolve()
+    operations = {"join": args.join_ops, "reminders": args.reminder_ops}
+    results = {}
+
+    # При импорте database создаётся meetsburg.db в текущей директории, поэтому работаем во временной
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from database import Database, STORAGE_PROFILES
+
+        for name, settings in STORAGE_PROFILES.items():
+            db_path = str(Path(workdir) / f"{name}.db")
+            db = Database(db_path, profile=(name, settings))
+
+            print(f"🗄 Профиль {name}: заполнение базы (scale={args.scale})...")
+            sizes = fill_database(db_path, args.scale, args.seed)
+
+            results[name] = {"settings": settings}
+            for workload, run in WORKLOADS.items():
+                rng = random.Random(args.seed)
+                timings = asyncio.run(run(db, sizes, rng, operations[workload]))
+                results[name][workload] = summarize(timings)
+                print(f"   {workload:<10} median {results[name][workload]['median_ms']:>10.3f} мс"
+                      f"   p95 {results[name][workload]['p95_ms']:>10.3f} мс"
+                      f"   {results[name][workload]['ops_per_s']:>8.1f} оп/с")
+
+        os.chdir(ROOT)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "sqlite": sqlite3.sqlite_version,
+        "scale": args.scale,
+        "profiles": results,
+    }
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"✅ Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Подписка на журнал изменений (таблица changes): кэши и фоновые задачи узнают о новых встречах,
+отменах и записях, не перечитывая таблицы целиком.
+
+Изменения пишут триггеры в той же транзакции, что и сами данные, поэтому журнал видит записи
+из всех процессов, работающих с файлом. Процесс опрашивает PRAGMA data_version (дешевая проверка
+без чтения таблиц) и, когда она изменилась, будит подписчиков; каждый читает журнал со своей позиции.
+
+    async for change in change_feed.subscribe({'meet_created', 'meet_cancelled'}):
+        ...
+"""
+import asyncio
+import logging
+from typing import NamedTuple, Optional
+
+from storage import db
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.2
+BATCH_SIZE = 500
+
+
+class Change(NamedTuple):
+    seq: int
+    kind: str  # 'meet_created', 'meet_cancelled', 'meet_archived', 'room_added', 'booking_added', 'booking_removed'
+    meet_id: Optional[int]
+    room_id: Optional[int]
+    user_id: Optional[int]
+    changed_at: str
+
+
+class ChangeFeed:
+    """Один опрос версии данных на процесс, сколько бы ни было подписчиков"""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._changed = None
+        self._poller = None
+
+    def _ensure_poller(self):
+        if self._poller is None or self._poller.done():
+            self._changed = asyncio.Event()
+            self._poller = asyncio.create_task(self._poll())
+
+    async def _poll(self):
+        # Первая проверка всегда будит подписчиков: изменение могло случиться до запуска опроса
+        version = None
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                current = db.get_data_version()
+            except Exception as e:
+                logger.error(f"Ошибка опроса версии данных: {e}")
+                continue
+
+            if current != version:
+                version = current
+                # Каждое изменение будит подписчиков новым событием, ждущие старого просыпаются
+                changed, self._changed = self._changed, asyncio.Event()
+                changed.set()
+
+    async def subscribe(self, kinds: set = None, from_start: bool = False):
+        """Изменения после момента подписки (from_start - с начала журнала), только kinds, если они заданы"""
+        self._ensure_poller()
+        cursor = None if from_start else await db.get_change_cursor()
+        while True:
+            # Событие берем до чтения: изменение, закоммиченное во время чтения, не потеряется
+            changed = self._changed
+            changes, cursor = await db.get_changes(cursor, BATCH_SIZE)
+            for row in changes:
+                change = Change(*row)
+                if kinds is None or change.kind in kinds:
+                    yield change
+
+            if not changes:
+                await changed.wait()
+
+
+change_feed = ChangeFeed()
@@ -1,22 +1,202 @@
 import sqlite3
+import asyncio
+import functools
+import json
 import logging
+import os
+import queue
+import re
+import threading
 import time
 from datetime import datetime
 from datetime import timedelta
 
+from storage import room_epochs, overlap_message
+
 logger = logging.getLogger(__name__)
 
-class Database:
-    def __init__(self, db_path='meetsburg.db'):
+# Даты встреч хранятся как DD-MM-YYYY, для сравнения в SQL переводим их в ISO
+MEET_DATE_ISO = "(substr(m.date, 7, 4) || '-' || substr(m.date, 4, 2) || '-' || substr(m.date, 1, 2))"
+
+# Профили хранения: PRAGMA, которые выставляются один раз при открытии соединения пула.
+# page_size применяется только при создании базы: в режиме WAL его не меняет даже VACUUM
+STORAGE_PROFILES = {
+    # fsync на каждый коммит, небольшой кэш, без mmap
+    'durable': {
+        'synchronous': 'FULL',
+        'cache_size': -8192,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 10000,
+        'page_size': 4096
+    },
+    # В WAL synchronous=NORMAL не портит базу, но при отключении питания могут пропасть последние коммиты
+    'fast': {
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000,
+        'page_size': 8192
+    }
+}
+DEFAULT_STORAGE_PROFILE = 'durable'
+POOL_SIZE = 8
+
+def load_storage_profile(config_path='conf.json'):
+    """Профиль из conf.json: "storage_profile" выбирает имя, "storage_profiles" дополняет или переопределяет встроенные"""
+    profiles = {name: dict(settings) for name, settings in STORAGE_PROFILES.items()}
+    name = DEFAULT_STORAGE_PROFILE
+    
+    try:
+        with open(config_path, 'r', encoding='utf-8') as file:
+            config = json.load(file)
+        for profile_name, settings in config.get('storage_profiles', {}).items():
+            profiles.setdefault(profile_name, dict(STORAGE_PROFILES[DEFAULT_STORAGE_PROFILE])).update(settings)
+        name = config.get('storage_profile', name)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Ошибка чтения профиля хранения из {config_path}: {e}")
+    
+    if name not in profiles:
+        logger.error(f"Неизвестный профиль хранения {name}, используется {DEFAULT_STORAGE_PROFILE}")
+        name = DEFAULT_STORAGE_PROFILE
+    
+    return name, profiles[name]
+
+def profile_pragmas(settings: dict):
+    if settings['synchronous'] not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+        raise ValueError(f"Недопустимое значение synchronous: {settings['synchronous']}")
+    if settings['temp_store'] not in ('DEFAULT', 'FILE', 'MEMORY'):
+        raise ValueError(f"Недопустимое значение temp_store: {settings['temp_store']}")
+    
+    return [
+        f"PRAGMA synchronous={settings['synchronous']}",
+        f"PRAGMA cache_size={int(settings['cache_size'])}",
+        f"PRAGMA mmap_size={int(settings['mmap_size'])}",
+        f"PRAGMA temp_store={settings['temp_store']}",
+        f"PRAGMA busy_timeout={int(settings['busy_timeout'])}"
+    ]
+
+class PooledConnection:
+    """Соединение для чтения из пула: close() откатывает незавершенную транзакцию и возвращает соединение в пул"""
+
+    def __init__(self, conn, pool):
+        self._conn = conn
+        self._pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+class WriterConnection:
+    """Соединение потока записи: close() только откатывает незавершенную транзакцию, само соединение живет с потоком"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+class WriterThread:
+    """Единственный поток записи со своим event loop. Каждый submit - отдельная задача этого loop,
+    поэтому по очереди их держит замок: следующий метод записи начинается, только когда предыдущий завершился"""
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self.loop = None
+        self.connection = None
+        self._lock = None
+
+    def _run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._lock = asyncio.Lock()
+        ready.set()
+        self.loop.run_forever()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread:
+                return
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name="db-writer", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def is_current(self):
+        return self._thread is not None and self._thread is threading.current_thread()
+
+    def get_connection(self):
+        if self.connection is None:
+            self.connection = WriterConnection(self._connect(writer=True))
+        return self.connection
+
+    async def _execute(self, coro):
+        # Без замка задачи чередовались бы на любом await внутри метода: чужой коммит зафиксировал бы
+        # половину транзакции, а откат ниже стер бы ее
+        async with self._lock:
+            try:
+                return await coro
+            finally:
+                # Метод мог упасть посреди транзакции, следующий не должен ее продолжить
+                if self.connection is not None and self.connection.in_transaction:
+                    self.connection.rollback()
+
+    async def submit(self, coro):
+        self.start()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._execute(coro), self.loop))
+
+def writes(method):
+    """Метод записи выполняется в потоке писателя после предыдущего, вызывающий event loop ждет результат, не блокируясь.
+    Метод записи, вызванный из другого метода записи, выполняется сразу, внутри уже взятой очереди"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self.writer.is_current():
+            return await method(self, *args, **kwargs)
+        return await self.writer.submit(method(self, *args, **kwargs))
+    return wrapper
+
+class SQLiteFile:
+    """Файл SQLite с пулом соединений для чтения и собственным потоком записи"""
+
+    def __init__(self, db_path: str, profile=None):
         self.db_path = db_path
-        self.init_db()
+        self.profile_name, self.profile = profile or (DEFAULT_STORAGE_PROFILE, STORAGE_PROFILES[DEFAULT_STORAGE_PROFILE])
+        self.pragmas = profile_pragmas(self.profile)
+        # Чтение идет через пул соединений только для чтения, вся запись - через один поток со своим соединением
+        self.pool = queue.LifoQueue(maxsize=POOL_SIZE)
+        self.writer = WriterThread(self.connect)
 
-    def get_connection_with_retry(self, max_retries=5, delay=0.1):
+    def connect(self, writer: bool = False, max_retries=5, delay=0.1):
         for attempt in range(max_retries):
             try:
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
+                # Соединения для чтения берут и потоки выгрузок, поэтому check_same_thread=False
+                conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=writer)
                 conn.execute("PRAGMA journal_mode=WAL") 
                 conn.execute("PRAGMA foreign_keys=ON")
+                for pragma in self.pragmas:
+                    conn.execute(pragma)
+                if not writer:
+                    conn.execute("PRAGMA query_only=ON")
                 return conn
             except sqlite3.OperationalError as e:
                 if "locked" in str(e) and attempt < max_retries - 1:
@@ -25,9 +205,36 @@ class Database:
                 raise e
         raise sqlite3.OperationalError("Не удается получить доступ к базе данных")
 
+    def get_connection_with_retry(self):
+        if self.writer.is_current():
+            return self.writer.get_connection()
+        
+        try:
+            return PooledConnection(self.pool.get_nowait(), self.pool)
+        except queue.Empty:
+            return PooledConnection(self.connect(), self.pool)
+
+class Database(SQLiteFile):
+    def __init__(self, db_path='meetsburg.db', archive_path=None, profile=None, id_base: int = 0):
+        super().__init__(db_path, profile)
+        # Прошедшие и отмененные встречи переносятся в отдельный файл, чтобы рабочие таблицы оставались маленькими
+        self.archive_path = archive_path or f"{os.path.splitext(db_path)[0]}_archive.db"
+        # Шард нумерует встречи, комнаты и серии начиная с id_base + 1, так по id видно, в каком он файле
+        self.id_base = id_base
+        # Соединение только для PRAGMA data_version: значение сравнимо лишь в пределах одного соединения
+        self._version_conn = None
+        self.init_db()
+
     def init_db(self):
         try:
-            conn = self.get_connection_with_retry()
+            # auto_vacuum и page_size задаются только в новой базе до перехода в WAL, auto_vacuum для старой включит VACUUM
+            conn = sqlite3.connect(self.db_path, timeout=10.0)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute(f"PRAGMA page_size={int(self.profile['page_size'])}")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.close()
+            
+            conn = self.connect(writer=True)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -78,6 +285,109 @@ class Database:
                     UNIQUE(room_id, notification_type)
                 )
             ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS room_waitlist (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    room_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    user_name TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(room_id, user_id),
+                    FOREIGN KEY (room_id) REFERENCES rooms (id) ON DELETE CASCADE
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_room_waitlist_room ON room_waitlist (room_id, id)
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS maintenance_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task TEXT NOT NULL, -- 'optimize', 'checkpoint', 'incremental_vacuum'
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    duration_ms REAL NOT NULL,
+                    details TEXT
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS media_cache (
+                    content_hash TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS meet_series (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    title TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    start_time TEXT NOT NULL,
+                    password TEXT,
+                    rooms_count INTEGER NOT NULL,
+                    room_duration INTEGER NOT NULL,
+                    max_participants INTEGER NOT NULL,
+                    frequency TEXT NOT NULL DEFAULT 'weekly', -- 'daily' или 'weekly'
+                    interval INTEGER NOT NULL DEFAULT 1,
+                    starts_on TEXT NOT NULL, -- YYYY-MM-DD
+                    until TEXT, -- YYYY-MM-DD, NULL - без окончания
+                    materialized_until TEXT NOT NULL, -- последняя дата, до которой созданы встречи
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    is_active BOOLEAN DEFAULT TRUE
+                )
+            ''')
+
+            self._ensure_column(cursor, 'meets', 'series_id', 'INTEGER REFERENCES meet_series (id)')
+
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_meets_series_date ON meets (series_id, date)
+                WHERE series_id IS NOT NULL
+            ''')
+
+            self._ensure_column(cursor, 'rooms', 'starts_at', 'INTEGER')
+            self._ensure_column(cursor, 'rooms', 'ends_at', 'INTEGER')
+            self._backfill_room_epochs(cursor)
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_room_participants_user ON room_participants (user_id, room_id)
+            ''')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_room_participants_room ON room_participants (room_id, joined_at)
+            ''')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_rooms_meet ON rooms (meet_id, starts_at)
+            ''')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_meets_user ON meets (user_id, is_active)
+            ''')
+
+            # В индекс попадают только комнаты со свободными местами, заполненные из него выпадают сами
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_rooms_free ON rooms (meet_id, starts_at)
+                WHERE current_participants < max_participants AND is_active = TRUE
+            ''')
+
+            self._init_search(cursor)
+            self._init_stats(cursor)
+            self._init_bookings(cursor)
+            self._init_changes(cursor)
+            if self.id_base:
+                self._reserve_id_range(cursor)
             
             conn.commit()
             conn.close()
@@ -86,6 +396,435 @@ class Database:
         except Exception as e:
             logger.error(f"Ошибка инициализации БД: {e}")
 
+    def _reserve_id_range(self, cursor):
+        for table in ('meets', 'rooms', 'meet_series', 'changes'):
+            cursor.execute('''
+                INSERT INTO sqlite_sequence (name, seq)
+                SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)
+            ''', (table, self.id_base, table))
+            cursor.execute('''
+                UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq < ?
+            ''', (self.id_base, table, self.id_base))
+
+    def _ensure_column(self, cursor, table: str, column: str, definition: str):
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            logger.info(f"Добавлена колонка {table}.{column}")
+
+    def _backfill_room_epochs(self, cursor):
+        cursor.execute('''
+            SELECT r.id, m.date, m.start_time, r.start_time, r.end_time
+            FROM rooms r
+            JOIN meets m ON m.id = r.meet_id
+            WHERE r.starts_at IS NULL
+        ''')
+        
+        updates = []
+        for room_id, date, meet_start_time, start_time, end_time in cursor.fetchall():
+            try:
+                updates.append((*room_epochs(date, meet_start_time, start_time, end_time), room_id))
+            except ValueError as e:
+                logger.error(f"Ошибка расчета времени комнаты {room_id}: {e}")
+        
+        if updates:
+            cursor.executemany("UPDATE rooms SET starts_at = ?, ends_at = ? WHERE id = ?", updates)
+            logger.info(f"Рассчитано время начала и окончания для {len(updates)} комнат")
+
+    def _init_search(self, cursor):
+        # Полнотекстовый индекс содержит только активные встречи, триггеры держат его в синхроне с meets
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS meets_fts USING fts5(
+                title, description, tokenize = 'unicode61 remove_diacritics 2'
+            )
+        ''')
+
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS meets_fts_insert AFTER INSERT ON meets
+            WHEN new.is_active
+            BEGIN
+                INSERT INTO meets_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS meets_fts_deactivate AFTER UPDATE OF is_active ON meets
+            WHEN old.is_active AND NOT new.is_active
+            BEGIN
+                DELETE FROM meets_fts WHERE rowid = old.id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS meets_fts_reactivate AFTER UPDATE OF is_active ON meets
+            WHEN new.is_active AND NOT old.is_active
+            BEGIN
+                INSERT INTO meets_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS meets_fts_update AFTER UPDATE OF title, description ON meets
+            WHEN new.is_active
+            BEGIN
+                DELETE FROM meets_fts WHERE rowid = old.id;
+                INSERT INTO meets_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS meets_fts_delete AFTER DELETE ON meets
+            BEGIN
+                DELETE FROM meets_fts WHERE rowid = old.id;
+            END;
+        ''')
+
+        cursor.execute('''
+            INSERT INTO meets_fts (rowid, title, description)
+            SELECT id, title, description FROM meets
+            WHERE is_active = TRUE AND id NOT IN (SELECT rowid FROM meets_fts)
+        ''')
+
+    def _init_stats(self, cursor):
+        # Счетчики встречи обновляются триггерами на rooms в той же транзакции, что и запись или создание комнат
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'meet_stats'")
+        needs_backfill = cursor.fetchone() is None
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS meet_stats (
+                meet_id INTEGER PRIMARY KEY,
+                capacity INTEGER NOT NULL DEFAULT 0,
+                booked INTEGER NOT NULL DEFAULT 0,
+                rooms_total INTEGER NOT NULL DEFAULT 0,
+                rooms_full INTEGER NOT NULL DEFAULT 0,
+                last_join_at TIMESTAMP
+            )
+        ''')
+
+        # Заполненность по часам: одна строка на встречу и час, хранится последнее значение booked
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS meet_fill_history (
+                meet_id INTEGER NOT NULL,
+                bucket TEXT NOT NULL, -- YYYY-MM-DD HH:00
+                booked INTEGER NOT NULL,
+                PRIMARY KEY (meet_id, bucket)
+            ) WITHOUT ROWID
+        ''')
+
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS meet_stats_room_insert AFTER INSERT ON rooms
+            BEGIN
+                INSERT INTO meet_stats (meet_id, capacity, booked, rooms_total, rooms_full)
+                VALUES (new.meet_id, new.max_participants, new.current_participants, 1,
+                    new.current_participants >= new.max_participants)
+                ON CONFLICT (meet_id) DO UPDATE SET
+                    capacity = capacity + excluded.capacity,
+                    booked = booked + excluded.booked,
+                    rooms_total = rooms_total + 1,
+                    rooms_full = rooms_full + excluded.rooms_full;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS meet_stats_room_update AFTER UPDATE OF current_participants, max_participants ON rooms
+            WHEN new.current_participants != old.current_participants OR new.max_participants != old.max_participants
+            BEGIN
+                UPDATE meet_stats SET
+                    capacity = capacity + new.max_participants - old.max_participants,
+                    booked = booked + new.current_participants - old.current_participants,
+                    rooms_full = rooms_full + (new.current_participants >= new.max_participants)
+                        - (old.current_participants >= old.max_participants),
+                    last_join_at = CASE WHEN new.current_participants > old.current_participants
+                        THEN CURRENT_TIMESTAMP ELSE last_join_at END
+                WHERE meet_id = new.meet_id;
+
+                INSERT INTO meet_fill_history (meet_id, bucket, booked)
+                SELECT meet_id, strftime('%Y-%m-%d %H:00', 'now'), booked
+                FROM meet_stats WHERE meet_id = new.meet_id
+                ON CONFLICT (meet_id, bucket) DO UPDATE SET booked = excluded.booked;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS meet_stats_room_delete AFTER DELETE ON rooms
+            BEGIN
+                UPDATE meet_stats SET
+                    capacity = capacity - old.max_participants,
+                    booked = booked - old.current_participants,
+                    rooms_total = rooms_total - 1,
+                    rooms_full = rooms_full - (old.current_participants >= old.max_participants)
+                WHERE meet_id = old.meet_id;
+            END;
+        ''')
+
+        if needs_backfill:
+            cursor.execute('''
+                INSERT INTO meet_stats (meet_id, capacity, booked, rooms_total, rooms_full, last_join_at)
+                SELECT r.meet_id, SUM(r.max_participants), SUM(r.current_participants), COUNT(*),
+                    SUM(r.current_participants >= r.max_participants),
+                    (SELECT MAX(rp.joined_at) FROM room_participants rp
+                     JOIN rooms jr ON jr.id = rp.room_id WHERE jr.meet_id = r.meet_id)
+                FROM rooms r
+                GROUP BY r.meet_id
+            ''')
+            logger.info(f"Рассчитана статистика для {cursor.rowcount} встреч")
+
+    def _init_bookings(self, cursor):
+        # Записи пользователя в готовом для "Моих записей" виде: активные записи в активных комнатах активных встреч.
+        # Таблицу ведут триггеры на room_participants, rooms и meets в той же транзакции, что и изменение
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_bookings'")
+        needs_backfill = cursor.fetchone() is None
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_bookings (
+                user_id INTEGER NOT NULL,
+                starts_at INTEGER NOT NULL,
+                room_id INTEGER NOT NULL,
+                ends_at INTEGER,
+                meet_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                date TEXT NOT NULL,
+                meet_start_time TEXT NOT NULL,
+                room_number INTEGER NOT NULL,
+                start_time TEXT NOT NULL,
+                end_time TEXT NOT NULL,
+                joined_at TIMESTAMP,
+                PRIMARY KEY (user_id, starts_at, room_id)
+            ) WITHOUT ROWID
+        ''')
+
+        cursor.executescript('''
+            CREATE INDEX IF NOT EXISTS idx_user_bookings_room ON user_bookings (room_id);
+            CREATE INDEX IF NOT EXISTS idx_user_bookings_meet ON user_bookings (meet_id);
+
+            CREATE TRIGGER IF NOT EXISTS user_bookings_join AFTER INSERT ON room_participants
+            BEGIN
+                INSERT OR REPLACE INTO user_bookings (user_id, starts_at, room_id, ends_at, meet_id, title, date,
+                    meet_start_time, room_number, start_time, end_time, joined_at)
+                SELECT new.user_id, COALESCE(r.starts_at, 0), r.id, r.ends_at, m.id, m.title, m.date,
+                    m.start_time, r.room_number, r.start_time, r.end_time, new.joined_at
+                FROM rooms r
+                JOIN meets m ON m.id = r.meet_id
+                WHERE r.id = new.room_id AND r.is_active = TRUE AND m.is_active = TRUE;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS user_bookings_leave AFTER DELETE ON room_participants
+            BEGIN
+                DELETE FROM user_bookings WHERE room_id = old.room_id AND user_id = old.user_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS user_bookings_meet_deactivate AFTER UPDATE OF is_active ON meets
+            WHEN old.is_active AND NOT new.is_active
+            BEGIN
+                DELETE FROM user_bookings WHERE meet_id = old.id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS user_bookings_meet_reactivate AFTER UPDATE OF is_active ON meets
+            WHEN new.is_active AND NOT old.is_active
+            BEGIN
+                INSERT OR REPLACE INTO user_bookings (user_id, starts_at, room_id, ends_at, meet_id, title, date,
+                    meet_start_time, room_number, start_time, end_time, joined_at)
+                SELECT rp.user_id, COALESCE(r.starts_at, 0), r.id, r.ends_at, new.id, new.title, new.date,
+                    new.start_time, r.room_number, r.start_time, r.end_time, rp.joined_at
+                FROM rooms r
+                JOIN room_participants rp ON rp.room_id = r.id
+                WHERE r.meet_id = new.id AND r.is_active = TRUE;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS user_bookings_meet_update AFTER UPDATE OF title, date, start_time ON meets
+            BEGIN
+                UPDATE user_bookings SET title = new.title, date = new.date, meet_start_time = new.start_time
+                WHERE meet_id = new.id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS user_bookings_room_deactivate AFTER UPDATE OF is_active ON rooms
+            WHEN old.is_active AND NOT new.is_active
+            BEGIN
+                DELETE FROM user_bookings WHERE room_id = old.id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS user_bookings_room_reactivate AFTER UPDATE OF is_active ON rooms
+            WHEN new.is_active AND NOT old.is_active
+            BEGIN
+                INSERT OR REPLACE INTO user_bookings (user_id, starts_at, room_id, ends_at, meet_id, title, date,
+                    meet_start_time, room_number, start_time, end_time, joined_at)
+                SELECT rp.user_id, COALESCE(new.starts_at, 0), new.id, new.ends_at, m.id, m.title, m.date,
+                    m.start_time, new.room_number, new.start_time, new.end_time, rp.joined_at
+                FROM room_participants rp
+                JOIN meets m ON m.id = new.meet_id
+                WHERE rp.room_id = new.id AND m.is_active = TRUE;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS user_bookings_room_update
+            AFTER UPDATE OF starts_at, ends_at, room_number, start_time, end_time ON rooms
+            BEGIN
+                UPDATE user_bookings SET starts_at = COALESCE(new.starts_at, 0), ends_at = new.ends_at,
+                    room_number = new.room_number, start_time = new.start_time, end_time = new.end_time
+                WHERE room_id = new.id;
+            END;
+        ''')
+
+        if needs_backfill:
+            cursor.execute('''
+                INSERT OR REPLACE INTO user_bookings (user_id, starts_at, room_id, ends_at, meet_id, title, date,
+                    meet_start_time, room_number, start_time, end_time, joined_at)
+                SELECT rp.user_id, COALESCE(r.starts_at, 0), r.id, r.ends_at, m.id, m.title, m.date,
+                    m.start_time, r.room_number, r.start_time, r.end_time, rp.joined_at
+                FROM room_participants rp
+                JOIN rooms r ON r.id = rp.room_id
+                JOIN meets m ON m.id = r.meet_id
+                WHERE r.is_active = TRUE AND m.is_active = TRUE
+            ''')
+            logger.info(f"Заполнена таблица записей пользователей: {cursor.rowcount} строк")
+
+    def _init_changes(self, cursor):
+        # Журнал изменений: триггеры дописывают строку в той же транзакции, что и само изменение,
+        # подписчики (change_feed.py) читают его по возрастанию seq из любого процесса
+        cursor.executescript('''
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL, -- 'meet_created', 'meet_cancelled', 'meet_archived', 'room_added', 'booking_added', 'booking_removed'
+                meet_id INTEGER,
+                room_id INTEGER,
+                user_id INTEGER,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TRIGGER IF NOT EXISTS changes_meet_insert AFTER INSERT ON meets
+            BEGIN
+                INSERT INTO changes (kind, meet_id, user_id) VALUES ('meet_created', new.id, new.user_id);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS changes_meet_deactivate AFTER UPDATE OF is_active ON meets
+            WHEN old.is_active AND NOT new.is_active
+            BEGIN
+                INSERT INTO changes (kind, meet_id, user_id) VALUES ('meet_cancelled', old.id, old.user_id);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS changes_meet_delete AFTER DELETE ON meets
+            BEGIN
+                INSERT INTO changes (kind, meet_id, user_id) VALUES ('meet_archived', old.id, old.user_id);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS changes_room_insert AFTER INSERT ON rooms
+            BEGIN
+                INSERT INTO changes (kind, meet_id, room_id) VALUES ('room_added', new.meet_id, new.id);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS changes_booking_insert AFTER INSERT ON room_participants
+            BEGIN
+                INSERT INTO changes (kind, meet_id, room_id, user_id)
+                SELECT 'booking_added', meet_id, new.room_id, new.user_id FROM rooms WHERE id = new.room_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS changes_booking_delete AFTER DELETE ON room_participants
+            BEGIN
+                INSERT INTO changes (kind, meet_id, room_id, user_id)
+                SELECT 'booking_removed', meet_id, old.room_id, old.user_id FROM rooms WHERE id = old.room_id;
+            END;
+        ''')
+
+    def _init_archive(self, cursor):
+        cursor.execute("PRAGMA archive.journal_mode=WAL")
+        cursor.executescript('''
+            CREATE TABLE IF NOT EXISTS archive.meets (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                date TEXT NOT NULL,
+                description TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                password TEXT,
+                created_at TIMESTAMP,
+                is_active BOOLEAN,
+                series_id INTEGER,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS archive.rooms (
+                id INTEGER PRIMARY KEY,
+                meet_id INTEGER NOT NULL,
+                room_number INTEGER NOT NULL,
+                start_time TEXT NOT NULL,
+                end_time TEXT NOT NULL,
+                max_participants INTEGER,
+                current_participants INTEGER,
+                is_active BOOLEAN,
+                starts_at INTEGER,
+                ends_at INTEGER
+            );
+
+            CREATE TABLE IF NOT EXISTS archive.room_participants (
+                id INTEGER PRIMARY KEY,
+                room_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                user_name TEXT NOT NULL,
+                joined_at TIMESTAMP
+            );
+
+            CREATE INDEX IF NOT EXISTS archive.idx_archive_rooms_meet ON rooms (meet_id);
+            CREATE INDEX IF NOT EXISTS archive.idx_archive_participants_user ON room_participants (user_id, room_id);
+        ''')
+
+    def _insert_rooms(self, cursor, meet_id: int, date: str, meet_start_time: str, rooms_data: list, max_participants: int):
+        for room in rooms_data:
+            starts_at, ends_at = room_epochs(date, meet_start_time, room['start_time'], room['end_time'])
+            cursor.execute('''
+                INSERT INTO rooms (meet_id, room_number, start_time, end_time, max_participants, starts_at, ends_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (meet_id, room['room_number'], room['start_time'], room['end_time'], max_participants,
+                  starts_at, ends_at))
+
+    def _find_overlap(self, cursor, room_id: int, user_id: int, busy: list = ()):
+        """Ищет запись или собственную встречу пользователя, пересекающуюся по времени с комнатой.
+        busy - занятые интервалы пользователя из других шардов: [(starts_at, ends_at, пересечение)]"""
+        cursor.execute("SELECT meet_id, starts_at, ends_at FROM rooms WHERE id = ?", (room_id,))
+        room = cursor.fetchone()
+        if not room or room[1] is None:
+            return None
+        
+        meet_id, starts_at, ends_at = room
+        params = {'user_id': user_id, 'room_id': room_id, 'meet_id': meet_id,
+                  'starts_at': starts_at, 'ends_at': ends_at}
+        
+        cursor.execute('''
+            SELECT 'booking', title, date, room_number, start_time, end_time
+            FROM user_bookings
+            WHERE user_id = :user_id AND room_id != :room_id
+                AND starts_at < :ends_at AND ends_at > :starts_at
+            UNION ALL
+            SELECT 'organizer', m.title, m.date, r.room_number, r.start_time, r.end_time
+            FROM meets m
+            JOIN rooms r ON r.meet_id = m.id
+            WHERE m.user_id = :user_id AND m.id != :meet_id
+                AND r.starts_at < :ends_at AND r.ends_at > :starts_at
+                AND r.is_active = TRUE AND m.is_active = TRUE
+            LIMIT 1
+        ''', params)
+        
+        overlap = cursor.fetchone()
+        if overlap:
+            return overlap
+        
+        for busy_starts_at, busy_ends_at, busy_overlap in busy:
+            if busy_starts_at < ends_at and busy_ends_at > starts_at:
+                return busy_overlap
+        return None
+
+    async def get_busy_windows(self, user_id: int):
+        """Интервалы активных записей и встреч пользователя для проверки пересечений из другого шарда"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT starts_at, ends_at, 'booking', title, date, room_number, start_time, end_time
+                FROM user_bookings
+                WHERE user_id = :user_id AND ends_at IS NOT NULL
+                UNION ALL
+                SELECT r.starts_at, r.ends_at, 'organizer', m.title, m.date, r.room_number, r.start_time, r.end_time
+                FROM meets m
+                JOIN rooms r ON r.meet_id = m.id
+                WHERE m.user_id = :user_id AND r.is_active = TRUE AND m.is_active = TRUE
+            ''', {'user_id': user_id})
+            
+            windows = [(row[0], row[1], row[2:]) for row in cursor.fetchall() if row[0] is not None]
+            conn.close()
+            return windows
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения занятых интервалов пользователя {user_id}: {e}")
+            return []
+
+    @writes
     async def add_meet_with_rooms(self, user_id: int, title: str, date: str, description: str, 
                                  start_time: str, rooms_data: list, max_participants: int = 1, password: str = None):
         try:
@@ -99,11 +838,7 @@ class Database:
             
             meet_id = cursor.lastrowid
             
-            for room in rooms_data:
-                cursor.execute('''
-                    INSERT INTO rooms (meet_id, room_number, start_time, end_time, max_participants)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (meet_id, room['room_number'], room['start_time'], room['end_time'], max_participants))
+            self._insert_rooms(cursor, meet_id, date, start_time, rooms_data, max_participants)
             
             conn.commit()
             conn.close()
@@ -115,6 +850,7 @@ class Database:
             logger.error(f"Ошибка создания встречи с комнатами: {e}")
             return None, False
 
+    @writes
     async def add_meet(self, user_id: int, title: str, date: str, description: str, start_time: str, password: str = None):
         try:
             conn = self.get_connection_with_retry()
@@ -136,16 +872,16 @@ class Database:
             logger.error(f"Ошибка добавления встречи: {e}")
             return None
 
+    @writes
     async def add_rooms(self, meet_id: int, rooms_data: list, max_participants: int = 1):
         try:
             conn = self.get_connection_with_retry()
             cursor = conn.cursor()
             
-            for room in rooms_data:
-                cursor.execute('''
-                    INSERT INTO rooms (meet_id, room_number, start_time, end_time, max_participants)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (meet_id, room['room_number'], room['start_time'], room['end_time'], max_participants))
+            cursor.execute("SELECT date, start_time FROM meets WHERE id = ?", (meet_id,))
+            date, start_time = cursor.fetchone()
+            
+            self._insert_rooms(cursor, meet_id, date, start_time, rooms_data, max_participants)
             
             conn.commit()
             conn.close()
@@ -157,13 +893,143 @@ class Database:
             logger.error(f"Ошибка добавления комнат: {e}")
             return False
 
+    @writes
+    async def add_meet_series(self, user_id: int, title: str, date: str, description: str, start_time: str,
+                              rooms_data: list, rooms_count: int, room_duration: int, max_participants: int = 1,
+                              password: str = None, frequency: str = 'weekly', interval: int = 1, until: str = None):
+        """Создает серию повторяющихся встреч вместе с первой встречей, остальные создает планировщик"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            starts_on = datetime.strptime(date, '%d-%m-%Y').strftime('%Y-%m-%d')
+            
+            cursor.execute('''
+                INSERT INTO meet_series (user_id, title, description, start_time, password, rooms_count,
+                    room_duration, max_participants, frequency, interval, starts_on, until, materialized_until)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, title, description, start_time, password, rooms_count, room_duration,
+                  max_participants, frequency, interval, starts_on, until, starts_on))
+            
+            series_id = cursor.lastrowid
+            
+            cursor.execute('''
+                INSERT INTO meets (user_id, title, date, description, start_time, password, series_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, title, date, description, start_time, password, series_id))
+            
+            meet_id = cursor.lastrowid
+            
+            self._insert_rooms(cursor, meet_id, date, start_time, rooms_data, max_participants)
+            
+            conn.commit()
+            conn.close()
+            
+            logger.info(f"Серия {series_id} создана для пользователя {user_id}, первая встреча {meet_id}")
+            return series_id, meet_id
+                
+        except Exception as e:
+            logger.error(f"Ошибка создания серии встреч: {e}")
+            return None, None
+
+    async def get_series_to_materialize(self, horizon: str):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, user_id, title, description, start_time, password, rooms_count, room_duration,
+                    max_participants, frequency, interval, starts_on, until, materialized_until
+                FROM meet_series
+                WHERE is_active = TRUE AND materialized_until < ?
+                    AND (until IS NULL OR materialized_until < until)
+            ''', (horizon,))
+            
+            series = cursor.fetchall()
+            conn.close()
+            return series
+            
+        except Exception as e:
+            logger.error(f"Ошибка получения серий для создания встреч: {e}")
+            return []
+
+    @writes
+    async def materialize_series(self, series_id: int, occurrences: list, materialized_until: str):
+        """Создает встречи серии на даты из occurrences: [(DD-MM-YYYY, rooms_data)], уже созданные пропускает"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT user_id, title, description, start_time, password, max_participants
+                FROM meet_series WHERE id = ? AND is_active = TRUE
+            ''', (series_id,))
+            
+            series = cursor.fetchone()
+            if not series:
+                conn.close()
+                return []
+            
+            user_id, title, description, start_time, password, max_participants = series
+            created = []
+            
+            for date, rooms_data in occurrences:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO meets (user_id, title, date, description, start_time, password, series_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (user_id, title, date, description, start_time, password, series_id))
+                
+                if cursor.rowcount == 0:
+                    continue
+                
+                meet_id = cursor.lastrowid
+                created.append(meet_id)
+                
+                self._insert_rooms(cursor, meet_id, date, start_time, rooms_data, max_participants)
+            
+            cursor.execute('''
+                UPDATE meet_series SET materialized_until = ? WHERE id = ?
+            ''', (materialized_until, series_id))
+            
+            conn.commit()
+            conn.close()
+            
+            if created:
+                logger.info(f"Серия {series_id}: создано {len(created)} встреч до {materialized_until}")
+            return created
+                
+        except Exception as e:
+            logger.error(f"Ошибка создания встреч серии {series_id}: {e}")
+            return []
+
+    @writes
+    async def stop_meet_series(self, series_id: int, user_id: int):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE meet_series 
+                SET is_active = FALSE 
+                WHERE id = ? AND user_id = ?
+            ''', (series_id, user_id))
+            
+            conn.commit()
+            success = cursor.rowcount > 0
+            conn.close()
+            return success
+                
+        except Exception as e:
+            logger.error(f"Ошибка остановки серии встреч: {e}")
+            return False
+
     async def get_user_meets(self, user_id: int):
         try:
             conn = self.get_connection_with_retry()
             cursor = conn.cursor()
             
             cursor.execute('''
-                SELECT id, title, date, description, start_time, password, created_at
+                SELECT id, title, date, description, start_time, password, created_at, series_id
                 FROM meets 
                 WHERE user_id = ? AND is_active = TRUE
                 ORDER BY created_at DESC
@@ -216,10 +1082,16 @@ class Database:
             logger.error(f"Ошибка получения комнат: {e}")
             return []
 
-    async def join_room(self, room_id: int, user_id: int, user_name: str):
+    @writes
+    async def join_room(self, room_id: int, user_id: int, user_name: str, busy: list = ()):
+        """Записывает в комнату, возвращает (успех, сообщение, сколько теперь записано в комнате)"""
         try:
             conn = self.get_connection_with_retry()
             cursor = conn.cursor()
+            # В файл пишут несколько процессов: проверка мест и запись - одна транзакция.
+            # join_waitlist вызывает join_room внутри своей, уже открытой
+            if not conn.in_transaction:
+                cursor.execute("BEGIN IMMEDIATE")
             
             cursor.execute('''
                 SELECT id FROM room_participants 
@@ -227,18 +1099,32 @@ class Database:
             ''', (room_id, user_id))
             
             if cursor.fetchone():
+                conn.rollback()
                 conn.close()
-                return False, "Вы уже записаны в эту комнату"
+                return False, "Вы уже записаны в эту комнату", None
             
             cursor.execute('''
-                SELECT max_participants, current_participants 
-                FROM rooms WHERE id = ?
+                SELECT r.max_participants, r.current_participants 
+                FROM rooms r
+                JOIN meets m ON m.id = r.meet_id
+                WHERE r.id = ? AND r.is_active = TRUE AND m.is_active = TRUE
             ''', (room_id,))
             
             room_data = cursor.fetchone()
-            if room_data and room_data[1] >= room_data[0]:
+            if not room_data:
+                conn.rollback()
                 conn.close()
-                return False, "В комнате нет свободных мест"
+                return False, "Комната больше недоступна", None
+            if room_data[1] >= room_data[0]:
+                conn.rollback()
+                conn.close()
+                return False, "В комнате нет свободных мест", None
+            
+            overlap = self._find_overlap(cursor, room_id, user_id, busy)
+            if overlap:
+                conn.rollback()
+                conn.close()
+                return False, overlap_message(overlap), None
             
             cursor.execute('''
                 INSERT INTO room_participants (room_id, user_id, user_name)
@@ -248,24 +1134,356 @@ class Database:
             cursor.execute('''
                 UPDATE rooms 
                 SET current_participants = current_participants + 1 
-                WHERE id = ?
+                WHERE id = ? AND current_participants < max_participants
             ''', (room_id,))
             
+            if cursor.rowcount == 0:
+                conn.rollback()
+                conn.close()
+                return False, "В комнате нет свободных мест", None
+            
+            cursor.execute('''
+                DELETE FROM room_waitlist 
+                WHERE room_id = ? AND user_id = ?
+            ''', (room_id, user_id))
+            
             conn.commit()
             conn.close()
-            return True, "Вы успешно записались в комнату"
+            return True, "Вы успешно записались в комнату", room_data[1] + 1
                 
         except Exception as e:
             logger.error(f"Ошибка записи в комнату: {e}")
-            return False, "Произошла ошибка при записи"
+            return False, "Произошла ошибка при записи", None
 
-    async def get_room_participants(self, room_id: int):
+    @writes
+    async def join_earliest_room(self, meet_id: int, user_id: int, user_name: str, busy: list = ()):
+        """Записывает в самую раннюю ещё не начавшуюся комнату встречи со свободным местом"""
         try:
             conn = self.get_connection_with_retry()
             cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
             
             cursor.execute('''
-                SELECT user_name, joined_at 
+                SELECT r.id, r.room_number, r.start_time, r.end_time, r.max_participants, r.current_participants
+                FROM rooms r
+                JOIN meets m ON m.id = r.meet_id
+                WHERE r.meet_id = ? AND r.starts_at > ? AND m.is_active = TRUE
+                    AND r.current_participants < r.max_participants AND r.is_active = TRUE
+                    AND NOT EXISTS (
+                        SELECT 1 FROM room_participants rp WHERE rp.room_id = r.id AND rp.user_id = ?
+                    )
+                ORDER BY r.starts_at, r.id
+            ''', (meet_id, int(time.time()), user_id))
+            
+            # Комнаты, пересекающиеся с другими записями пользователя, пропускаем и берём следующую
+            room = None
+            overlap = None
+            overlap_cursor = conn.cursor()
+            for candidate in cursor:
+                overlap = self._find_overlap(overlap_cursor, candidate[0], user_id, busy)
+                if not overlap:
+                    room = candidate
+                    break
+            
+            if not room:
+                conn.rollback()
+                conn.close()
+                if overlap:
+                    return False, overlap_message(overlap), None
+                return False, "Во всех комнатах этой встречи нет свободных мест", None
+            
+            room_id = room[0]
+            cursor.execute('''
+                INSERT INTO room_participants (room_id, user_id, user_name)
+                VALUES (?, ?, ?)
+            ''', (room_id, user_id, user_name))
+            
+            cursor.execute('''
+                UPDATE rooms 
+                SET current_participants = current_participants + 1 
+                WHERE id = ?
+            ''', (room_id,))
+            
+            cursor.execute('''
+                DELETE FROM room_waitlist 
+                WHERE room_id = ? AND user_id = ?
+            ''', (room_id, user_id))
+            
+            conn.commit()
+            conn.close()
+            return True, "Вы успешно записались в комнату", room[:5] + (room[5] + 1,)
+                
+        except Exception as e:
+            logger.error(f"Ошибка записи в ближайшую комнату: {e}")
+            return False, "Произошла ошибка при записи", None
+
+    @writes
+    async def join_waitlist(self, room_id: int, user_id: int, user_name: str, busy: list = ()):
+        """Ставит в лист ожидания заполненной комнаты; если место успело освободиться, сразу записывает в нее"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            cursor.execute('''
+                SELECT id FROM room_participants 
+                WHERE room_id = ? AND user_id = ?
+            ''', (room_id, user_id))
+            
+            if cursor.fetchone():
+                conn.rollback()
+                conn.close()
+                return False, "Вы уже записаны в эту комнату"
+            
+            # Клавиатура могла устареть: комнату или встречу отменили, либо место освободилось
+            cursor.execute('''
+                SELECT r.current_participants >= r.max_participants
+                FROM rooms r
+                JOIN meets m ON m.id = r.meet_id
+                WHERE r.id = ? AND r.is_active = TRUE AND m.is_active = TRUE
+            ''', (room_id,))
+            
+            room = cursor.fetchone()
+            if not room:
+                conn.rollback()
+                conn.close()
+                return False, "Комната больше недоступна"
+            if not room[0]:
+                # Запись идет в той же транзакции, join_room ее и зафиксирует
+                success, message, _ = await self.join_room(room_id, user_id, user_name, busy)
+                return success, message
+            
+            cursor.execute('''
+                INSERT OR IGNORE INTO room_waitlist (room_id, user_id, user_name)
+                VALUES (?, ?, ?)
+            ''', (room_id, user_id, user_name))
+            
+            cursor.execute('''
+                SELECT COUNT(*) FROM room_waitlist 
+                WHERE room_id = ? AND id <= (
+                    SELECT id FROM room_waitlist WHERE room_id = ? AND user_id = ?
+                )
+            ''', (room_id, room_id, user_id))
+            
+            position = cursor.fetchone()[0]
+            conn.commit()
+            conn.close()
+            return True, f"Вы в листе ожидания, ваша позиция: {position}"
+                
+        except Exception as e:
+            logger.error(f"Ошибка записи в лист ожидания: {e}")
+            return False, "Произошла ошибка при записи в лист ожидания"
+
+    async def get_waitlist_user_ids(self, room_id: int, limit: int = 10):
+        """Первые limit пользователей листа ожидания комнаты по порядку очереди"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT user_id FROM room_waitlist 
+                WHERE room_id = ?
+                ORDER BY id
+                LIMIT ?
+            ''', (room_id, limit))
+            
+            user_ids = [row[0] for row in cursor.fetchall()]
+            conn.close()
+            return user_ids
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения листа ожидания комнаты {room_id}: {e}")
+            return []
+
+    @writes
+    async def leave_room(self, room_id: int, user_id: int, candidates: dict = None):
+        """Отменяет запись и в той же транзакции переводит в комнату первого из листа ожидания.
+        candidates - кандидаты, заранее подготовленные шардированным хранилищем: {user_id: занятые интервалы
+        из других шардов}; остальных из листа ожидания в этом случае не переводим"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            cursor.execute('''
+                DELETE FROM room_participants 
+                WHERE room_id = ? AND user_id = ?
+            ''', (room_id, user_id))
+            
+            if cursor.rowcount == 0:
+                conn.rollback()
+                conn.close()
+                return False, "Вы не записаны в эту комнату", None
+            
+            cursor.execute('''
+                UPDATE rooms 
+                SET current_participants = MAX(current_participants - 1, 0) 
+                WHERE id = ?
+            ''', (room_id,))
+            
+            cursor.execute('''
+                SELECT w.id, w.user_id, w.user_name
+                FROM room_waitlist w
+                JOIN rooms r ON r.id = w.room_id
+                WHERE w.room_id = ? AND r.is_active = TRUE 
+                    AND r.current_participants < r.max_participants
+                ORDER BY w.id
+            ''', (room_id,))
+            
+            # Пропускаем тех, у кого за это время появилась пересекающаяся запись
+            promoted = None
+            next_in_line = None
+            for candidate in cursor.fetchall():
+                if candidates is not None and candidate[1] not in candidates:
+                    # Очередь упорядочена, дальше только неподготовленные: переведем их при следующем освобождении
+                    break
+                busy = candidates[candidate[1]] if candidates is not None else ()
+                if not self._find_overlap(cursor, room_id, candidate[1], busy):
+                    next_in_line = candidate
+                    break
+            
+            if next_in_line:
+                waitlist_id, promoted_user_id, promoted_user_name = next_in_line
+                
+                # Место перепроверяется самим UPDATE: без свободного места отмена записи проходит без перевода
+                cursor.execute('''
+                    UPDATE rooms 
+                    SET current_participants = current_participants + 1 
+                    WHERE id = ? AND current_participants < max_participants
+                ''', (room_id,))
+                
+                if cursor.rowcount:
+                    cursor.execute('''
+                        INSERT INTO room_participants (room_id, user_id, user_name)
+                        VALUES (?, ?, ?)
+                    ''', (room_id, promoted_user_id, promoted_user_name))
+                    
+                    cursor.execute("DELETE FROM room_waitlist WHERE id = ?", (waitlist_id,))
+                    promoted = (promoted_user_id, promoted_user_name)
+            
+            conn.commit()
+            conn.close()
+            
+            if promoted:
+                logger.info(f"Пользователь {promoted[0]} переведен из листа ожидания в комнату {room_id}")
+            return True, "Запись отменена", promoted
+                
+        except Exception as e:
+            logger.error(f"Ошибка отмены записи: {e}")
+            return False, "Произошла ошибка при отмене записи", None
+
+    @writes
+    async def archive_meets(self, older_than_days: int, batch_size: int = 200):
+        """Переносит до batch_size прошедших или отмененных встреч с комнатами и участниками в архивную базу"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            # Если прошлый запуск упал до DETACH, архив у соединения писателя уже подключен
+            cursor.execute("SELECT 1 FROM pragma_database_list WHERE name = 'archive'")
+            if not cursor.fetchone():
+                cursor.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+            self._init_archive(cursor)
+            
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)")
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            cursor.execute(f'''
+                INSERT INTO temp.archive_batch (id)
+                SELECT m.id FROM meets m
+                WHERE m.is_active = FALSE OR {MEET_DATE_ISO} < date('now', 'localtime', ?)
+                LIMIT ?
+            ''', (f"-{older_than_days} days", batch_size))
+            
+            archived = cursor.rowcount
+            if archived:
+                # В WAL-режиме транзакция не атомарна между файлами, поэтому копирование идемпотентно:
+                # при сбое между записью в архив и удалением следующий запуск просто перезапишет строки
+                cursor.execute('''
+                    INSERT OR REPLACE INTO archive.meets 
+                        (id, user_id, title, date, description, start_time, password, created_at, is_active, series_id)
+                    SELECT id, user_id, title, date, description, start_time, password, created_at, is_active, series_id
+                    FROM main.meets WHERE id IN (SELECT id FROM temp.archive_batch)
+                ''')
+                
+                cursor.execute('''
+                    INSERT OR REPLACE INTO archive.rooms 
+                        (id, meet_id, room_number, start_time, end_time, max_participants, current_participants,
+                         is_active, starts_at, ends_at)
+                    SELECT id, meet_id, room_number, start_time, end_time, max_participants, current_participants,
+                        is_active, starts_at, ends_at
+                    FROM main.rooms WHERE meet_id IN (SELECT id FROM temp.archive_batch)
+                ''')
+                
+                cursor.execute('''
+                    INSERT OR REPLACE INTO archive.room_participants (id, room_id, user_id, user_name, joined_at)
+                    SELECT rp.id, rp.room_id, rp.user_id, rp.user_name, rp.joined_at
+                    FROM main.room_participants rp
+                    JOIN main.rooms r ON r.id = rp.room_id
+                    WHERE r.meet_id IN (SELECT id FROM temp.archive_batch)
+                ''')
+                
+                for table in ('room_participants', 'room_waitlist', 'sent_notifications'):
+                    cursor.execute(f'''
+                        DELETE FROM main.{table} WHERE room_id IN (
+                            SELECT id FROM main.rooms WHERE meet_id IN (SELECT id FROM temp.archive_batch)
+                        )
+                    ''')
+                
+                cursor.execute("DELETE FROM main.rooms WHERE meet_id IN (SELECT id FROM temp.archive_batch)")
+                cursor.execute("DELETE FROM main.meet_stats WHERE meet_id IN (SELECT id FROM temp.archive_batch)")
+                cursor.execute("DELETE FROM main.meet_fill_history WHERE meet_id IN (SELECT id FROM temp.archive_batch)")
+                cursor.execute("DELETE FROM main.meets WHERE id IN (SELECT id FROM temp.archive_batch)")
+            
+            cursor.execute("DELETE FROM temp.archive_batch")
+            conn.commit()
+            # Соединение писателя переиспользуется, архив к нему больше не нужен
+            cursor.execute("DETACH DATABASE archive")
+            conn.close()
+            
+            if archived:
+                logger.info(f"В архив перенесено {archived} встреч")
+            return archived
+                
+        except Exception as e:
+            logger.error(f"Ошибка архивации встреч: {e}")
+            return 0
+
+    async def get_archived_bookings(self, user_id: int, limit: int = 20):
+        try:
+            if not os.path.exists(self.archive_path):
+                return []
+            
+            conn = sqlite3.connect(f"file:{self.archive_path}?mode=ro", uri=True, timeout=10.0)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT 
+                    m.id, m.title, m.date, m.start_time,
+                    r.room_number, r.start_time, r.end_time,
+                    rp.joined_at, m.is_active
+                FROM room_participants rp
+                JOIN rooms r ON rp.room_id = r.id
+                JOIN meets m ON r.meet_id = m.id
+                WHERE rp.user_id = ?
+                ORDER BY r.starts_at DESC
+                LIMIT ?
+            ''', (user_id, limit))
+            
+            bookings = cursor.fetchall()
+            conn.close()
+            return bookings
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения архива записей пользователя: {e}")
+            return []
+
+    async def get_room_participants(self, room_id: int):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT user_name, joined_at 
                 FROM room_participants 
                 WHERE room_id = ? 
                 ORDER BY joined_at
@@ -279,6 +1497,29 @@ class Database:
             logger.error(f"Ошибка получения участников: {e}")
             return []
 
+    def iter_meet_export_rows(self, meet_id: int, batch_size: int = 500):
+        """Построчно отдает комнаты и участников встречи, не загружая всю выборку в память"""
+        conn = self.get_connection_with_retry()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT r.room_number, r.start_time, r.end_time, r.max_participants, r.current_participants,
+                    rp.user_id, rp.user_name, rp.joined_at
+                FROM rooms r
+                LEFT JOIN room_participants rp ON rp.room_id = r.id
+                WHERE r.meet_id = ? AND r.is_active = TRUE
+                ORDER BY r.room_number, rp.joined_at, rp.id
+            ''', (meet_id,))
+            
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    @writes
     async def delete_meet(self, meet_id: int, user_id: int):
         try:
             conn = self.get_connection_with_retry()
@@ -299,23 +1540,91 @@ class Database:
             logger.error(f"Ошибка удаления встречи: {e}")
             return False
 
-    async def get_user_bookings(self, user_id: int):
+    async def get_meet_stats(self, meet_id: int):
         try:
             conn = self.get_connection_with_retry()
             cursor = conn.cursor()
             
             cursor.execute('''
-                SELECT 
-                    m.id, m.title, m.date, m.start_time,
-                    r.room_number, r.start_time, r.end_time,
-                    rp.joined_at
-                FROM room_participants rp
-                JOIN rooms r ON rp.room_id = r.id
-                JOIN meets m ON r.meet_id = m.id
-                WHERE rp.user_id = ? AND m.is_active = TRUE AND r.is_active = TRUE
-                ORDER BY rp.joined_at DESC
+                SELECT capacity, booked, rooms_total, rooms_full, last_join_at
+                FROM meet_stats 
+                WHERE meet_id = ?
+            ''', (meet_id,))
+            
+            stats = cursor.fetchone()
+            conn.close()
+            return stats
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения статистики встречи: {e}")
+            return None
+
+    async def get_organizer_stats(self, user_id: int):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT m.id, m.title, m.date, s.capacity, s.booked, s.rooms_total, s.rooms_full, s.last_join_at
+                FROM meets m
+                JOIN meet_stats s ON s.meet_id = m.id
+                WHERE m.user_id = ? AND m.is_active = TRUE
+                ORDER BY m.created_at DESC
             ''', (user_id,))
             
+            stats = cursor.fetchall()
+            conn.close()
+            return stats
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения статистики организатора: {e}")
+            return []
+
+    async def get_meet_fill_history(self, meet_id: int, limit: int = 24):
+        """Последние limit часовых отметок заполненности встречи, от старых к новым"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT bucket, booked FROM (
+                    SELECT bucket, booked FROM meet_fill_history 
+                    WHERE meet_id = ? 
+                    ORDER BY bucket DESC 
+                    LIMIT ?
+                ) ORDER BY bucket
+            ''', (meet_id, limit))
+            
+            history = cursor.fetchall()
+            conn.close()
+            return history
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения истории заполненности: {e}")
+            return []
+
+    async def get_user_bookings(self, user_id: int, since: int = None):
+        """Активные записи пользователя по времени начала комнаты: один проход по ключу user_bookings.
+        since (unix time) - только комнаты, которые начинаются не раньше, это диапазон того же ключа"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            if since is None:
+                cursor.execute('''
+                    SELECT meet_id, title, date, meet_start_time, room_number, start_time, end_time, joined_at, room_id
+                    FROM user_bookings
+                    WHERE user_id = ?
+                    ORDER BY starts_at, room_id
+                ''', (user_id,))
+            else:
+                cursor.execute('''
+                    SELECT meet_id, title, date, meet_start_time, room_number, start_time, end_time, joined_at, room_id
+                    FROM user_bookings
+                    WHERE user_id = ? AND starts_at >= ?
+                    ORDER BY starts_at, room_id
+                ''', (user_id, since))
+            
             bookings = cursor.fetchall()
             conn.close()
             return bookings
@@ -335,6 +1644,7 @@ class Database:
             ''', (meet_id,))
             
             result = cursor.fetchone()
+            conn.close()
             if not result:
                 return False
                 
@@ -347,6 +1657,73 @@ class Database:
             logger.error(f"Ошибка проверки активности встречи: {e}")
             return False
 
+    async def get_meet_access(self, meet_id: int):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute(f'''
+                SELECT m.id, m.title, m.date, m.description, m.start_time, m.password, m.user_id,
+                    {MEET_DATE_ISO} >= date('now', 'localtime'),
+                    r.id, r.room_number, r.start_time, r.end_time, r.max_participants, r.current_participants
+                FROM meets m
+                LEFT JOIN rooms r ON r.meet_id = m.id AND r.is_active = TRUE
+                WHERE m.id = ? AND m.is_active = TRUE
+                ORDER BY r.room_number
+            ''', (meet_id,))
+            
+            rows = cursor.fetchall()
+            conn.close()
+            
+            if not rows:
+                return None
+            
+            first = rows[0]
+            # Все активные комнаты: если свободных нет, из них же предлагается лист ожидания
+            rooms = [row[8:] for row in rows if row[8] is not None]
+            return {
+                'meet': first[:7],
+                'is_active': bool(first[7]),
+                'needs_password': bool(first[5]),
+                'rooms_total': len(rooms),
+                'rooms': rooms,
+                'available_rooms': [room for room in rooms if room[5] < room[4]]
+            }
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения доступа к встрече: {e}")
+            return None
+
+    async def search_meets(self, query: str, limit: int = 10, offset: int = 0):
+        try:
+            terms = re.findall(r'\w+', query.lower())
+            if not terms:
+                return []
+            
+            # Каждое слово ищется как префикс: "питон встр" найдет "Python-встреча"
+            match_query = " ".join(f'"{term}"*' for term in terms)
+            
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute(f'''
+                SELECT m.id, m.title, m.date, m.description, m.start_time, m.password, m.user_id
+                FROM meets_fts
+                JOIN meets m ON m.id = meets_fts.rowid
+                WHERE meets_fts MATCH ? AND m.is_active = TRUE
+                    AND {MEET_DATE_ISO} >= date('now', 'localtime')
+                ORDER BY bm25(meets_fts, 10.0, 1.0)
+                LIMIT ? OFFSET ?
+            ''', (match_query, limit, offset))
+            
+            meets = cursor.fetchall()
+            conn.close()
+            return meets
+            
+        except Exception as e:
+            logger.error(f"Ошибка поиска встреч: {e}")
+            return []
+
     async def get_meets_by_date(self, date: str):
         try:
             conn = self.get_connection_with_retry()
@@ -424,6 +1801,7 @@ class Database:
             logger.error(f"Ошибка проверки отправленного уведомления: {e}")
             return False
 
+    @writes
     async def mark_notification_sent(self, room_id: int, notification_type: str):
         try:
             conn = self.get_connection_with_retry()
@@ -441,22 +1819,78 @@ class Database:
         except Exception as e:
             logger.error(f"Ошибка отметки отправленного уведомления: {e}")
             return False
+
+    async def get_media_file_id(self, content_hash: str):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT file_id FROM media_cache WHERE content_hash = ?
+            ''', (content_hash,))
+            
+            result = cursor.fetchone()
+            conn.close()
+            return result[0] if result else None
+            
+        except Exception as e:
+            logger.error(f"Ошибка получения file_id из кэша медиа: {e}")
+            return None
+
+    @writes
+    async def save_media_file_id(self, content_hash: str, file_id: str):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO media_cache (content_hash, file_id)
+                VALUES (?, ?)
+            ''', (content_hash, file_id))
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Ошибка сохранения file_id в кэш медиа: {e}")
+            return False
+
+    @writes
+    async def delete_media_file_id(self, content_hash: str):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute("DELETE FROM media_cache WHERE content_hash = ?", (content_hash,))
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Ошибка удаления file_id из кэша медиа: {e}")
+            return False
         
-    async def cleanup_old_notifications(self):
+    @writes
+    async def cleanup_old_notifications(self, batch_size: int = 5000):
+        """Удаляет до batch_size отметок об уведомлениях для прошедших или отмененных комнат"""
         try:
             conn = self.get_connection_with_retry()
             cursor = conn.cursor()
             
             cursor.execute('''
                 DELETE FROM sent_notifications 
-                WHERE room_id IN (
-                    SELECT r.id FROM rooms r
+                WHERE id IN (
+                    SELECT sn.id FROM sent_notifications sn
+                    JOIN rooms r ON r.id = sn.room_id
                     JOIN meets m ON r.meet_id = m.id
-                    WHERE date(m.date || ' ' || r.start_time, '+1 day') < datetime('now')
+                    WHERE r.ends_at < CAST(strftime('%s', 'now') AS INTEGER) - 86400
                     OR m.is_active = FALSE
                     OR r.is_active = FALSE
+                    LIMIT ?
                 )
-            ''')
+            ''', (batch_size,))
             
             conn.commit()
             deleted_count = cursor.rowcount
@@ -464,16 +1898,392 @@ class Database:
             
             if deleted_count > 0:
                 logger.info(f"Очищено {deleted_count} старых уведомлений")
+            return deleted_count
                 
         except Exception as e:
             logger.error(f"Ошибка очистки старых уведомлений: {e}")
+            return 0
 
-    async def get_tomorrow_rooms(self):
+    @writes
+    async def requeue_notifications(self, starts_from: int, starts_to: int, notification_type: str = None,
+                                    batch_size: int = 5000):
+        """Снимает до batch_size отметок об отправке для комнат, начинающихся в [starts_from, starts_to)"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM sent_notifications 
+                WHERE id IN (
+                    SELECT sn.id FROM sent_notifications sn
+                    JOIN rooms r ON r.id = sn.room_id
+                    WHERE r.starts_at >= ? AND r.starts_at < ?
+                        AND (? IS NULL OR sn.notification_type = ?)
+                    LIMIT ?
+                )
+            ''', (starts_from, starts_to, notification_type, notification_type, batch_size))
+            
+            conn.commit()
+            requeued = cursor.rowcount
+            conn.close()
+            return requeued
+                
+        except Exception as e:
+            logger.error(f"Ошибка повторной постановки уведомлений: {e}")
+            return 0
+
+    @writes
+    async def deactivate_user_meets(self, user_id: int, batch_size: int = 500):
+        """Отменяет до batch_size активных встреч пользователя и останавливает его серии"""
         try:
             conn = self.get_connection_with_retry()
             cursor = conn.cursor()
             
-            tomorrow_date = (datetime.now() + timedelta(days=1)).strftime('%d-%m-%Y')
+            cursor.execute('''
+                UPDATE meet_series SET is_active = FALSE 
+                WHERE user_id = ? AND is_active = TRUE
+            ''', (user_id,))
+            
+            cursor.execute('''
+                UPDATE meets SET is_active = FALSE 
+                WHERE id IN (
+                    SELECT id FROM meets WHERE user_id = ? AND is_active = TRUE LIMIT ?
+                )
+            ''', (user_id, batch_size))
+            
+            deactivated = cursor.rowcount
+            conn.commit()
+            conn.close()
+            return deactivated
+                
+        except Exception as e:
+            logger.error(f"Ошибка отмены встреч пользователя {user_id}: {e}")
+            return 0
+
+    async def get_id_bounds(self):
+        """Первый и последний id встреч и комнат, в шардах нумерация начинается не с 1"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT MIN(id), MAX(id) FROM meets")
+            meets_bounds = cursor.fetchone()
+            cursor.execute("SELECT MIN(id), MAX(id) FROM rooms")
+            rooms_bounds = cursor.fetchone()
+            conn.close()
+            return {
+                'meets': (meets_bounds[0] or 0, meets_bounds[1] or 0),
+                'rooms': (rooms_bounds[0] or 0, rooms_bounds[1] or 0)
+            }
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения границ таблиц: {e}")
+            return {'meets': (0, 0), 'rooms': (0, 0)}
+
+    @writes
+    async def reconcile_room_counters(self, after_id: int, batch_size: int = 1000, dry_run: bool = False):
+        """Сверяет current_participants с числом участников у комнат с id в (after_id, after_id + batch_size]
+        и исправляет расхождения, с dry_run только находит. Возвращает расхождения [(room_id, счетчик, участников)]"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            # Проверка и исправление в одной транзакции: между ними запись не изменит счетчик
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute('''
+                SELECT id, current_participants, participants FROM (
+                    SELECT r.id, r.current_participants,
+                        (SELECT COUNT(*) FROM room_participants rp WHERE rp.room_id = r.id) AS participants
+                    FROM rooms r
+                    WHERE r.id > ? AND r.id <= ?
+                )
+                WHERE current_participants != participants
+            ''', (after_id, after_id + batch_size))
+            drift = cursor.fetchall()
+            
+            # Счетчики встреч в meet_stats поправятся триггером на rooms
+            if drift and not dry_run:
+                cursor.executemany('UPDATE rooms SET current_participants = ? WHERE id = ?',
+                                   [(actual, room_id) for room_id, counter, actual in drift])
+            
+            conn.commit()
+            conn.close()
+            return drift
+                
+        except Exception as e:
+            logger.error(f"Ошибка сверки счетчиков комнат: {e}")
+            return []
+
+    @writes
+    async def reconcile_meet_stats(self, after_id: int, batch_size: int = 1000):
+        """Пересчитывает meet_stats по комнатам для встреч с id в (after_id, after_id + batch_size]"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO meet_stats (meet_id, capacity, booked, rooms_total, rooms_full)
+                SELECT meet_id, SUM(max_participants), SUM(current_participants), COUNT(*),
+                    SUM(current_participants >= max_participants)
+                FROM rooms 
+                WHERE meet_id > ? AND meet_id <= ?
+                GROUP BY meet_id
+                ON CONFLICT (meet_id) DO UPDATE SET
+                    capacity = excluded.capacity,
+                    booked = excluded.booked,
+                    rooms_total = excluded.rooms_total,
+                    rooms_full = excluded.rooms_full
+                WHERE capacity != excluded.capacity OR booked != excluded.booked
+                    OR rooms_total != excluded.rooms_total OR rooms_full != excluded.rooms_full
+            ''', (after_id, after_id + batch_size))
+            
+            fixed = cursor.rowcount
+            conn.commit()
+            conn.close()
+            return fixed
+                
+        except Exception as e:
+            logger.error(f"Ошибка сверки статистики встреч: {e}")
+            return 0
+
+    async def get_change_cursor(self):
+        """Позиция конца журнала изменений: подписчик, начавший с нее, получит только новые изменения"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM changes")
+            
+            seq = cursor.fetchone()[0]
+            conn.close()
+            return seq
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения позиции журнала изменений: {e}")
+            return 0
+
+    async def get_changes(self, after, limit: int = 500):
+        """Изменения после позиции after (None - с начала журнала): (seq, kind, meet_id, room_id, user_id, changed_at)
+        и позиция, с которой читать дальше"""
+        after = after or 0
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT seq, kind, meet_id, room_id, user_id, changed_at
+                FROM changes
+                WHERE seq > ?
+                ORDER BY seq
+                LIMIT ?
+            ''', (after, limit))
+            
+            changes = cursor.fetchall()
+            conn.close()
+            return changes, changes[-1][0] if changes else after
+                
+        except Exception as e:
+            logger.error(f"Ошибка чтения журнала изменений: {e}")
+            return [], after
+
+    def get_data_version(self):
+        """PRAGMA data_version отдельного соединения: меняется после каждого коммита в файл из любого процесса.
+        Дешевая проверка перед чтением журнала, вызывать из одного потока"""
+        try:
+            if self._version_conn is None:
+                self._version_conn = self.connect()
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения версии данных: {e}")
+            self._version_conn = None
+            return None
+
+    @writes
+    async def cleanup_changes(self, older_than_hours: int = 24, batch_size: int = 5000):
+        """Удаляет до batch_size записей журнала изменений старше older_than_hours часов"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            # changed_at растет вместе с seq, поэтому старые записи - начало журнала: смотрим только первые
+            # batch_size строк, а не сканируем весь журнал в поисках старых, когда их нет
+            cursor.execute('''
+                DELETE FROM changes WHERE seq IN (
+                    SELECT seq FROM (
+                        SELECT seq, changed_at FROM changes ORDER BY seq LIMIT ?
+                    )
+                    WHERE changed_at < datetime('now', ?)
+                )
+            ''', (batch_size, f"-{older_than_hours} hours"))
+            
+            deleted = cursor.rowcount
+            conn.commit()
+            conn.close()
+            return deleted
+                
+        except Exception as e:
+            logger.error(f"Ошибка очистки журнала изменений: {e}")
+            return 0
+
+    @writes
+    async def analyze(self):
+        try:
+            conn = self.get_connection_with_retry()
+            conn.execute("ANALYZE")
+            conn.close()
+            return True
+                
+        except Exception as e:
+            logger.error(f"Ошибка ANALYZE: {e}")
+            return False
+
+    @writes
+    async def vacuum(self):
+        try:
+            conn = self.get_connection_with_retry()
+            # Заодно переводит старые базы на auto_vacuum=INCREMENTAL, это применяется только при VACUUM
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            conn.close()
+            return True
+                
+        except Exception as e:
+            logger.error(f"Ошибка VACUUM: {e}")
+            return False
+
+    @writes
+    async def optimize(self):
+        try:
+            conn = self.get_connection_with_retry()
+            conn.execute("PRAGMA optimize")
+            conn.close()
+            return True
+                
+        except Exception as e:
+            logger.error(f"Ошибка PRAGMA optimize: {e}")
+            return False
+
+    @writes
+    async def incremental_vacuum(self, pages: int = 0):
+        """Возвращает в файловую систему до pages свободных страниц (0 - все), если база в режиме INCREMENTAL"""
+        try:
+            conn = self.get_connection_with_retry()
+            # execute делает один шаг прагмы и освобождает одну страницу, executescript выполняет ее целиком
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+            conn.close()
+            return True
+                
+        except Exception as e:
+            logger.error(f"Ошибка incremental_vacuum: {e}")
+            return False
+
+    async def get_storage_info(self):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute("PRAGMA page_size")
+            page_size = cursor.fetchone()[0]
+            cursor.execute("PRAGMA freelist_count")
+            freelist_count = cursor.fetchone()[0]
+            cursor.execute("PRAGMA auto_vacuum")
+            auto_vacuum = cursor.fetchone()[0]
+            conn.close()
+            
+            wal_path = f"{self.db_path}-wal"
+            return {
+                'page_size': page_size,
+                'freelist_pages': freelist_count,
+                'incremental_vacuum': auto_vacuum == 2,
+                'wal_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+            }
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения сведений о хранилище: {e}")
+            return None
+
+    @writes
+    async def record_maintenance_run(self, task: str, duration_ms: float, details: str = None):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO maintenance_runs (task, duration_ms, details)
+                VALUES (?, ?, ?)
+            ''', (task, duration_ms, details))
+            
+            conn.commit()
+            conn.close()
+                
+        except Exception as e:
+            logger.error(f"Ошибка записи журнала обслуживания: {e}")
+
+    @writes
+    async def wal_checkpoint(self, mode: str = 'TRUNCATE'):
+        """Возвращает (busy, страниц в WAL, перенесено страниц) или None при ошибке"""
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Неизвестный режим checkpoint: {mode}")
+        
+        try:
+            conn = self.get_connection_with_retry()
+            result = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+            conn.close()
+            return result
+                
+        except Exception as e:
+            logger.error(f"Ошибка wal_checkpoint: {e}")
+            return None
+
+    @writes
+    async def acquire_lease(self, name: str, holder: str, ttl: float):
+        """Захватывает или продлевает аренду, если она свободна, истекла или уже принадлежит holder"""
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            now = time.time()
+            
+            cursor.execute('''
+                INSERT INTO leases (name, holder, expires_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    holder = excluded.holder,
+                    expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+            ''', (name, holder, now + ttl, now))
+            
+            acquired = cursor.rowcount > 0
+            conn.commit()
+            conn.close()
+            return acquired
+            
+        except Exception as e:
+            logger.error(f"Ошибка захвата аренды {name}: {e}")
+            return False
+
+    @writes
+    async def release_lease(self, name: str, holder: str):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM leases WHERE name = ? AND holder = ?
+            ''', (name, holder))
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Ошибка освобождения аренды {name}: {e}")
+            return False
+
+    async def get_rooms_on_date(self, date: str):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
             
             cursor.execute('''
                 SELECT r.id, r.room_number, r.start_time, r.end_time,
@@ -481,16 +2291,19 @@ class Database:
                 FROM rooms r
                 JOIN meets m ON r.meet_id = m.id
                 WHERE m.date = ? AND m.is_active = TRUE AND r.is_active = TRUE
-            ''', (tomorrow_date,))
+            ''', (date,))
             
             rooms = cursor.fetchall()
             conn.close()
             return rooms
             
         except Exception as e:
-            logger.error(f"Ошибка получения комнат на завтра: {e}")
+            logger.error(f"Ошибка получения комнат на {date}: {e}")
             return []
 
+    async def get_tomorrow_rooms(self):
+        return await self.get_rooms_on_date((datetime.now() + timedelta(days=1)).strftime('%d-%m-%Y'))
+
     async def get_upcoming_rooms(self, minutes: int = 30):
         try:
             conn = self.get_connection_with_retry()
@@ -566,4 +2379,4 @@ class Database:
             logger.error(f"Ошибка получения участников комнаты {room_id}: {e}")
             return []
 
-db = Database()
\ No newline at end of file
+db = Database(profile=load_storage_profile())
@@ -0,0 +1,36 @@
+from storage import db
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Встречи старше ARCHIVE_AFTER_DAYS дней и отмененные переносятся в архивную базу
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_INTERVAL = 3600
+ARCHIVE_BATCH = 200
+# Пауза между пачками, чтобы запись в бота не ждала освобождения блокировки
+BATCH_PAUSE = 0.1
+
+async def archive_old_meets(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH):
+    total = 0
+    while True:
+        archived = await db.archive_meets(older_than_days, batch_size)
+        total += archived
+        if archived < batch_size:
+            break
+        await asyncio.sleep(BATCH_PAUSE)
+
+    if total:
+        logger.info(f"🗄 Архивация завершена: перенесено {total} встреч")
+    return total
+
+async def start_archiver():
+    logger.info("🚀 Архивация старых встреч запущена")
+
+    while True:
+        try:
+            await archive_old_meets()
+        except Exception as e:
+            logger.error(f"Ошибка в архивации встреч: {e}")
+
+        await asyncio.sleep(ARCHIVE_INTERVAL)
@@ -0,0 +1,142 @@
+from aiogram import Router
+from aiogram.types import Message, CallbackQuery
+from aiogram.types.input_file import InputFile
+from aiogram.filters import Command, CommandObject
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+from io import TextIOWrapper
+from storage import db
+import asyncio
+import csv
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# Выгрузка читает базу и пишет файл синхронно, поэтому выполняется вне event loop
+export_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="export")
+# Пока файл меньше порога, он держится в памяти, крупные выгрузки уходят во временный файл на диске
+SPOOL_MAX_SIZE = 1024 * 1024
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+EXPORT_HEADER = ['Комната', 'Начало', 'Конец', 'Мест', 'Записано', 'ID пользователя', 'Имя', 'Время записи']
+# Имена участников задают сами пользователи: текст с такого символа Excel выполнит как формулу
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def is_formula_like(value):
+    return isinstance(value, str) and value.startswith(FORMULA_PREFIXES)
+
+class SpooledInputFile(InputFile):
+    """Отдает содержимое временного файла кусками, не читая его целиком"""
+
+    def __init__(self, file, filename: str, chunk_size: int = 65536):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot):
+        loop = asyncio.get_running_loop()
+        self.file.seek(0)
+        while chunk := await loop.run_in_executor(export_executor, self.file.read, self.chunk_size):
+            yield chunk
+
+    def close(self):
+        self.file.close()
+
+def write_csv(rows, file):
+    # utf-8-sig, чтобы Excel сразу распознал кириллицу
+    text = TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text, delimiter=';')
+    writer.writerow(EXPORT_HEADER)
+    count = 0
+    for row in rows:
+        writer.writerow(["'" + value if is_formula_like(value) else value for value in row])
+        count += 1
+    text.flush()
+    text.detach()
+    return count
+
+def write_xlsx(rows, file):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    # В режиме write_only строки сразу сбрасываются на диск, а не копятся в памяти
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Участники")
+    sheet.append(EXPORT_HEADER)
+    count = 0
+    for row in rows:
+        cells = []
+        for value in row:
+            if is_formula_like(value):
+                # Явный строковый тип, иначе openpyxl сохранит текст с "=" как формулу
+                value = WriteOnlyCell(sheet, value)
+                value.data_type = 's'
+            cells.append(value)
+        sheet.append(cells)
+        count += 1
+    workbook.save(file)
+    return count
+
+def build_meet_export(meet_id: int, export_format: str):
+    writer = write_xlsx if export_format == 'xlsx' else write_csv
+    file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode='w+b')
+    try:
+        count = writer(db.iter_meet_export_rows(meet_id), file)
+    except Exception:
+        file.close()
+        raise
+    return file, count
+
+async def send_meet_export(message: Message, user_id: int, meet_id: int, export_format: str):
+    meet = await db.get_meet_by_id(meet_id)
+    if not meet or meet[6] != user_id:
+        await message.answer("❌ Встреча не найдена или вы не ее организатор")
+        return
+
+    try:
+        file, count = await asyncio.get_running_loop().run_in_executor(
+            export_executor, build_meet_export, meet_id, export_format
+        )
+    except ImportError:
+        await message.answer("❌ Для выгрузки в XLSX установите пакет openpyxl")
+        return
+
+    document = SpooledInputFile(file, filename=f"meet_{meet_id}.{export_format}")
+    try:
+        await message.answer_document(
+            document,
+            caption=f"📥 Участники встречи «{meet[1]}» ({meet[2]})\n📄 Строк: {count}"
+        )
+    finally:
+        document.close()
+
+    logger.info(f"Выгрузка встречи {meet_id} в {export_format}: {count} строк")
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, command: CommandObject):
+    try:
+        args = (command.args or "").split()
+        if not args or not args[0].isdigit() or (len(args) > 1 and args[1].lower() not in EXPORT_FORMATS):
+            await message.answer(
+                "📥 Выгрузка участников встречи\n\n"
+                "Использование: /export &lt;ID встречи&gt; [csv|xlsx]",
+                parse_mode="HTML"
+            )
+            return
+
+        export_format = args[1].lower() if len(args) > 1 else 'csv'
+        await send_meet_export(message, message.from_user.id, int(args[0]), export_format)
+    except Exception as e:
+        logger.error(f"Ошибка в cmd_export: {e}")
+        await message.answer("❌ Произошла ошибка при выгрузке. Попробуйте позже.")
+
+@router.callback_query(lambda callback: callback.data and callback.data.startswith("export_meet:"))
+async def export_meet_callback(callback: CallbackQuery):
+    try:
+        _, meet_id, export_format = callback.data.split(":", 2)
+        await callback.answer()
+        await send_meet_export(callback.message, callback.from_user.id, int(meet_id), export_format)
+    except Exception as e:
+        logger.error(f"Ошибка в export_meet_callback: {e}")
+        await callback.message.answer("❌ Произошла ошибка при выгрузке. Попробуйте позже.")
@@ -0,0 +1,142 @@
+from aiogram import Router
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from keyboards import get_main_keyboard, get_cancel_keyboard
+from handlers.join_meet import open_meet
+from storage import db
+import html
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+PAGE_SIZE = 5
+
+class FindMeet(StatesGroup):
+    waiting_for_query = State()
+
+def get_search_keyboard(meets, page: int, has_more: bool):
+    keyboard = []
+    for i, meet in enumerate(meets, page * PAGE_SIZE + 1):
+        meet_id, title, date, description, start_time, password, user_id = meet
+        keyboard.append([InlineKeyboardButton(text=f"📝 {i}. {title}", callback_data=f"find_join:{meet_id}")])
+
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"find_page:{page - 1}"))
+    if has_more:
+        navigation.append(InlineKeyboardButton(text="Далее ➡️", callback_data=f"find_page:{page + 1}"))
+    if navigation:
+        keyboard.append(navigation)
+
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+async def build_search_page(query: str, page: int):
+    meets = await db.search_meets(query, limit=PAGE_SIZE + 1, offset=page * PAGE_SIZE)
+    has_more = len(meets) > PAGE_SIZE
+    meets = meets[:PAGE_SIZE]
+
+    if not meets:
+        return None, None
+
+    text = f"🔎 <b>Результаты поиска «{html.escape(query)}»</b> (стр. {page + 1}):\n\n"
+    for i, meet in enumerate(meets, page * PAGE_SIZE + 1):
+        meet_id, title, date, description, start_time, password, user_id = meet
+        password_status = "🔐" if password else "🔓"
+        short_description = description if len(description) <= 80 else description[:77] + "..."
+        text += (
+            f"<b>{i}. {html.escape(title)}</b> {password_status}\n"
+            f"   📅 {date} ⏰ {start_time}\n"
+            f"   📋 {html.escape(short_description)}\n"
+            f"   🆔 ID: <code>{meet_id}</code>\n\n"
+        )
+    text += "Нажмите на встречу, чтобы записаться:"
+
+    return text, get_search_keyboard(meets, page, has_more)
+
+async def show_search_results(message: Message, state: FSMContext, query: str):
+    text, keyboard = await build_search_page(query, 0)
+
+    if not text:
+        await message.answer(
+            f"🔎 По запросу «{html.escape(query)}» ничего не найдено.\n\n"
+            "Попробуйте другие слова или запишитесь по ID встречи.",
+            parse_mode="HTML",
+            reply_markup=get_main_keyboard()
+        )
+        await state.clear()
+        return
+
+    await state.set_state(None)
+    await state.update_data(search_query=query)
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+
+@router.message(Command("find"))
+async def cmd_find(message: Message, state: FSMContext, command: CommandObject):
+    try:
+        await state.clear()
+        query = (command.args or "").strip()
+
+        if not query:
+            await message.answer(
+                "🔎 Поиск встреч\n\n"
+                "Введите слова из названия или описания встречи:",
+                reply_markup=get_cancel_keyboard()
+            )
+            await state.set_state(FindMeet.waiting_for_query)
+            return
+
+        await show_search_results(message, state, query)
+    except Exception as e:
+        logger.error(f"Ошибка в cmd_find: {e}")
+        await message.answer("❌ Произошла ошибка. Попробуйте позже.", reply_markup=get_main_keyboard())
+
+@router.message(FindMeet.waiting_for_query)
+async def process_search_query(message: Message, state: FSMContext):
+    try:
+        if message.text in ["↩️ Назад к меню", "🏠 Главное меню", "❌ Отмена"]:
+            await state.clear()
+            await message.answer("🏠 Главное меню:", reply_markup=get_main_keyboard())
+            return
+
+        await show_search_results(message, state, (message.text or "").strip())
+    except Exception as e:
+        logger.error(f"Ошибка в process_search_query: {e}")
+        await message.answer("❌ Произошла ошибка. Попробуйте позже.", reply_markup=get_main_keyboard())
+
+@router.callback_query(lambda callback: callback.data and callback.data.startswith("find_page:"))
+async def search_page_callback(callback: CallbackQuery, state: FSMContext):
+    try:
+        data = await state.get_data()
+        query = data.get('search_query')
+
+        if not query:
+            await callback.answer("Результаты поиска устарели, выполните /find снова", show_alert=True)
+            return
+
+        page = int(callback.data.split(":", 1)[1])
+        text, keyboard = await build_search_page(query, page)
+
+        if not text:
+            await callback.answer("Больше результатов нет")
+            return
+
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка в search_page_callback: {e}")
+        await callback.answer("❌ Произошла ошибка. Попробуйте позже.", show_alert=True)
+
+@router.callback_query(lambda callback: callback.data and callback.data.startswith("find_join:"))
+async def search_join_callback(callback: CallbackQuery, state: FSMContext):
+    try:
+        meet_id = int(callback.data.split(":", 1)[1])
+        await state.clear()
+        await callback.answer()
+        await open_meet(callback.message, state, meet_id)
+    except Exception as e:
+        logger.error(f"Ошибка в search_join_callback: {e}")
+        await callback.answer("❌ Произошла ошибка. Попробуйте позже.", show_alert=True)
@@ -0,0 +1,80 @@
+from aiogram import Router
+from aiogram.types import (
+    InlineQuery, InlineQueryResultArticle, InputTextMessageContent,
+    InlineKeyboardMarkup, InlineKeyboardButton
+)
+from aiogram.utils.deep_linking import create_start_link
+from storage import db
+from cache import TTLCache
+from change_feed import change_feed
+import html
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+CACHE_TIME = 300
+MAX_RESULTS = 20
+
+results_cache = TTLCache(ttl=CACHE_TIME, maxsize=2048)
+# Появление, отмена и архивация встреч меняют выдачу любого запроса
+MEET_CHANGES = {'meet_created', 'meet_cancelled', 'meet_archived'}
+
+def normalize_query(query: str):
+    return " ".join(re.findall(r'\w+', query.lower()))
+
+async def build_results(bot, query: str):
+    meets = await db.search_meets(query, limit=MAX_RESULTS)
+
+    results = []
+    for meet in meets:
+        meet_id, title, date, description, start_time, password, user_id = meet
+        password_status = "🔐" if password else "🔓"
+        join_link = await create_start_link(bot, f"join_{meet_id}")
+
+        results.append(InlineQueryResultArticle(
+            id=str(meet_id),
+            title=f"{title} {password_status}",
+            description=f"📅 {date} ⏰ {start_time} — {description}"[:200],
+            input_message_content=InputTextMessageContent(
+                message_text=(
+                    f"📝 <b>{html.escape(title)}</b>\n"
+                    f"📅 {date} ⏰ {start_time}\n"
+                    f"📋 {html.escape(description)}\n\n"
+                    f"🆔 ID встречи: <code>{meet_id}</code>"
+                ),
+                parse_mode="HTML"
+            ),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="📝 Записаться", url=join_link)]
+            ])
+        ))
+
+    return results
+
+async def invalidate_on_meet_changes():
+    """Сбрасывает кэш выдачи этого процесса, как только в журнале появляется изменение встреч"""
+    async for change in change_feed.subscribe(MEET_CHANGES):
+        if len(results_cache):
+            logger.info(f"Кэш inline-поиска сброшен: {change.kind} {change.meet_id}")
+            results_cache.clear()
+
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery):
+    try:
+        query = normalize_query(inline_query.query)
+
+        if not query:
+            await inline_query.answer([], cache_time=CACHE_TIME)
+            return
+
+        results = results_cache.get(query)
+        if results is None:
+            results = await build_results(inline_query.bot, query)
+            results_cache.set(query, results)
+
+        await inline_query.answer(results, cache_time=CACHE_TIME, is_personal=False)
+    except Exception as e:
+        logger.error(f"Ошибка в inline_search: {e}")
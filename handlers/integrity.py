@@ -0,0 +1,56 @@
+from storage import db
+from handlers.maintenance import timed
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Проверка счетчиков current_participants: при старте и затем раз в INTEGRITY_INTERVAL секунд
+INTEGRITY_INTERVAL = 6 * 3600
+INTEGRITY_BATCH = 5000
+# Расхождения исправляются сразу, иначе только попадают в лог
+REPAIR_DRIFT = True
+# Сколько расхождений перечислить в логе
+DRIFT_LOG_LIMIT = 10
+# Пауза между пачками, чтобы запись в бота не ждала
+BATCH_PAUSE = 0.01
+
+async def check_room_counters(repair: bool = REPAIR_DRIFT, batch_size: int = INTEGRITY_BATCH):
+    """Проходит все комнаты пачками по id и сравнивает current_participants с числом участников.
+    Возвращает (пачек проверено, найдено расхождений, исправлено)"""
+    batches = drifted = 0
+    # Шарды сверяются по отдельности: между их диапазонами id пустые промежутки
+    for storage in getattr(db, 'shards', [db]):
+        first_id, last_id = (await storage.get_id_bounds())['rooms']
+        after_id = first_id - 1 if first_id else 0
+        while after_id < last_id:
+            drift = await storage.reconcile_room_counters(after_id, batch_size, dry_run=not repair)
+            batches += 1
+            for room_id, counter, actual in drift:
+                if drifted < DRIFT_LOG_LIMIT:
+                    logger.warning(f"⚠️ Комната {room_id}: счетчик {counter}, участников {actual}")
+                drifted += 1
+
+            after_id += batch_size
+            await asyncio.sleep(BATCH_PAUSE)
+
+    return batches, drifted, drifted if repair else 0
+
+async def run_integrity_check(repair: bool = REPAIR_DRIFT):
+    batches, drifted, fixed = await timed('integrity', lambda: check_room_counters(repair))
+    if drifted:
+        logger.warning(f"⚠️ Счетчики участников разошлись в {drifted} комнатах, исправлено {fixed}")
+    else:
+        logger.info(f"✅ Счетчики участников сходятся (проверено пачек: {batches})")
+    return drifted, fixed
+
+async def start_integrity_checker():
+    logger.info("🚀 Проверка счетчиков участников запущена")
+
+    while True:
+        try:
+            await run_integrity_check()
+        except Exception as e:
+            logger.error(f"Ошибка в проверке счетчиков участников: {e}")
+
+        await asyncio.sleep(INTEGRITY_INTERVAL)
@@ -4,8 +4,9 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message
-from keyboards import get_main_keyboard, get_rooms_keyboard, get_cancel_keyboard
-from database import db
+from keyboards import get_main_keyboard, get_rooms_keyboard, get_cancel_keyboard, get_waitlist_keyboard, EARLIEST_ROOM_BUTTON
+from storage import db
+import html
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,6 +17,7 @@ class JoinMeet(StatesGroup):
     waiting_for_meet_id = State()        
     waiting_for_password = State()       
     waiting_for_room_choice = State()    
+    waiting_for_waitlist_choice = State()
 
 @router.message(Command("join"))
 @router.message(lambda message: message.text == "📝 Записаться на встречу")
@@ -40,10 +42,24 @@ async def process_meet_id(message: Message, state: FSMContext):
             return
         
         meet_id = int(message.text.strip())
+        await open_meet(message, state, meet_id)
+            
+    except ValueError:
+        await message.answer(
+            "❌ ID встречи должен быть числом.\n\n"
+            "Введите ID снова:",
+            reply_markup=get_cancel_keyboard()
+        )
+    except Exception as e:
+        logger.error(f"Ошибка в process_meet_id: {e}")
+        await message.answer("❌ Произошла ошибка. Попробуйте позже.", reply_markup=get_main_keyboard())
+
+async def open_meet(message: Message, state: FSMContext, meet_id: int):
+    try:
+        await state.set_state(JoinMeet.waiting_for_meet_id)
+        access = await db.get_meet_access(meet_id)
         
-        meet = await db.get_meet_by_id(meet_id)
-        
-        if not meet:
+        if not access:
             await message.answer(
                 "❌ Встреча с таким ID не найдена.\n\n"
                 "Проверьте ID и попробуйте снова:",
@@ -51,8 +67,7 @@ async def process_meet_id(message: Message, state: FSMContext):
             )
             return
         
-        is_active = await db.is_meet_active(meet_id)
-        if not is_active:
+        if not access['is_active']:
             await message.answer(
                 "❌ Эта встреча уже завершена или отменена.\n\n"
                 "Выберите другую встречу:",
@@ -60,6 +75,7 @@ async def process_meet_id(message: Message, state: FSMContext):
             )
             return
         
+        meet = access['meet']
         meet_data = {
             'meet_id': meet_id,
             'title': meet[1],
@@ -70,12 +86,17 @@ async def process_meet_id(message: Message, state: FSMContext):
             'user_id': meet[6]
         }
         
-        await state.update_data(meet_data=meet_data)
+        await state.update_data(
+            meet_data=meet_data,
+            rooms_total=access['rooms_total'],
+            meet_rooms=access['rooms'],
+            available_rooms=access['available_rooms']
+        )
         
-        if meet_data['password']:
+        if access['needs_password']:
             await message.answer(
                 f"🔐 Эта встреча защищена паролем.\n\n"
-                f"📝 <b>Название:</b> {meet_data['title']}\n"
+                f"📝 <b>Название:</b> {html.escape(meet_data['title'])}\n"
                 f"📅 <b>Дата:</b> {meet_data['date']}\n\n"
                 "Введите пароль для доступа:",
                 parse_mode="HTML",
@@ -83,16 +104,10 @@ async def process_meet_id(message: Message, state: FSMContext):
             )
             await state.set_state(JoinMeet.waiting_for_password)
         else:
-            await show_available_rooms(message, state, meet_id)
+            await show_available_rooms(message, state)
             
-    except ValueError:
-        await message.answer(
-            "❌ ID встречи должен быть числом.\n\n"
-            "Введите ID снова:",
-            reply_markup=get_cancel_keyboard()
-        )
     except Exception as e:
-        logger.error(f"Ошибка в process_meet_id: {e}")
+        logger.error(f"Ошибка в open_meet: {e}")
         await message.answer("❌ Произошла ошибка. Попробуйте позже.", reply_markup=get_main_keyboard())
 
 @router.message(JoinMeet.waiting_for_password)
@@ -114,16 +129,18 @@ async def process_meet_password(message: Message, state: FSMContext):
             return
         
         await message.answer("✅ Пароль верный!")
-        await show_available_rooms(message, state, meet_data['meet_id'])
+        await show_available_rooms(message, state)
     except Exception as e:
         logger.error(f"Ошибка в process_meet_password: {e}")
         await message.answer("❌ Произошла ошибка. Попробуйте позже.", reply_markup=get_main_keyboard())
 
-async def show_available_rooms(message: Message, state: FSMContext, meet_id: int):
+async def show_available_rooms(message: Message, state: FSMContext):
     try:
-        rooms = await db.get_meet_rooms(meet_id)
+        data = await state.get_data()
+        meet_data = data['meet_data']
+        available_rooms = data.get('available_rooms', [])
         
-        if not rooms:
+        if not data.get('rooms_total'):
             await message.answer(
                 "❌ Для этой встречи нет доступных комнат.\n\n"
                 "Возможно, все комнаты уже заполнены или встреча отменена.",
@@ -132,23 +149,10 @@ async def show_available_rooms(message: Message, state: FSMContext, meet_id: int
             await state.clear()
             return
         
-        available_rooms = []
-        for room in rooms:
-            room_id, room_number, start_time, end_time, max_participants, current_participants = room
-            if current_participants < max_participants:
-                available_rooms.append(room)
-        
         if not available_rooms:
-            await message.answer(
-                "❌ Во всех комнатах этой встречи нет свободных мест.",
-                reply_markup=get_main_keyboard()
-            )
-            await state.clear()
+            await offer_waitlist(message, state)
             return
         
-        data = await state.get_data()
-        meet_data = data['meet_data']
-        
         rooms_info = "\n".join([
             f"🏠 Комната {room[1]}: {room[2]}-{room[3]}"
             for room in available_rooms[:5]  
@@ -159,7 +163,7 @@ async def show_available_rooms(message: Message, state: FSMContext, meet_id: int
         
         await message.answer(
             f"📋 <b>Доступные комнаты:</b>\n\n"
-            f"📝 {meet_data['title']}\n"
+            f"📝 {html.escape(meet_data['title'])}\n"
             f"📅 {meet_data['date']} {meet_data['start_time']}\n\n"
             f"{rooms_info}\n\n"
             "Выберите комнату:",
@@ -167,7 +171,6 @@ async def show_available_rooms(message: Message, state: FSMContext, meet_id: int
             reply_markup=get_rooms_keyboard(available_rooms)
         )
         
-        await state.update_data(available_rooms=available_rooms)
         await state.set_state(JoinMeet.waiting_for_room_choice)
     except Exception as e:
         logger.error(f"Ошибка в show_available_rooms: {e}")
@@ -183,6 +186,10 @@ async def process_room_choice(message: Message, state: FSMContext):
         data = await state.get_data()
         available_rooms = data.get('available_rooms', [])
         
+        if message.text == EARLIEST_ROOM_BUTTON:
+            await join_earliest_room(message, state)
+            return
+        
         selected_room = None
         for room in available_rooms:
             room_id, room_number, start_time, end_time, max_participants, current_participants = room
@@ -201,15 +208,16 @@ async def process_room_choice(message: Message, state: FSMContext):
         room_id, room_number, start_time, end_time, max_participants, current_participants = selected_room
         
         user_name = message.from_user.full_name or f"User_{message.from_user.id}"
-        success, result_message = await db.join_room(room_id, message.from_user.id, user_name)
+        success, result_message, participants = await db.join_room(room_id, message.from_user.id, user_name)
         
         if success:
+            # Число записанных из базы: список комнат в состоянии загружен при открытии встречи и мог устареть
             await message.answer(
                 f"🎉 Вы успешно записались!\n\n"
-                f"📝 {data['meet_data']['title']}\n"
+                f"📝 {html.escape(data['meet_data']['title'])}\n"
                 f"🏠 Комната {room_number}\n"
                 f"⏰ {start_time}-{end_time}\n"
-                f"👥 {current_participants + 1}/{max_participants}",
+                f"👥 {participants}/{max_participants}",
                 parse_mode="HTML",
                 reply_markup=get_main_keyboard()
             )
@@ -224,6 +232,103 @@ async def process_room_choice(message: Message, state: FSMContext):
         logger.error(f"Ошибка в process_room_choice: {e}")
         await message.answer("❌ Произошла ошибка. Попробуйте позже.", reply_markup=get_main_keyboard())
 
+async def join_earliest_room(message: Message, state: FSMContext):
+    try:
+        data = await state.get_data()
+        meet_data = data['meet_data']
+        
+        user_name = message.from_user.full_name or f"User_{message.from_user.id}"
+        success, result_message, room = await db.join_earliest_room(
+            meet_data['meet_id'], message.from_user.id, user_name
+        )
+        
+        if success:
+            room_id, room_number, start_time, end_time, max_participants, current_participants = room
+            await message.answer(
+                f"🎉 Вы успешно записались на ближайшее свободное время!\n\n"
+                f"📝 {meet_data['title']}\n"
+                f"🏠 Комната {room_number}\n"
+                f"⏰ {start_time}-{end_time}\n"
+                f"👥 {current_participants}/{max_participants}",
+                reply_markup=get_main_keyboard()
+            )
+        else:
+            await message.answer(f"❌ {result_message}", reply_markup=get_main_keyboard())
+        
+        await state.clear()
+    except Exception as e:
+        logger.error(f"Ошибка в join_earliest_room: {e}")
+        await message.answer("❌ Произошла ошибка. Попробуйте позже.", reply_markup=get_main_keyboard())
+
+async def offer_waitlist(message: Message, state: FSMContext):
+    try:
+        data = await state.get_data()
+        # Свободных комнат нет, значит в лист ожидания можно встать в любую из загруженных при открытии встречи
+        rooms = data.get('meet_rooms', [])
+        
+        if not rooms:
+            await message.answer(
+                "❌ Во всех комнатах этой встречи нет свободных мест.",
+                reply_markup=get_main_keyboard()
+            )
+            await state.clear()
+            return
+        
+        await message.answer(
+            "❌ Во всех комнатах этой встречи нет свободных мест.\n\n"
+            "⏳ Вы можете встать в лист ожидания комнаты — как только место освободится, "
+            "мы запишем вас автоматически и пришлем уведомление.\n\n"
+            "Выберите комнату:",
+            reply_markup=get_waitlist_keyboard(rooms)
+        )
+        
+        await state.update_data(waitlist_rooms=rooms)
+        await state.set_state(JoinMeet.waiting_for_waitlist_choice)
+    except Exception as e:
+        logger.error(f"Ошибка в offer_waitlist: {e}")
+        await message.answer("❌ Произошла ошибка. Попробуйте позже.", reply_markup=get_main_keyboard())
+
+@router.message(JoinMeet.waiting_for_waitlist_choice)
+async def process_waitlist_choice(message: Message, state: FSMContext):
+    try:
+        if message.text in ["↩️ Назад к меню", "🏠 Главное меню", "❌ Отмена"]:
+            await cancel_join(message, state)
+            return
+        
+        data = await state.get_data()
+        rooms = data.get('waitlist_rooms', [])
+        
+        selected_room = None
+        for room in rooms:
+            if message.text.startswith(f"⏳ Комната {room[1]} "):
+                selected_room = room
+                break
+        
+        if not selected_room:
+            await message.answer(
+                "❌ Пожалуйста, выберите комнату из предложенных вариантов:",
+                reply_markup=get_waitlist_keyboard(rooms)
+            )
+            return
+        
+        user_name = message.from_user.full_name or f"User_{message.from_user.id}"
+        success, result_message = await db.join_waitlist(selected_room[0], message.from_user.id, user_name)
+        
+        if success:
+            await message.answer(
+                f"⏳ {result_message}\n\n"
+                f"📝 {data['meet_data']['title']}\n"
+                f"🏠 Комната {selected_room[1]} ({selected_room[2]}-{selected_room[3]})",
+                reply_markup=get_main_keyboard()
+            )
+        else:
+            await message.answer(f"❌ {result_message}", reply_markup=get_main_keyboard())
+        
+        await state.clear()
+    except Exception as e:
+        logger.error(f"Ошибка в process_waitlist_choice: {e}")
+        await message.answer("❌ Произошла ошибка. Попробуйте позже.", reply_markup=get_main_keyboard())
+
 async def cancel_join(message: Message, state: FSMContext):
     try:
         await state.clear()
@@ -0,0 +1,81 @@
+from storage import db
+from datetime import datetime
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_INTERVAL = 600
+# Ночное окно с минимальной нагрузкой (локальное время), тяжелые операции выполняются только в нем
+OFF_PEAK_HOURS = range(3, 6)
+# При превышении WAL переносится в основной файл: днем без ожидания читателей, ночью с усечением файла
+WAL_SIZE_LIMIT = 64 * 1024 * 1024
+# Свободные страницы возвращаются системе, только когда их накопилось больше порога
+FREELIST_THRESHOLD = 1000
+# Страниц за один шаг incremental_vacuum, между шагами блокировка записи отпускается
+VACUUM_STEP_PAGES = 2000
+# Журнал изменений нужен подписчикам, отставшим не больше чем на сутки
+CHANGES_RETENTION_HOURS = 24
+CHANGES_CLEANUP_BATCH = 5000
+
+async def timed(task: str, operation, details: str = None):
+    started = time.perf_counter()
+    result = await operation()
+    duration_ms = (time.perf_counter() - started) * 1000
+    await db.record_maintenance_run(task, duration_ms, details)
+    logger.info(f"🧰 {task}: {duration_ms:.0f} мс" + (f" ({details})" if details else ""))
+    return result
+
+async def vacuum_free_pages(freelist_pages: int):
+    for _ in range(0, freelist_pages, VACUUM_STEP_PAGES):
+        if not await db.incremental_vacuum(VACUUM_STEP_PAGES):
+            return False
+        await asyncio.sleep(0.1)
+    return True
+
+async def run_maintenance(now: datetime = None, daily_done: bool = False):
+    """Проверяет WAL и в ночное окно раз в сутки выполняет optimize и incremental_vacuum. Возвращает, была ли ночная часть"""
+    now = now or datetime.now()
+    off_peak = now.hour in OFF_PEAK_HOURS
+
+    while await db.cleanup_changes(CHANGES_RETENTION_HOURS, CHANGES_CLEANUP_BATCH) >= CHANGES_CLEANUP_BATCH:
+        await asyncio.sleep(0.1)
+
+    info = await db.get_storage_info()
+    if not info:
+        return False
+
+    if info['wal_bytes'] > WAL_SIZE_LIMIT:
+        mode = 'TRUNCATE' if off_peak else 'PASSIVE'
+        await timed('checkpoint', lambda: db.wal_checkpoint(mode), f"{mode}, WAL {info['wal_bytes'] // 1024} КБ")
+
+    if not off_peak or daily_done:
+        return False
+
+    await timed('optimize', db.optimize)
+
+    if info['incremental_vacuum'] and info['freelist_pages'] > FREELIST_THRESHOLD:
+        await timed(
+            'incremental_vacuum',
+            lambda: vacuum_free_pages(info['freelist_pages']),
+            f"{info['freelist_pages']} свободных страниц"
+        )
+    elif not info['incremental_vacuum']:
+        logger.info("🧰 auto_vacuum не включен, свободное место вернет только полный VACUUM (python admin.py vacuum)")
+
+    return True
+
+async def start_maintenance():
+    logger.info("🚀 Обслуживание базы данных запущено")
+
+    last_daily_run = None
+    while True:
+        try:
+            today = datetime.now().date()
+            if await run_maintenance(daily_done=last_daily_run == today):
+                last_daily_run = today
+        except Exception as e:
+            logger.error(f"Ошибка в обслуживании базы данных: {e}")
+
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
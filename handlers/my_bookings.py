@@ -1,30 +1,43 @@
 from aiogram import Router
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
-from database import db
+from storage import db
 from keyboards import get_main_keyboard
 from datetime import datetime
+import html
 import logging
 import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
+def get_history_keyboard():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🗄 История записей", callback_data="booking_history")]
+    ])
+
+def get_leave_keyboard(room_id: int):
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="❌ Отменить запись", callback_data=f"leave_room:{room_id}")]
+    ])
+
 @router.message(Command("my_bookings"))
 @router.message(lambda message: message.text == "📖 Мои записи")
 async def cmd_my_bookings(message: Message):
     try:
         user_id = message.from_user.id
-        bookings = await db.get_user_bookings(user_id)
+        # Только предстоящие: прошедшие, но еще не перенесенные в архив записи иначе шли бы первыми
+        bookings = await db.get_user_bookings(user_id, int(time.time()))
         
         if not bookings:
             await message.answer(
                 "📖 <b>Мои записи</b>\n\n"
-                "❌ Вы еще не записаны ни на одну встречу.\n\n"
+                "❌ У вас нет предстоящих записей.\n\n"
                 "Используйте кнопку «📝 Записаться на встречу», чтобы найти интересные мероприятия.",
                 parse_mode="HTML",
-                reply_markup=get_main_keyboard()
+                reply_markup=get_history_keyboard()
             )
             return
         
@@ -38,7 +51,7 @@ async def cmd_my_bookings(message: Message):
             await message.answer("📖 <b>Ваши записи:</b>\n\n", parse_mode="HTML")
         
         for i, booking in enumerate(bookings, 1):
-            meet_id, title, date, meet_start_time, room_number, room_start, room_end, joined_at = booking
+            meet_id, title, date, meet_start_time, room_number, room_start, room_end, joined_at, room_id = booking
             
             join_date = datetime.strptime(joined_at, '%Y-%m-%d %H:%M:%S').strftime('%d.%m.%Y %H:%M')
             
@@ -50,12 +63,13 @@ async def cmd_my_bookings(message: Message):
                 f"🆔 ID: {meet_id}\n"
             )
             
-            await message.answer(booking_text, parse_mode="HTML")
+            await message.answer(booking_text, parse_mode="HTML", reply_markup=get_leave_keyboard(room_id))
             await asyncio.sleep(0.5)
         
         await message.answer(
-            "📖 Это все ваши текущие записи.",
-            reply_markup=get_main_keyboard()
+            "📖 Это все ваши предстоящие записи.\n\n"
+            "Прошедшие встречи хранятся в истории:",
+            reply_markup=get_history_keyboard()
         )
         
     except Exception as e:
@@ -63,4 +77,62 @@ async def cmd_my_bookings(message: Message):
         await message.answer(
             "❌ Произошла ошибка при загрузке записей. Попробуйте позже.",
             reply_markup=get_main_keyboard()
-        )
\ No newline at end of file
+        )
+
+@router.callback_query(lambda callback: callback.data and callback.data.startswith("leave_room:"))
+async def leave_room_callback(callback: CallbackQuery):
+    try:
+        room_id = int(callback.data.split(":", 1)[1])
+        success, result_message, promoted = await db.leave_room(room_id, callback.from_user.id)
+        
+        if not success:
+            await callback.answer(f"❌ {result_message}", show_alert=True)
+            return
+        
+        await callback.message.edit_reply_markup(reply_markup=None)
+        await callback.message.answer("✅ Запись отменена.", reply_markup=get_main_keyboard())
+        await callback.answer()
+        
+        if promoted:
+            promoted_user_id, promoted_user_name = promoted
+            try:
+                await callback.bot.send_message(
+                    chat_id=promoted_user_id,
+                    text=(
+                        "🎉 <b>Освободилось место!</b>\n\n"
+                        "Вы были в листе ожидания и теперь записаны в комнату.\n"
+                        "Подробности — в разделе «📖 Мои записи»."
+                    ),
+                    parse_mode="HTML"
+                )
+            except Exception as e:
+                logger.error(f"Ошибка уведомления пользователя {promoted_user_id} о переводе из листа ожидания: {e}")
+        
+    except Exception as e:
+        logger.error(f"Ошибка в leave_room_callback: {e}")
+        await callback.answer("❌ Произошла ошибка. Попробуйте позже.", show_alert=True)
+
+@router.callback_query(lambda callback: callback.data == "booking_history")
+async def booking_history_callback(callback: CallbackQuery):
+    try:
+        bookings = await db.get_archived_bookings(callback.from_user.id)
+        await callback.answer()
+        
+        if not bookings:
+            await callback.message.answer("🗄 В истории пока нет прошедших записей.", reply_markup=get_main_keyboard())
+            return
+        
+        history_text = f"🗄 <b>История записей (последние {len(bookings)}):</b>\n\n"
+        for i, booking in enumerate(bookings, 1):
+            meet_id, title, date, meet_start_time, room_number, room_start, room_end, joined_at, is_active = booking
+            status = "" if is_active else " ❌ отменена"
+            history_text += (
+                f"<b>{i}. {html.escape(title)}</b>{status}\n"
+                f"   📅 {date} 🏠 Комната {room_number} ({room_start}-{room_end})\n"
+            )
+        
+        await callback.message.answer(history_text, parse_mode="HTML", reply_markup=get_main_keyboard())
+        
+    except Exception as e:
+        logger.error(f"Ошибка в booking_history_callback: {e}")
+        await callback.answer("❌ Произошла ошибка. Попробуйте позже.", show_alert=True)
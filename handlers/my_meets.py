@@ -1,9 +1,9 @@
 from aiogram import Router
-from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import Message, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command
-from database import db
+from storage import db
 from keyboards import get_main_keyboard
 import logging
 
@@ -17,13 +17,26 @@ class MeetDetails(StatesGroup):
 def get_meets_keyboard(meets):
     keyboard = []
     for meet in meets:
-        meet_id, title, date, description, start_time, password, created_at = meet
+        meet_id, title, date, description, start_time, password, created_at, series_id = meet
         button_text = f"📋 {title} ({date})"
         keyboard.append([KeyboardButton(text=button_text)])
     
     keyboard.append([KeyboardButton(text="↩️ Назад к меню")])
     return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
 
+def get_meet_actions_keyboard(meet_id: int, series_id: int = None):
+    keyboard = [
+        [InlineKeyboardButton(text="📷 QR для записи", callback_data=f"meet_qr:{meet_id}")],
+        [InlineKeyboardButton(text="📈 Статистика", callback_data=f"meet_stats:{meet_id}")],
+        [
+            InlineKeyboardButton(text="📥 CSV", callback_data=f"export_meet:{meet_id}:csv"),
+            InlineKeyboardButton(text="📥 XLSX", callback_data=f"export_meet:{meet_id}:xlsx")
+        ]
+    ]
+    if series_id:
+        keyboard.append([InlineKeyboardButton(text="⏹ Остановить повтор", callback_data=f"stop_series:{series_id}")])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
 @router.message(Command("my_meets"))
 @router.message(lambda message: message.text == "📋 Мои встречи")
 async def cmd_my_meets(message: Message, state: FSMContext):
@@ -44,8 +57,10 @@ async def cmd_my_meets(message: Message, state: FSMContext):
         meets_text = "📋 <b>Ваши встречи:</b>\n\n"
         
         for i, meet in enumerate(meets, 1):
-            meet_id, title, date, description, start_time, password, created_at = meet
+            meet_id, title, date, description, start_time, password, created_at, series_id = meet
             password_status = "🔓" if not password else "🔐"
+            if series_id:
+                password_status += " 🔁"
             
             meets_text += (
                 f"<b>{i}. {title}</b>\n"
@@ -81,7 +96,7 @@ async def process_meet_choice(message: Message, state: FSMContext):
         
         selected_meet = None
         for meet in meets:
-            meet_id, title, date, description, start_time, password, created_at = meet
+            meet_id, title, date, description, start_time, password, created_at, series_id = meet
             if message.text.startswith(f"📋 {title} ({date})"):
                 selected_meet = meet
                 break
@@ -93,7 +108,7 @@ async def process_meet_choice(message: Message, state: FSMContext):
             )
             return
         
-        meet_id, title, date, description, start_time, password, created_at = selected_meet
+        meet_id, title, date, description, start_time, password, created_at, series_id = selected_meet
         
         rooms = await db.get_meet_rooms(meet_id)
         
@@ -111,15 +126,9 @@ async def process_meet_choice(message: Message, state: FSMContext):
             meet_detail += f"📝 {description}\n\n"
             meet_detail += f"🏠 <b>Комнаты:</b>\n"
             
-            total_participants = 0
-            total_capacity = 0
-            
             for room in rooms:
                 room_id, room_number, room_start, room_end, max_participants, current_participants = room
                 
-                total_participants += current_participants
-                total_capacity += max_participants
-                
                 participants = await db.get_room_participants(room_id)
                 
                 meet_detail += f"\n<b>Комната {room_number}</b> ({room_start}-{room_end})\n"
@@ -134,12 +143,14 @@ async def process_meet_choice(message: Message, state: FSMContext):
                 else:
                     meet_detail += "   📝 Пока никто не записался\n"
             
+            capacity, booked, rooms_total, rooms_full, last_join_at = await db.get_meet_stats(meet_id) or (0, 0, 0, 0, None)
+            
             meet_detail += f"\n📈 <b>Итого по встрече:</b>\n"
-            meet_detail += f"   👥 Участников: {total_participants}/{total_capacity}\n"
-            meet_detail += f"   🏠 Комнат: {len(rooms)}\n"
+            meet_detail += f"   👥 Участников: {booked}/{capacity}\n"
+            meet_detail += f"   🏠 Комнат: {rooms_total}, заполнено: {rooms_full}\n"
             meet_detail += f"   🆔 ID для записи: <code>{meet_id}</code>"
         
-        await message.answer(meet_detail, parse_mode="HTML")
+        await message.answer(meet_detail, parse_mode="HTML", reply_markup=get_meet_actions_keyboard(meet_id, series_id))
         
         await message.answer(
             "Выберите другую встречу или вернитесь в меню:",
@@ -151,4 +162,18 @@ async def process_meet_choice(message: Message, state: FSMContext):
         await message.answer(
             "❌ Произошла ошибка. Попробуйте позже.",
             reply_markup=get_main_keyboard()
-        )
\ No newline at end of file
+        )
+
+@router.callback_query(lambda callback: callback.data and callback.data.startswith("stop_series:"))
+async def stop_series_callback(callback: CallbackQuery):
+    try:
+        series_id = int(callback.data.split(":", 1)[1])
+        success = await db.stop_meet_series(series_id, callback.from_user.id)
+        
+        if success:
+            await callback.answer("⏹ Повтор остановлен. Уже созданные встречи сохранены.", show_alert=True)
+        else:
+            await callback.answer("❌ Не удалось остановить повтор", show_alert=True)
+    except Exception as e:
+        logger.error(f"Ошибка в stop_series_callback: {e}")
+        await callback.answer("❌ Произошла ошибка. Попробуйте позже.", show_alert=True)
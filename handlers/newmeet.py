@@ -4,8 +4,8 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
-from keyboards import get_main_keyboard, get_password_choice_keyboard, get_confirmation_keyboard
-from database import db
+from keyboards import get_main_keyboard, get_password_choice_keyboard, get_confirmation_keyboard, get_repeat_choice_keyboard
+from storage import db
 from datetime import datetime, timedelta
 import re
 import logging
@@ -24,6 +24,7 @@ class CreateMeet(StatesGroup):
     waiting_for_max_participants = State() 
     waiting_for_password_choice = State() 
     waiting_for_password_input = State()
+    waiting_for_repeat_choice = State()
     waiting_for_confirmation = State()
 
 def get_cancel_keyboard():
@@ -280,7 +281,7 @@ async def process_password_choice(message: Message, state: FSMContext):
         
     if message.text == "🔓 Без пароля":
         await state.update_data(password=None, password_text="🔓 без пароля")
-        await show_confirmation(message, state)
+        await ask_repeat_choice(message, state)
         
     elif message.text == "🔐 С паролем":
         await message.answer(
@@ -314,7 +315,34 @@ async def process_password_input(message: Message, state: FSMContext):
         return
     
     await state.update_data(password=password, password_text=f"🔐 {password}")
-    await show_confirmation(message, state)
+    await ask_repeat_choice(message, state)
+
+async def ask_repeat_choice(message: Message, state: FSMContext):
+    await message.answer(
+        "🔁 Повторять встречу каждую неделю?\n\n"
+        "<i>Повторяющиеся встречи создаются автоматически на две недели вперед</i>",
+        parse_mode="HTML",
+        reply_markup=get_repeat_choice_keyboard()
+    )
+    await state.set_state(CreateMeet.waiting_for_repeat_choice)
+
+@router.message(CreateMeet.waiting_for_repeat_choice)
+async def process_repeat_choice(message: Message, state: FSMContext):
+    if message.text in ["↩️ Назад к меню", "🏠 Главное меню", "❌ Отмена"]:
+        await cancel_creation(message, state)
+        return
+    
+    if message.text == "🔂 Один раз":
+        await state.update_data(repeat_weekly=False)
+        await show_confirmation(message, state)
+    elif message.text == "🔁 Каждую неделю":
+        await state.update_data(repeat_weekly=True)
+        await show_confirmation(message, state)
+    else:
+        await message.answer(
+            "Пожалуйста, выберите вариант с клавиатуры:",
+            reply_markup=get_repeat_choice_keyboard()
+        )
 
 async def show_confirmation(message: Message, state: FSMContext):
     data = await state.get_data()
@@ -349,7 +377,8 @@ async def show_confirmation(message: Message, state: FSMContext):
         f"🏠 <b>Комнаты:</b> {rooms_info}{duration_text}\n"
         f"👥 <b>Участников в комнате:</b> до {data['max_participants']} чел.\n\n"
         f"<b>📅 Расписание:</b>\n{schedule_text}\n\n"
-        f"🔐 <b>Пароль:</b> {data['password_text']}\n\n"
+        f"🔐 <b>Пароль:</b> {data['password_text']}\n"
+        f"🔁 <b>Повтор:</b> {'каждую неделю' if data.get('repeat_weekly') else 'нет'}\n\n"
         "<b>Всё верно?</b>"
     )
     
@@ -380,16 +409,31 @@ async def process_confirmation(message: Message, state: FSMContext):
             await state.clear()
             return
         
-        meet_id, success = await db.add_meet_with_rooms(
-            user_id=message.from_user.id,
-            title=data['title'],
-            date=data['date'],
-            description=data['description'],
-            start_time=data['start_time'],
-            rooms_data=schedule,
-            max_participants=data['max_participants'],
-            password=data.get('password')
-        )
+        if data.get('repeat_weekly'):
+            series_id, meet_id = await db.add_meet_series(
+                user_id=message.from_user.id,
+                title=data['title'],
+                date=data['date'],
+                description=data['description'],
+                start_time=data['start_time'],
+                rooms_data=schedule,
+                rooms_count=data['rooms_count'],
+                room_duration=data['room_duration'],
+                max_participants=data['max_participants'],
+                password=data.get('password')
+            )
+            success = series_id is not None
+        else:
+            meet_id, success = await db.add_meet_with_rooms(
+                user_id=message.from_user.id,
+                title=data['title'],
+                date=data['date'],
+                description=data['description'],
+                start_time=data['start_time'],
+                rooms_data=schedule,
+                max_participants=data['max_participants'],
+                password=data.get('password')
+            )
         
         if meet_id and success:
             total_minutes = data['rooms_count'] * data['room_duration']
@@ -400,6 +444,8 @@ async def process_confirmation(message: Message, state: FSMContext):
             access_info = ""
             if data.get('password'):
                 access_info = f"\n🔐 <b>Пароль для доступа:</b> {data['password']}"
+            if data.get('repeat_weekly'):
+                access_info += "\n🔁 <b>Повтор:</b> каждую неделю, следующие встречи появятся автоматически"
             
             await message.answer(
                 f"🎉 Встреча <b>«{data['title']}»</b> создана успешно!\n\n"
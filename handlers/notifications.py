@@ -1,5 +1,5 @@
 from aiogram import Bot
-from database import db
+from storage import db
 from datetime import datetime, timedelta
 import asyncio
 import logging
@@ -36,19 +36,7 @@ class NotificationService:
             today_date = now.strftime('%d-%m-%Y')
             current_time_str = now.strftime('%H:%M')
             
-            conn = db.get_connection_with_retry()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT r.id, r.room_number, r.start_time, r.end_time,
-                       m.id, m.title, m.date, m.description, m.user_id
-                FROM rooms r
-                JOIN meets m ON r.meet_id = m.id
-                WHERE m.date = ? AND m.is_active = TRUE AND r.is_active = TRUE
-            ''', (today_date,))
-            
-            all_today_rooms = cursor.fetchall()
-            conn.close()
+            all_today_rooms = await db.get_rooms_on_date(today_date)
             
             filtered_rooms = []
             for room in all_today_rooms:
@@ -1,19 +1,93 @@
 from aiogram import Router
-from aiogram.types import Message, FSInputFile
-from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery, BufferedInputFile
+from aiogram.filters import Command, CommandObject
+from aiogram.utils.deep_linking import create_start_link
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from media import answer_file_photo, answer_cached_photo, bytes_content_hash
+from cache import LRUCache
+from storage import db
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Рендер PNG нагружает CPU, поэтому выполняется вне event loop
+qr_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="qr")
+# Ссылка -> (PNG, хэш содержимого), повторный запрос не рендерит QR заново
+rendered_qr = LRUCache(maxsize=256)
+
+def render_qr_png(link: str):
+    import qrcode
+
+    image = qrcode.make(link)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+async def get_meet_qr(bot, meet_id: int):
+    link = await create_start_link(bot, f"join_{meet_id}")
+
+    cached = rendered_qr.get(link)
+    if cached is None:
+        png = await asyncio.get_running_loop().run_in_executor(qr_executor, render_qr_png, link)
+        cached = (png, bytes_content_hash(png))
+        rendered_qr.set(link, cached)
+
+    png, content_hash = cached
+    return link, png, content_hash
+
+async def send_meet_qr(message: Message, meet_id: int):
+    meet = await db.get_meet_by_id(meet_id)
+    if not meet:
+        await message.answer("❌ Встреча с таким ID не найдена")
+        return
+
+    try:
+        link, png, content_hash = await get_meet_qr(message.bot, meet_id)
+    except ImportError:
+        await message.answer("❌ Для генерации QR-кодов установите пакет qrcode[pil]")
+        return
+
+    await answer_cached_photo(
+        message,
+        content_hash,
+        lambda: BufferedInputFile(png, filename=f"meet_{meet_id}.png"),
+        caption=(
+            f"📷 QR для записи на встречу «{meet[1]}»\n"
+            f"📅 {meet[2]} ⏰ {meet[4]}\n\n"
+            f"🔗 {link}"
+        )
+    )
+
 @router.message(Command("qr"))
-async def cmd_qr(message: Message):
+async def cmd_qr(message: Message, command: CommandObject):
     try:
-        photo = FSInputFile("image.png")
-        
-        await message.answer_photo(
-            photo=photo,
+        args = (command.args or "").strip()
+        if args:
+            if not args.isdigit():
+                await message.answer("❌ ID встречи должен быть числом: /qr <ID встречи>")
+                return
+            await send_meet_qr(message, int(args))
+            return
+
+        await answer_file_photo(
+            message,
+            "image.png",
             caption="📷 QR-изображение:"
         )
     except FileNotFoundError:
         await message.answer("❌ Файл image.png не найден в корне приложения")
     except Exception as e:
-        await message.answer(f"❌ Произошла ошибка при отправке фото: {str(e)}")
\ No newline at end of file
+        await message.answer(f"❌ Произошла ошибка при отправке фото: {str(e)}")
+
+@router.callback_query(lambda callback: callback.data and callback.data.startswith("meet_qr:"))
+async def meet_qr_callback(callback: CallbackQuery):
+    try:
+        await callback.answer()
+        await send_meet_qr(callback.message, int(callback.data.split(":", 1)[1]))
+    except Exception as e:
+        logger.error(f"Ошибка в meet_qr_callback: {e}")
+        await callback.message.answer(f"❌ Произошла ошибка при отправке QR: {str(e)}")
@@ -0,0 +1,72 @@
+from storage import db
+from handlers.newmeet import calculate_schedule
+from datetime import datetime, timedelta
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Встречи серии создаются только на ближайшие HORIZON_DAYS дней
+HORIZON_DAYS = 14
+MATERIALIZE_INTERVAL = 600
+
+FREQUENCY_DAYS = {
+    'daily': 1,
+    'weekly': 7
+}
+
+def series_occurrences(starts_on, frequency: str, interval: int, after, until):
+    """Даты серии в диапазоне (after, until], отсчитанные от starts_on с шагом frequency * interval"""
+    step = FREQUENCY_DAYS[frequency] * max(interval, 1)
+
+    if after < starts_on:
+        current = starts_on
+    else:
+        passed_steps = (after - starts_on).days // step + 1
+        current = starts_on + timedelta(days=passed_steps * step)
+
+    while current <= until:
+        yield current
+        current += timedelta(days=step)
+
+async def materialize_all_series(horizon_days: int = HORIZON_DAYS):
+    today = datetime.now().date()
+    horizon = today + timedelta(days=horizon_days)
+
+    created = 0
+    for series in await db.get_series_to_materialize(horizon.isoformat()):
+        (series_id, user_id, title, description, start_time, password, rooms_count, room_duration,
+         max_participants, frequency, interval, starts_on, until, materialized_until) = series
+
+        try:
+            starts_on = datetime.strptime(starts_on, '%Y-%m-%d').date()
+            after = max(datetime.strptime(materialized_until, '%Y-%m-%d').date(), today - timedelta(days=1))
+            last_date = min(horizon, datetime.strptime(until, '%Y-%m-%d').date()) if until else horizon
+
+            occurrences = []
+            for date in series_occurrences(starts_on, frequency, interval, after, last_date):
+                date_str = date.strftime('%d-%m-%Y')
+                schedule = calculate_schedule(rooms_count, room_duration, start_time, date_str)
+                if schedule:
+                    occurrences.append((date_str, schedule))
+
+            meet_ids = await db.materialize_series(series_id, occurrences, last_date.isoformat())
+            created += len(meet_ids)
+
+        except Exception as e:
+            logger.error(f"Ошибка создания встреч серии {series_id}: {e}")
+
+    if created:
+        logger.info(f"Создано {created} встреч повторяющихся серий на {horizon_days} дней вперед")
+    return created
+
+async def start_series_materializer():
+    logger.info("🚀 Планировщик повторяющихся встреч запущен")
+
+    while True:
+        try:
+            await materialize_all_series()
+        except Exception as e:
+            logger.error(f"Ошибка в планировщике повторяющихся встреч: {e}")
+
+        await asyncio.sleep(MATERIALIZE_INTERVAL)
@@ -1,14 +1,22 @@
 from aiogram import Router
 from aiogram.types import Message
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from keyboards import get_main_keyboard
+from handlers.join_meet import open_meet
 
 router = Router()
 
 @router.message(Command("start"))
-async def cmd_start(message: Message, state: FSMContext):
+async def cmd_start(message: Message, state: FSMContext, command: CommandObject):
     await state.clear()
+    
+    # Ссылка вида t.me/meetsburg_bot?start=join_<id> сразу открывает запись на встречу
+    payload = command.args or ""
+    if payload.startswith("join_") and payload[len("join_"):].isdigit():
+        await open_meet(message, state, int(payload[len("join_"):]))
+        return
+    
     await message.answer(
         "👋 Добро пожаловать!\n☝️ Настоятельно рекомендуем ознакомиться с /help",
         reply_markup=get_main_keyboard()
@@ -29,6 +37,13 @@ async def cmd_help(message: Message):
 │
 ├─ 📋 <b>Мои встречи</b>  
 │   • /my_meets - редактор встреч
+│   • /qr &lt;ID&gt; - QR-код для записи на встречу
+│   • /export &lt;ID&gt; [csv|xlsx] - выгрузка участников
+│   • /stats [ID] - статистика записи
+│
+├─ 🔎 <b>Поиск встреч</b>
+│   • /find &lt;слова&gt; - поиск по названию и описанию
+│   • @meetsburg_bot &lt;слова&gt; - поиск в любом чате
 │
 ├─ 👤 <b>Профиль</b>
 │   • /profile - настройки (не работает пока)
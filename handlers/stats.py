@@ -0,0 +1,107 @@
+from aiogram import Router
+from aiogram.types import Message, CallbackQuery
+from aiogram.filters import Command, CommandObject
+from keyboards import get_main_keyboard
+from storage import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+BAR_WIDTH = 10
+
+def fill_bar(booked: int, capacity: int):
+    filled = round(booked / capacity * BAR_WIDTH) if capacity else 0
+    return "▓" * filled + "░" * (BAR_WIDTH - filled)
+
+def fill_percent(booked: int, capacity: int):
+    return round(booked / capacity * 100) if capacity else 0
+
+async def build_meet_stats_text(meet_id: int, user_id: int):
+    meet = await db.get_meet_by_id(meet_id)
+    if not meet or meet[6] != user_id:
+        return None
+
+    stats = await db.get_meet_stats(meet_id)
+    capacity, booked, rooms_total, rooms_full, last_join_at = stats or (0, 0, 0, 0, None)
+
+    text = (
+        f"📈 <b>Статистика встречи:</b> {meet[1]}\n"
+        f"📅 {meet[2]} ⏰ {meet[4]}\n\n"
+        f"👥 Записано: {booked}/{capacity} ({fill_percent(booked, capacity)}%)\n"
+        f"{fill_bar(booked, capacity)}\n"
+        f"🏠 Заполнено комнат: {rooms_full}/{rooms_total}\n"
+        f"🕐 Последняя запись: {last_join_at or 'пока нет'}\n"
+    )
+
+    history = await db.get_meet_fill_history(meet_id)
+    if history:
+        text += "\n📊 <b>Заполненность по часам:</b>\n"
+        for bucket, bucket_booked in history:
+            text += f"<code>{bucket[5:]}</code> {fill_bar(bucket_booked, capacity)} {bucket_booked}\n"
+
+    return text
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message, command: CommandObject):
+    try:
+        args = (command.args or "").strip()
+        if args:
+            if not args.isdigit():
+                await message.answer("❌ ID встречи должен быть числом: /stats <ID встречи>")
+                return
+
+            text = await build_meet_stats_text(int(args), message.from_user.id)
+            if not text:
+                await message.answer("❌ Встреча не найдена или вы не ее организатор")
+                return
+
+            await message.answer(text, parse_mode="HTML")
+            return
+
+        meets = await db.get_organizer_stats(message.from_user.id)
+        if not meets:
+            await message.answer(
+                "📈 У вас пока нет встреч для статистики.\n\n"
+                "Создайте встречу с помощью команды /newmeet",
+                reply_markup=get_main_keyboard()
+            )
+            return
+
+        total_capacity = sum(meet[3] for meet in meets)
+        total_booked = sum(meet[4] for meet in meets)
+
+        text = (
+            f"📈 <b>Статистика ваших встреч</b>\n\n"
+            f"📋 Встреч: {len(meets)}\n"
+            f"👥 Записано: {total_booked}/{total_capacity} ({fill_percent(total_booked, total_capacity)}%)\n\n"
+        )
+        for meet in meets:
+            meet_id, title, date, capacity, booked, rooms_total, rooms_full, last_join_at = meet
+            text += (
+                f"<b>{title}</b> ({date})\n"
+                f"   {fill_bar(booked, capacity)} {booked}/{capacity}, комнат заполнено {rooms_full}/{rooms_total}\n"
+                f"   🆔 /stats {meet_id}\n\n"
+            )
+
+        await message.answer(text, parse_mode="HTML", reply_markup=get_main_keyboard())
+    except Exception as e:
+        logger.error(f"Ошибка в cmd_stats: {e}")
+        await message.answer("❌ Произошла ошибка. Попробуйте позже.", reply_markup=get_main_keyboard())
+
+@router.callback_query(lambda callback: callback.data and callback.data.startswith("meet_stats:"))
+async def meet_stats_callback(callback: CallbackQuery):
+    try:
+        meet_id = int(callback.data.split(":", 1)[1])
+        text = await build_meet_stats_text(meet_id, callback.from_user.id)
+
+        if not text:
+            await callback.answer("❌ Встреча не найдена или вы не ее организатор", show_alert=True)
+            return
+
+        await callback.answer()
+        await callback.message.answer(text, parse_mode="HTML")
+    except Exception as e:
+        logger.error(f"Ошибка в meet_stats_callback: {e}")
+        await callback.answer("❌ Произошла ошибка. Попробуйте позже.", show_alert=True)
@@ -22,6 +22,16 @@ def get_password_choice_keyboard():
         resize_keyboard=True
     )
 
+# Клавиатура для выбора повторения встречи
+def get_repeat_choice_keyboard():
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text="🔂 Один раз"), KeyboardButton(text="🔁 Каждую неделю")],
+            [KeyboardButton(text="↩️ Назад к меню")]
+        ],
+        resize_keyboard=True
+    )
+
 # Клавиатура для подтверждения
 def get_confirmation_keyboard():
     return ReplyKeyboardMarkup(
@@ -40,8 +50,12 @@ def get_cancel_keyboard():
         resize_keyboard=True
     )
 
+EARLIEST_ROOM_BUTTON = "⚡ Ближайшее свободное время"
+
 def get_rooms_keyboard(rooms):
     keyboard = []
+    if len(rooms) > 1:
+        keyboard.append([KeyboardButton(text=EARLIEST_ROOM_BUTTON)])
     for room in rooms:
         room_id, room_number, start_time, end_time, max_participants, current_participants = room
         free_slots = max_participants - current_participants
@@ -57,4 +71,14 @@ def get_rooms_keyboard(rooms):
         keyboard.append([KeyboardButton(text=button_text)])
     
     keyboard.append([KeyboardButton(text="❌ Отмена")])
-    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
\ No newline at end of file
+    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
+
+def get_waitlist_keyboard(rooms):
+    keyboard = []
+    for room in rooms:
+        room_id, room_number, start_time, end_time, max_participants, current_participants = room
+        button_text = f"⏳ Комната {room_number} ({start_time}-{end_time})"
+        keyboard.append([KeyboardButton(text=button_text)])
+    
+    keyboard.append([KeyboardButton(text="❌ Отмена")])
+    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
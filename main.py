@@ -1,23 +1,71 @@
+import argparse
 import asyncio
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 import json 
 import logging
 
-from database import db
+from storage import Storage, use_storage
+from middlewares import UpdateDedupMiddleware, UserLaneMiddleware
 
 from handlers.start import router as start_router
 from handlers.newmeet import router as meets_router
 from handlers.qr import router as qr_router
+from handlers.export import router as export_router
+from handlers.stats import router as stats_router
 from handlers.my_meets import router as my_meets_router
 from handlers.join_meet import router as join_router
 from handlers.my_bookings import router as my_bookings_router
+from handlers.find_meet import router as find_router
+from handlers.inline_search import router as inline_router, invalidate_on_meet_changes
 from handlers.notifications import start_notification_scheduler as notifications
+from handlers.recurring import start_series_materializer
+from handlers.archive import start_archiver
+from handlers.maintenance import start_maintenance
+from handlers.integrity import start_integrity_checker
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def main():
+def create_dispatcher(backend: Storage = None):
+    if backend is not None:
+        use_storage(backend)
+
+    storage = MemoryStorage()
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(UpdateDedupMiddleware())
+    dp.update.outer_middleware(UserLaneMiddleware())
+
+    dp.include_router(start_router)
+    dp.include_router(meets_router)
+    dp.include_router(my_meets_router)
+    dp.include_router(qr_router)
+    dp.include_router(export_router)
+    dp.include_router(stats_router)
+    dp.include_router(join_router)
+    dp.include_router(my_bookings_router)
+    dp.include_router(find_router)
+    dp.include_router(inline_router)
+
+    return dp
+
+def start_process_jobs():
+    """Задачи каждого процесса-обработчика, в отличие от фоновых задач не зависят от аренды планировщика"""
+    return [asyncio.create_task(invalidate_on_meet_changes())]
+
+def start_background_jobs(bot: Bot):
+    tasks = [
+        asyncio.create_task(notifications(bot)),
+        asyncio.create_task(start_series_materializer()),
+        asyncio.create_task(start_archiver()),
+        asyncio.create_task(start_maintenance()),
+        asyncio.create_task(start_integrity_checker())
+    ]
+    logger.info("✅ Планировщик уведомлений запущен")
+    return tasks
+
+async def main(workers: int = 1, storage: str = 'sqlite'):
+    bot = None
     try:
         with open('conf.json', 'r', encoding='utf-8') as file:
             data = json.load(file)
@@ -27,22 +75,27 @@ async def main():
             logger.error("Токен не найден")
             return
         
+        backend = None
+        if storage == 'memory':
+            # Данные в памяти не разделяются между процессами и пропадают при перезапуске
+            if workers > 1:
+                logger.error("Хранилище в памяти работает только с одним процессом (--workers 1)")
+                return
+            from memory_database import InMemoryDatabase
+            backend = InMemoryDatabase()
+        
+        if workers > 1:
+            from supervisor import run_supervisor
+            await run_supervisor(token, workers)
+            return
+        
         bot = Bot(token=token)
-        storage = MemoryStorage()
-        dp = Dispatcher(storage=storage)
-
-        dp.include_router(start_router)
-        dp.include_router(meets_router)
-        dp.include_router(my_meets_router)
-        dp.include_router(qr_router)
-        dp.include_router(join_router)
-        dp.include_router(my_bookings_router)
+        dp = create_dispatcher(backend)
 
         logger.info("✅ Все роутеры запущены")
 
-        asyncio.create_task(notifications(bot))
-        logger.info("✅ Планировщик уведомлений запущен")
-
+        start_process_jobs()
+        start_background_jobs(bot)
 
         logger.info("✅ Бот запущен")
         await dp.start_polling(bot)
@@ -50,7 +103,13 @@ async def main():
     except Exception as e:
         logger.error(f"Ошибка: {e}")
     finally:
-        await bot.session.close()
+        if bot:
+            await bot.session.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Meetsburg bot")
+    parser.add_argument("--workers", type=int, default=1, help="количество процессов-обработчиков апдейтов")
+    parser.add_argument("--storage", choices=["sqlite", "memory"], default="sqlite",
+                        help="хранилище: SQLite-файл или словари в памяти процесса для локальной отладки")
+    args = parser.parse_args()
+    asyncio.run(main(args.workers, args.storage))
\ No newline at end of file
@@ -0,0 +1,60 @@
+from aiogram.types import Message, FSInputFile
+from aiogram.exceptions import TelegramBadRequest
+from storage import db
+from cache import LRUCache
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Хэши файлов на диске: путь -> (mtime, размер, sha256), чтобы не перечитывать неизменившийся файл
+_file_hashes = {}
+# file_id уже загруженных в Telegram файлов по хэшу содержимого
+_file_ids = LRUCache(maxsize=1024)
+
+def file_content_hash(path: str):
+    stat = os.stat(path)
+    cached = _file_hashes.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(65536), b''):
+            digest.update(chunk)
+
+    content_hash = digest.hexdigest()
+    _file_hashes[path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+    return content_hash
+
+async def answer_cached_photo(message: Message, content_hash: str, make_input_file, **kwargs):
+    """Отправляет фото по сохраненному file_id, а при его отсутствии загружает файл и запоминает file_id"""
+    file_id = _file_ids.get(content_hash) or await db.get_media_file_id(content_hash)
+
+    if file_id:
+        try:
+            sent = await message.answer_photo(photo=file_id, **kwargs)
+            _file_ids.set(content_hash, file_id)
+            return sent
+        except TelegramBadRequest as e:
+            logger.warning(f"file_id для {content_hash} больше не действителен, загружаем заново: {e}")
+            _file_ids.pop(content_hash)
+            await db.delete_media_file_id(content_hash)
+
+    sent = await message.answer_photo(photo=make_input_file(), **kwargs)
+
+    if sent.photo:
+        file_id = sent.photo[-1].file_id
+        _file_ids.set(content_hash, file_id)
+        await db.save_media_file_id(content_hash, file_id)
+        logger.info(f"Файл {content_hash} загружен в Telegram и закэширован")
+
+    return sent
+
+def bytes_content_hash(data: bytes):
+    return hashlib.sha256(data).hexdigest()
+
+async def answer_file_photo(message: Message, path: str, **kwargs):
+    content_hash = file_content_hash(path)
+    return await answer_cached_photo(message, content_hash, lambda: FSInputFile(path), **kwargs)
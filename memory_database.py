@@ -0,0 +1,811 @@
+"""
+Хранилище в памяти процесса с тем же интерфейсом, что у Database (storage.Storage).
+
+Таблицы - словари по id, к ним словари-индексы по пользователю, встрече, дате и серии.
+Методы не ждут ничего внутри, поэтому в одном event loop каждый из них выполняется атомарно,
+как транзакция SQLite. Данные живут до конца процесса: бэкенд для тестов, бенчмарков и локального запуска.
+"""
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from storage import room_epochs, overlap_message
+
+logger = logging.getLogger(__name__)
+
+
+def utc_timestamp():
+    """Метка времени в формате CURRENT_TIMESTAMP SQLite"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def meet_day(date: str):
+    return datetime.strptime(date, '%d-%m-%Y').date()
+
+
+def fold_diacritics(char: str):
+    # unicode61 снимает диакритику только с латиницы: "é" станет "e", а "ё" и "й" останутся
+    if ord(char) < 0x250 or 0x1E00 <= ord(char) < 0x1F00:
+        return unicodedata.normalize('NFD', char)[0]
+    return char
+
+
+def search_tokens(text: str):
+    """Слова как у токенизатора unicode61 remove_diacritics 2: нижний регистр, без диакритики латиницы"""
+    return re.findall(r'\w+', ''.join(fold_diacritics(char) for char in text.lower()))
+
+
+class InMemoryDatabase:
+    def __init__(self):
+        self.meets = {}
+        self.rooms = {}
+        self.series = {}
+        # room_id -> {user_id: (id записи, user_name, joined_at)} в порядке записи
+        self.participants = defaultdict(OrderedDict)
+        # room_id -> {user_id: (id заявки, user_name)} в порядке очереди
+        self.waitlist = defaultdict(OrderedDict)
+        self.sent_notifications = set()
+        self.media_cache = {}
+        self.leases = {}
+        self.maintenance_runs = []
+        self.last_join_at = {}
+        # meet_id -> {YYYY-MM-DD HH:00: booked}
+        self.fill_history = defaultdict(dict)
+        self.archive = {'meets': {}, 'rooms': {}, 'participants': {}}
+        # Журнал изменений как таблица changes: (seq, kind, meet_id, room_id, user_id, changed_at) по возрастанию seq
+        self.changes = []
+
+        self.meets_by_user = defaultdict(set)
+        self.meets_by_date = defaultdict(set)
+        self.meets_by_series_date = {}
+        self.rooms_by_meet = defaultdict(list)
+        self.bookings_by_user = defaultdict(set)
+        # слово -> id активных встреч, в которых оно есть в названии или описании
+        self.search_index = defaultdict(set)
+
+        self._ids = defaultdict(int)
+        logger.info("Хранилище в памяти инициализировано")
+
+    def _next_id(self, table: str):
+        self._ids[table] += 1
+        return self._ids[table]
+
+    def _log_change(self, kind: str, meet_id: int = None, room_id: int = None, user_id: int = None):
+        self.changes.append((self._next_id('changes'), kind, meet_id, room_id, user_id, utc_timestamp()))
+
+    # Встречи и комнаты
+
+    def _meet_row(self, meet_id: int):
+        meet = self.meets[meet_id]
+        return (meet_id, meet['title'], meet['date'], meet['description'], meet['start_time'],
+                meet['password'], meet['user_id'])
+
+    def _active_meet(self, meet_id: int):
+        meet = self.meets.get(meet_id)
+        return meet if meet and meet['is_active'] else None
+
+    def _index_search(self, meet_id: int):
+        meet = self.meets[meet_id]
+        for token in set(search_tokens(meet['title']) + search_tokens(meet['description'])):
+            self.search_index[token].add(meet_id)
+
+    def _unindex_search(self, meet_id: int):
+        meet = self.meets[meet_id]
+        for token in set(search_tokens(meet['title']) + search_tokens(meet['description'])):
+            self.search_index[token].discard(meet_id)
+            if not self.search_index[token]:
+                del self.search_index[token]
+
+    def _set_meet_active(self, meet_id: int, is_active: bool):
+        meet = self.meets[meet_id]
+        if meet['is_active'] == is_active:
+            return
+        meet['is_active'] = is_active
+        if is_active:
+            self._index_search(meet_id)
+        else:
+            self._unindex_search(meet_id)
+            self._log_change('meet_cancelled', meet_id, user_id=meet['user_id'])
+
+    def _build_rooms(self, date: str, meet_start_time: str, rooms_data: list):
+        # Время всех комнат считается до вставки, чтобы при ошибке не осталось половины встречи
+        return [
+            (room, *room_epochs(date, meet_start_time, room['start_time'], room['end_time']))
+            for room in rooms_data
+        ]
+
+    def _insert_meet(self, user_id: int, title: str, date: str, description: str, start_time: str,
+                     password: str = None, series_id: int = None):
+        meet_id = self._next_id('meets')
+        self.meets[meet_id] = {
+            'user_id': user_id, 'title': title, 'date': date, 'description': description,
+            'start_time': start_time, 'password': password, 'created_at': utc_timestamp(),
+            'is_active': True, 'series_id': series_id
+        }
+        self.meets_by_user[user_id].add(meet_id)
+        self.meets_by_date[date].add(meet_id)
+        if series_id is not None:
+            self.meets_by_series_date[(series_id, date)] = meet_id
+        self._index_search(meet_id)
+        self._log_change('meet_created', meet_id, user_id=user_id)
+        return meet_id
+
+    def _insert_rooms(self, meet_id: int, rooms: list, max_participants: int):
+        for room, starts_at, ends_at in rooms:
+            room_id = self._next_id('rooms')
+            self.rooms[room_id] = {
+                'meet_id': meet_id, 'room_number': room['room_number'], 'start_time': room['start_time'],
+                'end_time': room['end_time'], 'max_participants': max_participants,
+                'current_participants': 0, 'is_active': True, 'starts_at': starts_at, 'ends_at': ends_at
+            }
+            self.rooms_by_meet[meet_id].append(room_id)
+            self._log_change('room_added', meet_id, room_id)
+
+    async def add_meet_with_rooms(self, user_id: int, title: str, date: str, description: str,
+                                  start_time: str, rooms_data: list, max_participants: int = 1, password: str = None):
+        try:
+            rooms = self._build_rooms(date, start_time, rooms_data)
+            meet_id = self._insert_meet(user_id, title, date, description, start_time, password)
+            self._insert_rooms(meet_id, rooms, max_participants)
+
+            logger.info(f"Встреча {meet_id} с {len(rooms_data)} комнатами создана для пользователя {user_id}")
+            return meet_id, True
+
+        except Exception as e:
+            logger.error(f"Ошибка создания встречи с комнатами: {e}")
+            return None, False
+
+    async def add_meet(self, user_id: int, title: str, date: str, description: str, start_time: str, password: str = None):
+        meet_id = self._insert_meet(user_id, title, date, description, start_time, password)
+        logger.info(f"Встреча добавлена: ID {meet_id} для пользователя {user_id}")
+        return meet_id
+
+    async def add_rooms(self, meet_id: int, rooms_data: list, max_participants: int = 1):
+        try:
+            meet = self.meets[meet_id]
+            rooms = self._build_rooms(meet['date'], meet['start_time'], rooms_data)
+            self._insert_rooms(meet_id, rooms, max_participants)
+
+            logger.info(f"Добавлено {len(rooms_data)} комнат для встречи {meet_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Ошибка добавления комнат: {e}")
+            return False
+
+    async def get_user_meets(self, user_id: int):
+        meet_ids = [meet_id for meet_id in self.meets_by_user.get(user_id, ()) if self.meets[meet_id]['is_active']]
+        meet_ids.sort(key=lambda meet_id: (self.meets[meet_id]['created_at'], meet_id), reverse=True)
+        return [
+            (meet_id, meet['title'], meet['date'], meet['description'], meet['start_time'], meet['password'],
+             meet['created_at'], meet['series_id'])
+            for meet_id, meet in ((meet_id, self.meets[meet_id]) for meet_id in meet_ids)
+        ]
+
+    async def get_meet_by_id(self, meet_id: int):
+        return self._meet_row(meet_id) if self._active_meet(meet_id) else None
+
+    def _room_row(self, room_id: int):
+        room = self.rooms[room_id]
+        return (room_id, room['room_number'], room['start_time'], room['end_time'],
+                room['max_participants'], room['current_participants'])
+
+    def _active_room_ids(self, meet_id: int):
+        room_ids = [room_id for room_id in self.rooms_by_meet.get(meet_id, ()) if self.rooms[room_id]['is_active']]
+        return sorted(room_ids, key=lambda room_id: (self.rooms[room_id]['room_number'], room_id))
+
+    async def get_meet_rooms(self, meet_id: int):
+        return [self._room_row(room_id) for room_id in self._active_room_ids(meet_id)]
+
+    async def get_meet_access(self, meet_id: int):
+        meet = self._active_meet(meet_id)
+        if not meet:
+            return None
+
+        room_ids = self._active_room_ids(meet_id)
+        return {
+            'meet': self._meet_row(meet_id),
+            'is_active': meet_day(meet['date']) >= datetime.now().date(),
+            'needs_password': bool(meet['password']),
+            'rooms_total': len(room_ids),
+            'rooms': [self._room_row(room_id) for room_id in room_ids],
+            'available_rooms': [
+                self._room_row(room_id) for room_id in room_ids
+                if self.rooms[room_id]['current_participants'] < self.rooms[room_id]['max_participants']
+            ]
+        }
+
+    async def is_meet_active(self, meet_id: int):
+        try:
+            meet = self._active_meet(meet_id)
+            return bool(meet) and meet_day(meet['date']) >= datetime.now().date()
+
+        except Exception as e:
+            logger.error(f"Ошибка проверки активности встречи: {e}")
+            return False
+
+    async def delete_meet(self, meet_id: int, user_id: int):
+        meet = self.meets.get(meet_id)
+        if not meet or meet['user_id'] != user_id:
+            return False
+        self._set_meet_active(meet_id, False)
+        return True
+
+    async def search_meets(self, query: str, limit: int = 10, offset: int = 0):
+        terms = search_tokens(query)
+        if not terms:
+            return []
+
+        # Каждое слово ищется как префикс, встреча должна содержать все слова запроса
+        found = None
+        for term in terms:
+            matches = set()
+            for token, meet_ids in self.search_index.items():
+                if token.startswith(term):
+                    matches |= meet_ids
+            found = matches if found is None else found & matches
+            if not found:
+                return []
+
+        today = datetime.now().date()
+        found = [meet_id for meet_id in found if meet_day(self.meets[meet_id]['date']) >= today]
+
+        # Вместо bm25: совпадение в названии весит в 10 раз больше, чем в описании, как веса в search_meets SQLite
+        def score(meet_id):
+            meet = self.meets[meet_id]
+            title, description = search_tokens(meet['title']), search_tokens(meet['description'])
+            return sum(
+                10 * sum(token.startswith(term) for token in title) + sum(token.startswith(term) for token in description)
+                for term in terms
+            )
+
+        found.sort(key=lambda meet_id: (-score(meet_id), meet_id))
+        return [self._meet_row(meet_id) for meet_id in found[offset:offset + limit]]
+
+    async def get_meets_by_date(self, date: str):
+        return [
+            self._meet_row(meet_id) for meet_id in sorted(self.meets_by_date.get(date, ()))
+            if self.meets[meet_id]['is_active']
+        ]
+
+    async def get_upcoming_meets(self, target_datetime: str):
+        date_part, time_part = target_datetime.split(' ')[:2]
+        return [meet for meet in await self.get_meets_by_date(date_part) if meet[4] == time_part]
+
+    # Серии встреч
+
+    async def add_meet_series(self, user_id: int, title: str, date: str, description: str, start_time: str,
+                              rooms_data: list, rooms_count: int, room_duration: int, max_participants: int = 1,
+                              password: str = None, frequency: str = 'weekly', interval: int = 1, until: str = None):
+        """Создает серию повторяющихся встреч вместе с первой встречей, остальные создает планировщик"""
+        try:
+            starts_on = datetime.strptime(date, '%d-%m-%Y').strftime('%Y-%m-%d')
+            rooms = self._build_rooms(date, start_time, rooms_data)
+
+            series_id = self._next_id('meet_series')
+            self.series[series_id] = {
+                'user_id': user_id, 'title': title, 'description': description, 'start_time': start_time,
+                'password': password, 'rooms_count': rooms_count, 'room_duration': room_duration,
+                'max_participants': max_participants, 'frequency': frequency, 'interval': interval,
+                'starts_on': starts_on, 'until': until, 'materialized_until': starts_on, 'is_active': True
+            }
+
+            meet_id = self._insert_meet(user_id, title, date, description, start_time, password, series_id)
+            self._insert_rooms(meet_id, rooms, max_participants)
+
+            logger.info(f"Серия {series_id} создана для пользователя {user_id}, первая встреча {meet_id}")
+            return series_id, meet_id
+
+        except Exception as e:
+            logger.error(f"Ошибка создания серии встреч: {e}")
+            return None, None
+
+    async def get_series_to_materialize(self, horizon: str):
+        return [
+            (series_id, series['user_id'], series['title'], series['description'], series['start_time'],
+             series['password'], series['rooms_count'], series['room_duration'], series['max_participants'],
+             series['frequency'], series['interval'], series['starts_on'], series['until'],
+             series['materialized_until'])
+            for series_id, series in self.series.items()
+            if series['is_active'] and series['materialized_until'] < horizon
+            and (series['until'] is None or series['materialized_until'] < series['until'])
+        ]
+
+    async def materialize_series(self, series_id: int, occurrences: list, materialized_until: str):
+        """Создает встречи серии на даты из occurrences: [(DD-MM-YYYY, rooms_data)], уже созданные пропускает"""
+        try:
+            series = self.series.get(series_id)
+            if not series or not series['is_active']:
+                return []
+
+            # Сначала считаем все комнаты, чтобы ошибка в одной дате не оставила серию созданной наполовину
+            planned = [
+                (date, self._build_rooms(date, series['start_time'], rooms_data))
+                for date, rooms_data in occurrences
+            ]
+
+            created = []
+            for date, rooms in planned:
+                if (series_id, date) in self.meets_by_series_date:
+                    # Как INSERT OR IGNORE с AUTOINCREMENT: пропущенная дата тоже расходует id
+                    self._next_id('meets')
+                    continue
+                meet_id = self._insert_meet(series['user_id'], series['title'], date, series['description'],
+                                            series['start_time'], series['password'], series_id)
+                self._insert_rooms(meet_id, rooms, series['max_participants'])
+                created.append(meet_id)
+
+            series['materialized_until'] = materialized_until
+
+            if created:
+                logger.info(f"Серия {series_id}: создано {len(created)} встреч до {materialized_until}")
+            return created
+
+        except Exception as e:
+            logger.error(f"Ошибка создания встреч серии {series_id}: {e}")
+            return []
+
+    async def stop_meet_series(self, series_id: int, user_id: int):
+        series = self.series.get(series_id)
+        if not series or series['user_id'] != user_id:
+            return False
+        series['is_active'] = False
+        return True
+
+    # Записи
+
+    def _find_overlap(self, room_id: int, user_id: int):
+        """Ищет запись или собственную встречу пользователя, пересекающуюся по времени с комнатой"""
+        room = self.rooms.get(room_id)
+        if not room or room['starts_at'] is None:
+            return None
+
+        def overlaps(other):
+            return (other['starts_at'] < room['ends_at'] and other['ends_at'] > room['starts_at']
+                    and other['is_active'] and self.meets[other['meet_id']]['is_active'])
+
+        for other_id in sorted(self.bookings_by_user.get(user_id, ())):
+            other = self.rooms[other_id]
+            if other_id != room_id and overlaps(other):
+                meet = self.meets[other['meet_id']]
+                return ('booking', meet['title'], meet['date'], other['room_number'],
+                        other['start_time'], other['end_time'])
+
+        for meet_id in sorted(self.meets_by_user.get(user_id, ())):
+            if meet_id == room['meet_id']:
+                continue
+            for other_id in self.rooms_by_meet.get(meet_id, ()):
+                other = self.rooms[other_id]
+                if overlaps(other):
+                    meet = self.meets[meet_id]
+                    return ('organizer', meet['title'], meet['date'], other['room_number'],
+                            other['start_time'], other['end_time'])
+
+        return None
+
+    def _record_fill(self, meet_id: int):
+        bucket = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:00')
+        self.fill_history[meet_id][bucket] = sum(
+            self.rooms[room_id]['current_participants'] for room_id in self.rooms_by_meet[meet_id]
+        )
+
+    def _set_counter(self, room_id: int, value: int):
+        room = self.rooms[room_id]
+        if value == room['current_participants']:
+            return
+        if value > room['current_participants']:
+            self.last_join_at[room['meet_id']] = utc_timestamp()
+        room['current_participants'] = value
+        self._record_fill(room['meet_id'])
+
+    def _add_participant(self, room_id: int, user_id: int, user_name: str):
+        self.participants[room_id][user_id] = (self._next_id('room_participants'), user_name, utc_timestamp())
+        self.bookings_by_user[user_id].add(room_id)
+        self.waitlist.get(room_id, {}).pop(user_id, None)
+        self._log_change('booking_added', self.rooms[room_id]['meet_id'], room_id, user_id)
+        self._set_counter(room_id, self.rooms[room_id]['current_participants'] + 1)
+
+    async def join_room(self, room_id: int, user_id: int, user_name: str):
+        if user_id in self.participants.get(room_id, ()):
+            return False, "Вы уже записаны в эту комнату", None
+
+        room = self.rooms.get(room_id)
+        if not room or not room['is_active'] or not self.meets[room['meet_id']]['is_active']:
+            return False, "Комната больше недоступна", None
+
+        if room['current_participants'] >= room['max_participants']:
+            return False, "В комнате нет свободных мест", None
+
+        overlap = self._find_overlap(room_id, user_id)
+        if overlap:
+            return False, overlap_message(overlap), None
+
+        self._add_participant(room_id, user_id, user_name)
+        return True, "Вы успешно записались в комнату", room['current_participants']
+
+    async def join_earliest_room(self, meet_id: int, user_id: int, user_name: str):
+        """Записывает в самую раннюю ещё не начавшуюся комнату встречи со свободным местом"""
+        now = int(time.time())
+        meet = self.meets.get(meet_id)
+        if not meet or not meet['is_active']:
+            return False, "Во всех комнатах этой встречи нет свободных мест", None
+
+        candidates = sorted(
+            (room_id for room_id in self.rooms_by_meet.get(meet_id, ())
+             if self.rooms[room_id]['starts_at'] > now and self.rooms[room_id]['is_active']
+             and self.rooms[room_id]['current_participants'] < self.rooms[room_id]['max_participants']
+             and user_id not in self.participants.get(room_id, ())),
+            key=lambda room_id: (self.rooms[room_id]['starts_at'], room_id)
+        )
+
+        # Комнаты, пересекающиеся с другими записями пользователя, пропускаем и берём следующую
+        overlap = None
+        for room_id in candidates:
+            overlap = self._find_overlap(room_id, user_id)
+            if not overlap:
+                self._add_participant(room_id, user_id, user_name)
+                return True, "Вы успешно записались в комнату", self._room_row(room_id)
+
+        if overlap:
+            return False, overlap_message(overlap), None
+        return False, "Во всех комнатах этой встречи нет свободных мест", None
+
+    async def join_waitlist(self, room_id: int, user_id: int, user_name: str):
+        if user_id in self.participants.get(room_id, ()):
+            return False, "Вы уже записаны в эту комнату"
+
+        room = self.rooms.get(room_id)
+        if not room or not room['is_active'] or not self.meets[room['meet_id']]['is_active']:
+            return False, "Комната больше недоступна"
+        if room['current_participants'] < room['max_participants']:
+            success, message, _ = await self.join_room(room_id, user_id, user_name)
+            return success, message
+
+        queue = self.waitlist[room_id]
+        if user_id not in queue:
+            queue[user_id] = (self._next_id('room_waitlist'), user_name)
+
+        position = list(queue).index(user_id) + 1
+        return True, f"Вы в листе ожидания, ваша позиция: {position}"
+
+    async def leave_room(self, room_id: int, user_id: int):
+        """Отменяет запись и сразу переводит в комнату первого из листа ожидания"""
+        if user_id not in self.participants.get(room_id, ()):
+            return False, "Вы не записаны в эту комнату", None
+
+        del self.participants[room_id][user_id]
+        self.bookings_by_user[user_id].discard(room_id)
+        room = self.rooms[room_id]
+        self._log_change('booking_removed', room['meet_id'], room_id, user_id)
+        self._set_counter(room_id, max(room['current_participants'] - 1, 0))
+
+        # Пропускаем тех, у кого за это время появилась пересекающаяся запись
+        promoted = None
+        if room['is_active'] and room['current_participants'] < room['max_participants']:
+            for candidate_id, (_, candidate_name) in list(self.waitlist.get(room_id, {}).items()):
+                if not self._find_overlap(room_id, candidate_id):
+                    self._add_participant(room_id, candidate_id, candidate_name)
+                    promoted = (candidate_id, candidate_name)
+                    break
+
+        if promoted:
+            logger.info(f"Пользователь {promoted[0]} переведен из листа ожидания в комнату {room_id}")
+        return True, "Запись отменена", promoted
+
+    async def get_user_bookings(self, user_id: int, since: int = None):
+        bookings = []
+        for room_id in self.bookings_by_user.get(user_id, ()):
+            room = self.rooms[room_id]
+            meet = self.meets[room['meet_id']]
+            if not (room['is_active'] and meet['is_active']):
+                continue
+            if since is not None and (room['starts_at'] is None or room['starts_at'] < since):
+                continue
+            participant_id, _, joined_at = self.participants[room_id][user_id]
+            bookings.append((room['starts_at'] or 0, room_id, (
+                room['meet_id'], meet['title'], meet['date'], meet['start_time'],
+                room['room_number'], room['start_time'], room['end_time'], joined_at, room_id
+            )))
+
+        bookings.sort(key=lambda booking: booking[:2])
+        return [booking[2] for booking in bookings]
+
+    async def get_archived_bookings(self, user_id: int, limit: int = 20):
+        bookings = []
+        for (room_id, participant_user_id), (_, _, joined_at) in self.archive['participants'].items():
+            if participant_user_id != user_id:
+                continue
+            room = self.archive['rooms'][room_id]
+            meet = self.archive['meets'][room['meet_id']]
+            bookings.append((room['starts_at'], (
+                room['meet_id'], meet['title'], meet['date'], meet['start_time'],
+                room['room_number'], room['start_time'], room['end_time'], joined_at, meet['is_active']
+            )))
+
+        bookings.sort(key=lambda booking: booking[0], reverse=True)
+        return [booking[1] for booking in bookings[:limit]]
+
+    async def get_room_participants(self, room_id: int):
+        return [(user_name, joined_at) for _, user_name, joined_at in self.participants.get(room_id, {}).values()]
+
+    async def get_room_participant_ids(self, room_id: int):
+        return list(self.participants.get(room_id, ()))
+
+    async def get_room_participants_with_creator(self, room_id: int):
+        recipients = set(self.participants.get(room_id, ()))
+        room = self.rooms.get(room_id)
+        if room:
+            recipients.add(self.meets[room['meet_id']]['user_id'])
+        return list(recipients)
+
+    def iter_meet_export_rows(self, meet_id: int, batch_size: int = 500):
+        """Построчно отдает комнаты и участников встречи"""
+        # Генератор читают из потока выгрузки, поэтому словари копируются целиком (list() не отпускает GIL)
+        for room_id in self._active_room_ids(meet_id):
+            room = self.rooms[room_id]
+            head = (room['room_number'], room['start_time'], room['end_time'],
+                    room['max_participants'], room['current_participants'])
+            participants = list(self.participants.get(room_id, {}).items())
+            if not participants:
+                yield head + (None, None, None)
+            for user_id, (_, user_name, joined_at) in participants:
+                yield head + (user_id, user_name, joined_at)
+
+    # Статистика
+
+    def _meet_stats(self, meet_id: int):
+        room_ids = self.rooms_by_meet.get(meet_id)
+        if not room_ids:
+            return None
+        rooms = [self.rooms[room_id] for room_id in room_ids]
+        return (
+            sum(room['max_participants'] for room in rooms),
+            sum(room['current_participants'] for room in rooms),
+            len(rooms),
+            sum(room['current_participants'] >= room['max_participants'] for room in rooms),
+            self.last_join_at.get(meet_id)
+        )
+
+    async def get_meet_stats(self, meet_id: int):
+        return self._meet_stats(meet_id)
+
+    async def get_organizer_stats(self, user_id: int):
+        stats = []
+        for meet in await self.get_user_meets(user_id):
+            meet_stats = self._meet_stats(meet[0])
+            if meet_stats:
+                stats.append(meet[:3] + meet_stats)
+        return stats
+
+    async def get_meet_fill_history(self, meet_id: int, limit: int = 24):
+        """Последние limit часовых отметок заполненности встречи, от старых к новым"""
+        return sorted(self.fill_history.get(meet_id, {}).items())[-limit:] if limit > 0 else []
+
+    # Уведомления
+
+    async def get_rooms_on_date(self, date: str):
+        rooms = []
+        for meet_id in sorted(self.meets_by_date.get(date, ())):
+            meet = self.meets[meet_id]
+            if not meet['is_active']:
+                continue
+            for room_id in self.rooms_by_meet.get(meet_id, ()):
+                room = self.rooms[room_id]
+                if room['is_active']:
+                    rooms.append((room_id, room['room_number'], room['start_time'], room['end_time'],
+                                  meet_id, meet['title'], meet['date'], meet['description'], meet['user_id']))
+        return rooms
+
+    async def get_tomorrow_rooms(self):
+        return await self.get_rooms_on_date((datetime.now() + timedelta(days=1)).strftime('%d-%m-%Y'))
+
+    async def get_upcoming_rooms(self, minutes: int = 30):
+        now = datetime.now()
+        rooms = (await self.get_rooms_on_date(now.strftime('%d-%m-%Y'))
+                 + await self.get_rooms_on_date((now + timedelta(days=1)).strftime('%d-%m-%Y')))
+
+        upcoming_rooms = []
+        for room in rooms:
+            try:
+                room_datetime = datetime.strptime(f"{room[6]} {room[2]}", '%d-%m-%Y %H:%M')
+            except ValueError as e:
+                logger.error(f"Ошибка парсинга даты комнаты {room[0]}: {e}")
+                continue
+            if 0 <= (room_datetime - now).total_seconds() / 60 <= minutes:
+                upcoming_rooms.append(room)
+        return upcoming_rooms
+
+    async def is_notification_sent(self, room_id: int, notification_type: str):
+        return (room_id, notification_type) in self.sent_notifications
+
+    async def mark_notification_sent(self, room_id: int, notification_type: str):
+        self.sent_notifications.add((room_id, notification_type))
+        return True
+
+    async def cleanup_old_notifications(self, batch_size: int = 5000):
+        """Удаляет до batch_size отметок об уведомлениях для прошедших или отмененных комнат"""
+        threshold = int(time.time()) - 86400
+        stale = []
+        for key in self.sent_notifications:
+            room = self.rooms.get(key[0])
+            if room and (room['ends_at'] < threshold or not room['is_active']
+                         or not self.meets[room['meet_id']]['is_active']):
+                stale.append(key)
+                if len(stale) >= batch_size:
+                    break
+
+        self.sent_notifications.difference_update(stale)
+        if stale:
+            logger.info(f"Очищено {len(stale)} старых уведомлений")
+        return len(stale)
+
+    async def requeue_notifications(self, starts_from: int, starts_to: int, notification_type: str = None,
+                                    batch_size: int = 5000):
+        """Снимает до batch_size отметок об отправке для комнат, начинающихся в [starts_from, starts_to)"""
+        requeued = []
+        for key in self.sent_notifications:
+            room = self.rooms.get(key[0])
+            if (room and starts_from <= room['starts_at'] < starts_to
+                    and (notification_type is None or key[1] == notification_type)):
+                requeued.append(key)
+                if len(requeued) >= batch_size:
+                    break
+
+        self.sent_notifications.difference_update(requeued)
+        return len(requeued)
+
+    # Кэш медиа и аренды
+
+    async def get_media_file_id(self, content_hash: str):
+        return self.media_cache.get(content_hash)
+
+    async def save_media_file_id(self, content_hash: str, file_id: str):
+        self.media_cache[content_hash] = file_id
+        return True
+
+    async def delete_media_file_id(self, content_hash: str):
+        self.media_cache.pop(content_hash, None)
+        return True
+
+    async def acquire_lease(self, name: str, holder: str, ttl: float):
+        """Захватывает или продлевает аренду, если она свободна, истекла или уже принадлежит holder"""
+        now = time.time()
+        lease = self.leases.get(name)
+        if lease and lease[0] != holder and lease[1] >= now:
+            return False
+        self.leases[name] = (holder, now + ttl)
+        return True
+
+    async def release_lease(self, name: str, holder: str):
+        if self.leases.get(name, (None,))[0] == holder:
+            del self.leases[name]
+        return True
+
+    # Обслуживание
+
+    async def deactivate_user_meets(self, user_id: int, batch_size: int = 500):
+        """Отменяет до batch_size активных встреч пользователя и останавливает его серии"""
+        for series in self.series.values():
+            if series['user_id'] == user_id:
+                series['is_active'] = False
+
+        meet_ids = sorted(meet_id for meet_id in self.meets_by_user.get(user_id, ()) if self.meets[meet_id]['is_active'])
+        for meet_id in meet_ids[:batch_size]:
+            self._set_meet_active(meet_id, False)
+        return len(meet_ids[:batch_size])
+
+    def _drop_meet(self, meet_id: int):
+        if self.meets[meet_id]['is_active']:
+            self._unindex_search(meet_id)
+        meet = self.meets.pop(meet_id)
+        self.meets_by_user[meet['user_id']].discard(meet_id)
+        self.meets_by_date[meet['date']].discard(meet_id)
+        self.meets_by_series_date.pop((meet['series_id'], meet['date']), None)
+        self.last_join_at.pop(meet_id, None)
+        self.fill_history.pop(meet_id, None)
+
+        for room_id in self.rooms_by_meet.pop(meet_id, []):
+            for user_id in self.participants.pop(room_id, {}):
+                self.bookings_by_user[user_id].discard(room_id)
+                self._log_change('booking_removed', meet_id, room_id, user_id)
+            self.waitlist.pop(room_id, None)
+            self.sent_notifications.difference_update({(room_id, '30min'), (room_id, 'tomorrow')})
+            del self.rooms[room_id]
+        self._log_change('meet_archived', meet_id, user_id=meet['user_id'])
+
+    async def archive_meets(self, older_than_days: int, batch_size: int = 200):
+        """Переносит до batch_size прошедших или отмененных встреч с комнатами и участниками в архив"""
+        try:
+            threshold = datetime.now().date() - timedelta(days=older_than_days)
+            batch = []
+            for meet_id, meet in self.meets.items():
+                if not meet['is_active'] or meet_day(meet['date']) < threshold:
+                    batch.append(meet_id)
+                    if len(batch) >= batch_size:
+                        break
+
+            for meet_id in batch:
+                self.archive['meets'][meet_id] = dict(self.meets[meet_id], archived_at=utc_timestamp())
+                for room_id in self.rooms_by_meet.get(meet_id, ()):
+                    self.archive['rooms'][room_id] = dict(self.rooms[room_id])
+                    for user_id, participant in self.participants.get(room_id, {}).items():
+                        self.archive['participants'][(room_id, user_id)] = participant
+                self._drop_meet(meet_id)
+
+            if batch:
+                logger.info(f"В архив перенесено {len(batch)} встреч")
+            return len(batch)
+
+        except Exception as e:
+            logger.error(f"Ошибка архивации встреч: {e}")
+            return 0
+
+    async def get_id_bounds(self):
+        return {
+            'meets': (min(self.meets, default=0), max(self.meets, default=0)),
+            'rooms': (min(self.rooms, default=0), max(self.rooms, default=0))
+        }
+
+    async def reconcile_room_counters(self, after_id: int, batch_size: int = 1000, dry_run: bool = False):
+        """Сверяет current_participants комнат с id в (after_id, after_id + batch_size], с dry_run только находит"""
+        drift = []
+        for room_id in range(after_id + 1, after_id + batch_size + 1):
+            if room_id in self.rooms:
+                count = len(self.participants.get(room_id, ()))
+                if self.rooms[room_id]['current_participants'] != count:
+                    drift.append((room_id, self.rooms[room_id]['current_participants'], count))
+                    if not dry_run:
+                        self._set_counter(room_id, count)
+        return drift
+
+    async def reconcile_meet_stats(self, after_id: int, batch_size: int = 1000):
+        # Статистика считается по комнатам при каждом запросе, расходиться ей не с чем
+        return 0
+
+    async def get_change_cursor(self):
+        return self.changes[-1][0] if self.changes else 0
+
+    async def get_changes(self, after, limit: int = 500):
+        after = after or 0
+        # seq в журнале идут подряд, очистка удаляет только начало
+        start = max(0, after - self.changes[0][0] + 1) if self.changes else 0
+        changes = self.changes[start:start + limit]
+        return changes, changes[-1][0] if changes else after
+
+    def get_data_version(self):
+        # Версией служит последний seq: в памяти другие процессы ничего не меняют
+        return self.changes[-1][0] if self.changes else 0
+
+    async def cleanup_changes(self, older_than_hours: int = 24, batch_size: int = 5000):
+        threshold = (datetime.now(timezone.utc) - timedelta(hours=older_than_hours)).strftime('%Y-%m-%d %H:%M:%S')
+        expired = 0
+        while expired < min(batch_size, len(self.changes)) and self.changes[expired][5] < threshold:
+            expired += 1
+        del self.changes[:expired]
+        return expired
+
+    async def analyze(self):
+        return True
+
+    async def vacuum(self):
+        return True
+
+    async def optimize(self):
+        return True
+
+    async def incremental_vacuum(self, pages: int = 0):
+        return True
+
+    async def get_storage_info(self):
+        return None
+
+    async def record_maintenance_run(self, task: str, duration_ms: float, details: str = None):
+        self.maintenance_runs.append((task, utc_timestamp(), duration_ms, details))
+
+    async def wal_checkpoint(self, mode: str = 'TRUNCATE'):
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Неизвестный режим checkpoint: {mode}")
+        return 0, 0, 0
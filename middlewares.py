@@ -0,0 +1,63 @@
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from cache import LRUCache
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних update_id помнить: повторная доставка приходит в пределах минут
+SEEN_UPDATES = 10000
+# Апдейты, которые меняют состояние FSM пользователя; inline-запросы в очередь не ставим,
+# иначе каждая новая буква ждала бы ответа на предыдущую
+LANE_EVENT_TYPES = {'message', 'callback_query'}
+
+class UpdateDedupMiddleware(BaseMiddleware):
+    """Пропускает повторно доставленные апдейты с уже обработанным или обрабатываемым update_id"""
+
+    def __init__(self, maxsize: int = SEEN_UPDATES):
+        self._seen = LRUCache(maxsize=maxsize)
+        self.dropped = 0
+
+    async def __call__(self, handler, event: Update, data: dict):
+        if self._seen.get(event.update_id):
+            self.dropped += 1
+            logger.info(f"Повторный апдейт {event.update_id} пропущен")
+            return None
+
+        self._seen.set(event.update_id, True)
+        try:
+            return await handler(event, data)
+        except Exception:
+            # Апдейт не обработан: повтор от Telegram должен пройти
+            self._seen.pop(event.update_id)
+            raise
+
+class UserLaneMiddleware(BaseMiddleware):
+    """Апдейты одного пользователя обрабатываются строго по очереди, разных пользователей - параллельно"""
+
+    def __init__(self):
+        # user_id -> [замок, сколько апдейтов его держат или ждут]; запись удаляется, когда ждущих не осталось
+        self._lanes = {}
+
+    def __len__(self):
+        return len(self._lanes)
+
+    async def __call__(self, handler, event: Update, data: dict):
+        user = data.get('event_from_user')
+        if user is None or event.event_type not in LANE_EVENT_TYPES:
+            return await handler(event, data)
+
+        lane = self._lanes.setdefault(user.id, [asyncio.Lock(), 0])
+        lane[1] += 1
+        try:
+            async with lane[0]:
+                # FSM-middleware Dispatcher стоит раньше и прочитал состояние до очереди:
+                # перечитываем, иначе апдейт увидит шаг, который уже прошел предыдущий апдейт
+                if 'state' in data:
+                    data['raw_state'] = await data['state'].get_state()
+                return await handler(event, data)
+        finally:
+            lane[1] -= 1
+            if not lane[1]:
+                del self._lanes[user.id]
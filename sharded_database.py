@@ -0,0 +1,549 @@
+"""
+Экспериментальное шардированное SQLite-хранилище: встречи вместе с комнатами, участниками и уведомлениями
+раскладываются по нескольким файлам, у каждого файла свой поток записи, поэтому записи
+во встречи разных шардов фиксируются параллельно.
+
+Шард i выдает id встреч, комнат и серий из диапазона (i * SHARD_ID_SPAN, (i + 1) * SHARD_ID_SPAN],
+так что шард определяется по самому id. Шард 0 - основной файл meetsburg.db: в нем остаются данные,
+созданные до шардирования, и общие таблицы (аренды, кэш медиа, журнал обслуживания).
+Маленький глобальный индекс (meetsburg_index.db) хранит, в каких шардах у пользователя есть
+встречи или записи, чтобы "Мои встречи" и "Мои записи" опрашивали только их.
+
+Пересечения между шардами проверяются по занятым интервалам из других шардов и только в пределах
+процесса строго: одновременные записи одного пользователя в разные шарды из разных процессов могут обе пройти.
+
+На одном диске шарды пока медленнее одного файла (benchmarks/sharded_bench.py): каждая запись
+дополнительно обращается к индексу и другим шардам. По умолчанию режим выключен.
+"""
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import os
+
+from cache import LRUCache
+from database import Database, SQLiteFile, writes
+from storage import room_epochs
+
+logger = logging.getLogger(__name__)
+
+SHARD_ID_SPAN = 10 ** 9
+# Сколько первых в листе ожидания готовить к переводу при отмене записи
+PROMOTION_CANDIDATES = 10
+
+
+def load_shard_count(config_path='conf.json'):
+    """Количество шардов из conf.json ("shards", экспериментально), по умолчанию один файл без шардирования"""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as file:
+            return max(1, int(json.load(file).get('shards', 1)))
+    except FileNotFoundError:
+        return 1
+    except Exception as e:
+        logger.error(f"Ошибка чтения количества шардов из {config_path}: {e}")
+        return 1
+
+
+def shard_path(db_path: str, index: int):
+    if index == 0:
+        return db_path
+    stem, ext = os.path.splitext(db_path)
+    return f"{stem}_shard{index}{ext}"
+
+
+class ShardIndex(SQLiteFile):
+    """Глобальный индекс: в каких шардах у пользователя есть встречи или записи"""
+
+    def __init__(self, db_path: str, profile=None, home: Database = None):
+        super().__init__(db_path, profile)
+        self.init_index(home)
+
+    def init_index(self, home: Database = None):
+        try:
+            conn = self.connect(writer=True)
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'user_shards'")
+            created = cursor.fetchone() is None
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_shards (
+                    user_id INTEGER NOT NULL,
+                    shard INTEGER NOT NULL,
+                    PRIMARY KEY (user_id, shard)
+                ) WITHOUT ROWID
+            ''')
+            conn.commit()
+
+            # При включении шардирования пользователи с данными в основном файле переносятся в индекс один раз
+            if created and home:
+                self._index_home(cursor, home)
+                conn.commit()
+
+            conn.close()
+            logger.info("Индекс шардов инициализирован")
+
+        except Exception as e:
+            logger.error(f"Ошибка инициализации индекса шардов: {e}")
+
+    def _index_home(self, cursor, home: Database):
+        sources = [(home.db_path, 'home')]
+        if os.path.exists(home.archive_path):
+            sources.append((home.archive_path, 'home_archive'))
+
+        for path, alias in sources:
+            cursor.execute("ATTACH DATABASE ? AS " + alias, (path,))
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO user_shards (user_id, shard)
+                SELECT user_id, 0 FROM {alias}.meets
+                UNION SELECT user_id, 0 FROM {alias}.room_participants
+            ''')
+            cursor.connection.commit()
+            cursor.execute("DETACH DATABASE " + alias)
+            logger.info(f"В индекс шардов добавлены пользователи из {path}")
+
+    async def get_user_shards(self, user_id: int):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT shard FROM user_shards WHERE user_id = ?", (user_id,))
+
+            shards = {row[0] for row in cursor.fetchall()}
+            conn.close()
+            return shards
+
+        except Exception as e:
+            logger.error(f"Ошибка получения шардов пользователя {user_id}: {e}")
+            return set()
+
+    @writes
+    async def add_user_shard(self, user_id: int, shard: int):
+        try:
+            conn = self.get_connection_with_retry()
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                INSERT OR IGNORE INTO user_shards (user_id, shard) VALUES (?, ?)
+            ''', (user_id, shard))
+
+            conn.commit()
+            conn.close()
+            return True
+
+        except Exception as e:
+            logger.error(f"Ошибка записи шарда {shard} пользователя {user_id}: {e}")
+            return False
+
+
+class ShardedDatabase:
+    def __init__(self, shards: int, db_path='meetsburg.db', profile=None, home: Database = None):
+        if shards < 1:
+            raise ValueError(f"Количество шардов должно быть положительным: {shards}")
+
+        # Основной файл можно передать уже открытым, чтобы не держать на нем второй поток записи
+        self.shards = [home or Database(db_path, profile=profile)] + [
+            Database(shard_path(db_path, index), profile=profile, id_base=index * SHARD_ID_SPAN)
+            for index in range(1, shards)
+        ]
+        stem, ext = os.path.splitext(db_path)
+        self.index = ShardIndex(f"{stem}_index{ext}", profile, home=self.shards[0])
+        self.archive_path = ", ".join(shard.archive_path for shard in self.shards)
+        # Новые встречи раскладываются по шардам по кругу
+        self._placement = itertools.count()
+        # Пары (пользователь, шард), уже записанные в индекс: индекс только дополняется, повторная запись не нужна
+        self._registered = LRUCache(maxsize=65536)
+        # user_id -> [замок, сколько записей его держат или ждут]: записи одного пользователя в разные шарды
+        # идут по очереди, иначе обе проверили бы пересечения по снимку без другой записи. Только в этом процессе
+        self._user_locks = {}
+        logger.warning(f"⚠️ Хранилище разбито на {shards} шардов: режим экспериментальный, "
+                       f"на одном диске он медленнее одного файла (см. benchmarks/sharded_bench.py)")
+
+    @property
+    def home(self):
+        return self.shards[0]
+
+    def shard_number(self, entity_id: int):
+        """Номер шарда по id встречи, комнаты или серии, None для id вне всех шардов"""
+        number = (entity_id - 1) // SHARD_ID_SPAN if entity_id and entity_id > 0 else -1
+        return number if 0 <= number < len(self.shards) else None
+
+    def shard_for(self, entity_id: int):
+        number = self.shard_number(entity_id)
+        return self.shards[number] if number is not None else None
+
+    def _next_shard(self):
+        return next(self._placement) % len(self.shards)
+
+    async def _register(self, user_id: int, number: int):
+        """Записывает шард в индекс пользователя. Вызывается до записи в сам шард: лишняя строка индекса
+        стоит одного запроса к шарду, а недостающая прячет встречу или запись от "Моих встреч" и проверки пересечений"""
+        if self._registered.get((user_id, number)):
+            return True
+        if not await self.index.add_user_shard(user_id, number):
+            return False
+        self._registered.set((user_id, number), True)
+        return True
+
+    @contextlib.asynccontextmanager
+    async def _user_lock(self, user_id: int):
+        lock = self._user_locks.setdefault(user_id, [asyncio.Lock(), 0])
+        lock[1] += 1
+        try:
+            async with lock[0]:
+                yield
+        finally:
+            lock[1] -= 1
+            if not lock[1]:
+                del self._user_locks[user_id]
+
+    async def _user_shards(self, user_id: int):
+        """Номера шардов со встречами или записями пользователя"""
+        return sorted(await self.index.get_user_shards(user_id))
+
+    async def _gather(self, shards, name: str, *args):
+        return await asyncio.gather(*(getattr(shard, name)(*args) for shard in shards))
+
+    async def _foreign_busy(self, user_id: int, number: int):
+        """Занятые интервалы пользователя во всех его шардах, кроме шарда number"""
+        others = [self.shards[other] for other in await self._user_shards(user_id) if other != number]
+        windows = await self._gather(others, 'get_busy_windows', user_id)
+        return [window for shard_windows in windows for window in shard_windows]
+
+    # Встречи и комнаты
+
+    async def add_meet_with_rooms(self, user_id: int, title: str, date: str, description: str,
+                                  start_time: str, rooms_data: list, max_participants: int = 1, password: str = None):
+        number = self._next_shard()
+        if not await self._register(user_id, number):
+            return None, False
+        return await self.shards[number].add_meet_with_rooms(
+            user_id, title, date, description, start_time, rooms_data, max_participants, password
+        )
+
+    async def add_meet(self, user_id: int, title: str, date: str, description: str, start_time: str, password: str = None):
+        number = self._next_shard()
+        if not await self._register(user_id, number):
+            return None
+        return await self.shards[number].add_meet(user_id, title, date, description, start_time, password)
+
+    async def add_rooms(self, meet_id: int, rooms_data: list, max_participants: int = 1):
+        shard = self.shard_for(meet_id)
+        return await shard.add_rooms(meet_id, rooms_data, max_participants) if shard else False
+
+    async def get_user_meets(self, user_id: int):
+        shards = [self.shards[number] for number in await self._user_shards(user_id)]
+        meets = [meet for shard_meets in await self._gather(shards, 'get_user_meets', user_id) for meet in shard_meets]
+        return sorted(meets, key=lambda meet: meet[6] or '', reverse=True)
+
+    async def get_meet_by_id(self, meet_id: int):
+        shard = self.shard_for(meet_id)
+        return await shard.get_meet_by_id(meet_id) if shard else None
+
+    async def get_meet_rooms(self, meet_id: int):
+        shard = self.shard_for(meet_id)
+        return await shard.get_meet_rooms(meet_id) if shard else []
+
+    async def get_meet_access(self, meet_id: int):
+        shard = self.shard_for(meet_id)
+        return await shard.get_meet_access(meet_id) if shard else None
+
+    async def is_meet_active(self, meet_id: int):
+        shard = self.shard_for(meet_id)
+        return await shard.is_meet_active(meet_id) if shard else False
+
+    async def delete_meet(self, meet_id: int, user_id: int):
+        shard = self.shard_for(meet_id)
+        return await shard.delete_meet(meet_id, user_id) if shard else False
+
+    async def search_meets(self, query: str, limit: int = 10, offset: int = 0):
+        # bm25 разных файлов несравним, поэтому результаты шардов чередуются по месту в их выдаче
+        results = await self._gather(self.shards, 'search_meets', query, offset + limit, 0)
+        merged = [
+            meet for rank in itertools.zip_longest(*results)
+            for meet in rank if meet is not None
+        ]
+        return merged[offset:offset + limit]
+
+    async def get_meets_by_date(self, date: str):
+        return [meet for meets in await self._gather(self.shards, 'get_meets_by_date', date) for meet in meets]
+
+    async def get_upcoming_meets(self, target_datetime: str):
+        return [meet for meets in await self._gather(self.shards, 'get_upcoming_meets', target_datetime) for meet in meets]
+
+    # Серии встреч
+
+    async def add_meet_series(self, user_id: int, title: str, date: str, description: str, start_time: str,
+                              rooms_data: list, rooms_count: int, room_duration: int, max_participants: int = 1,
+                              password: str = None, frequency: str = 'weekly', interval: int = 1, until: str = None):
+        # Все встречи серии создаются в шарде серии
+        number = self._next_shard()
+        if not await self._register(user_id, number):
+            return None, None
+        return await self.shards[number].add_meet_series(
+            user_id, title, date, description, start_time, rooms_data, rooms_count, room_duration,
+            max_participants, password, frequency, interval, until
+        )
+
+    async def get_series_to_materialize(self, horizon: str):
+        return [series for shard_series in await self._gather(self.shards, 'get_series_to_materialize', horizon)
+                for series in shard_series]
+
+    async def materialize_series(self, series_id: int, occurrences: list, materialized_until: str):
+        shard = self.shard_for(series_id)
+        return await shard.materialize_series(series_id, occurrences, materialized_until) if shard else []
+
+    async def stop_meet_series(self, series_id: int, user_id: int):
+        shard = self.shard_for(series_id)
+        return await shard.stop_meet_series(series_id, user_id) if shard else False
+
+    # Записи
+
+    async def join_room(self, room_id: int, user_id: int, user_name: str):
+        number = self.shard_number(room_id)
+        if number is None:
+            return False, "Произошла ошибка при записи", None
+
+        if not await self._register(user_id, number):
+            return False, "Произошла ошибка при записи", None
+
+        async with self._user_lock(user_id):
+            # Пересечения внутри шарда проверяет сам шард, из остальных шардов ему передаются занятые интервалы
+            busy = await self._foreign_busy(user_id, number)
+            return await self.shards[number].join_room(room_id, user_id, user_name, busy)
+
+    async def join_earliest_room(self, meet_id: int, user_id: int, user_name: str):
+        number = self.shard_number(meet_id)
+        if number is None:
+            return False, "Во всех комнатах этой встречи нет свободных мест", None
+
+        if not await self._register(user_id, number):
+            return False, "Произошла ошибка при записи", None
+
+        async with self._user_lock(user_id):
+            busy = await self._foreign_busy(user_id, number)
+            return await self.shards[number].join_earliest_room(meet_id, user_id, user_name, busy)
+
+    async def join_waitlist(self, room_id: int, user_id: int, user_name: str):
+        number = self.shard_number(room_id)
+        if number is None or not await self._register(user_id, number):
+            return False, "Произошла ошибка при записи в лист ожидания"
+
+        # Если место освободилось, шард сразу записывает в комнату, поэтому нужны интервалы из других шардов
+        async with self._user_lock(user_id):
+            busy = await self._foreign_busy(user_id, number)
+            return await self.shards[number].join_waitlist(room_id, user_id, user_name, busy)
+
+    async def leave_room(self, room_id: int, user_id: int):
+        number = self.shard_number(room_id)
+        if number is None:
+            return False, "Вы не записаны в эту комнату", None
+
+        # Кандидатов из листа ожидания готовим до транзакции шарда: внутри нее поток записи шарда
+        # не должен ждать индекс и другие шарды. Не попавший в индекс кандидат не переводится
+        shard = self.shards[number]
+        candidates = {}
+        for candidate_id in await shard.get_waitlist_user_ids(room_id, PROMOTION_CANDIDATES):
+            if not await self._register(candidate_id, number):
+                break
+            candidates[candidate_id] = await self._foreign_busy(candidate_id, number)
+
+        return await shard.leave_room(room_id, user_id, candidates)
+
+    async def get_user_bookings(self, user_id: int, since: int = None):
+        shards = [self.shards[number] for number in await self._user_shards(user_id)]
+        bookings = [booking for shard_bookings in await self._gather(shards, 'get_user_bookings', user_id, since)
+                    for booking in shard_bookings]
+
+        def starts(booking):
+            _, _, date, meet_start_time, _, start_time, end_time, _, room_id = booking
+            try:
+                return room_epochs(date, meet_start_time, start_time, end_time)[0], room_id
+            except ValueError:
+                # Как в user_bookings: комнаты без рассчитанного времени идут первыми
+                return 0, room_id
+
+        return sorted(bookings, key=starts)
+
+    async def get_archived_bookings(self, user_id: int, limit: int = 20):
+        shards = [self.shards[number] for number in await self._user_shards(user_id)]
+        bookings = [booking for shard_bookings in await self._gather(shards, 'get_archived_bookings', user_id, limit)
+                    for booking in shard_bookings]
+
+        def starts(booking):
+            _, _, date, meet_start_time, _, start_time, end_time, _, _ = booking
+            try:
+                # Как r.starts_at в шарде: комната после полуночи идет позже встречи того же дня
+                return room_epochs(date, meet_start_time, start_time, end_time)[0]
+            except ValueError:
+                # starts_at IS NULL при ORDER BY ... DESC идет последним
+                return 0
+
+        return sorted(bookings, key=starts, reverse=True)[:limit]
+
+    async def get_room_participants(self, room_id: int):
+        shard = self.shard_for(room_id)
+        return await shard.get_room_participants(room_id) if shard else []
+
+    async def get_room_participant_ids(self, room_id: int):
+        shard = self.shard_for(room_id)
+        return await shard.get_room_participant_ids(room_id) if shard else []
+
+    async def get_room_participants_with_creator(self, room_id: int):
+        shard = self.shard_for(room_id)
+        return await shard.get_room_participants_with_creator(room_id) if shard else []
+
+    def iter_meet_export_rows(self, meet_id: int, batch_size: int = 500):
+        shard = self.shard_for(meet_id)
+        if shard:
+            yield from shard.iter_meet_export_rows(meet_id, batch_size)
+
+    # Статистика
+
+    async def get_meet_stats(self, meet_id: int):
+        shard = self.shard_for(meet_id)
+        return await shard.get_meet_stats(meet_id) if shard else None
+
+    async def get_organizer_stats(self, user_id: int):
+        shards = [self.shards[number] for number in await self._user_shards(user_id)]
+        stats = [meet for shard_stats in await self._gather(shards, 'get_organizer_stats', user_id)
+                 for meet in shard_stats]
+        # Порядок как в "Моих встречах": по времени создания, которого нет в строках статистики
+        order = {meet[0]: position for position, meet in enumerate(await self.get_user_meets(user_id))}
+        return sorted(stats, key=lambda meet: order.get(meet[0], len(order)))
+
+    async def get_meet_fill_history(self, meet_id: int, limit: int = 24):
+        shard = self.shard_for(meet_id)
+        return await shard.get_meet_fill_history(meet_id, limit) if shard else []
+
+    # Уведомления
+
+    async def get_rooms_on_date(self, date: str):
+        return [room for rooms in await self._gather(self.shards, 'get_rooms_on_date', date) for room in rooms]
+
+    async def get_tomorrow_rooms(self):
+        return [room for rooms in await self._gather(self.shards, 'get_tomorrow_rooms') for room in rooms]
+
+    async def get_upcoming_rooms(self, minutes: int = 30):
+        return [room for rooms in await self._gather(self.shards, 'get_upcoming_rooms', minutes) for room in rooms]
+
+    async def is_notification_sent(self, room_id: int, notification_type: str):
+        shard = self.shard_for(room_id)
+        return await shard.is_notification_sent(room_id, notification_type) if shard else False
+
+    async def mark_notification_sent(self, room_id: int, notification_type: str):
+        shard = self.shard_for(room_id)
+        return await shard.mark_notification_sent(room_id, notification_type) if shard else False
+
+    async def cleanup_old_notifications(self, batch_size: int = 5000):
+        return sum(await self._gather(self.shards, 'cleanup_old_notifications', batch_size))
+
+    async def requeue_notifications(self, starts_from: int, starts_to: int, notification_type: str = None,
+                                    batch_size: int = 5000):
+        return sum(await self._gather(self.shards, 'requeue_notifications', starts_from, starts_to,
+                                      notification_type, batch_size))
+
+    # Кэш медиа и аренды живут в основном шарде
+
+    async def get_media_file_id(self, content_hash: str):
+        return await self.home.get_media_file_id(content_hash)
+
+    async def save_media_file_id(self, content_hash: str, file_id: str):
+        return await self.home.save_media_file_id(content_hash, file_id)
+
+    async def delete_media_file_id(self, content_hash: str):
+        return await self.home.delete_media_file_id(content_hash)
+
+    async def acquire_lease(self, name: str, holder: str, ttl: float):
+        return await self.home.acquire_lease(name, holder, ttl)
+
+    async def release_lease(self, name: str, holder: str):
+        return await self.home.release_lease(name, holder)
+
+    # Обслуживание
+
+    async def deactivate_user_meets(self, user_id: int, batch_size: int = 500):
+        deactivated = 0
+        for number in await self._user_shards(user_id):
+            if deactivated >= batch_size:
+                break
+            deactivated += await self.shards[number].deactivate_user_meets(user_id, batch_size - deactivated)
+        return deactivated
+
+    async def archive_meets(self, older_than_days: int, batch_size: int = 200):
+        return sum(await self._gather(self.shards, 'archive_meets', older_than_days, batch_size))
+
+    async def get_id_bounds(self):
+        bounds = await self._gather(self.shards, 'get_id_bounds')
+        return {
+            table: (
+                min((shard[table][0] for shard in bounds if shard[table][0]), default=0),
+                max(shard[table][1] for shard in bounds)
+            )
+            for table in ('meets', 'rooms')
+        }
+
+    async def reconcile_room_counters(self, after_id: int, batch_size: int = 1000, dry_run: bool = False):
+        shard = self.shard_for(after_id + 1)
+        return await shard.reconcile_room_counters(after_id, batch_size, dry_run) if shard else []
+
+    async def reconcile_meet_stats(self, after_id: int, batch_size: int = 1000):
+        shard = self.shard_for(after_id + 1)
+        return await shard.reconcile_meet_stats(after_id, batch_size) if shard else 0
+
+    # Журнал изменений: позиция в шардированном хранилище - кортеж позиций шардов
+
+    async def get_change_cursor(self):
+        return tuple(await self._gather(self.shards, 'get_change_cursor'))
+
+    async def get_changes(self, after, limit: int = 500):
+        """Изменения всех шардов после позиции after: порядок сохраняется внутри шарда, то есть для каждой встречи"""
+        after = after or (0,) * len(self.shards)
+        results = await asyncio.gather(*(
+            shard.get_changes(position, limit) for shard, position in zip(self.shards, after)
+        ))
+        changes = [change for shard_changes, _ in results for change in shard_changes]
+        return changes, tuple(position for _, position in results)
+
+    def get_data_version(self):
+        return tuple(shard.get_data_version() for shard in self.shards)
+
+    async def cleanup_changes(self, older_than_hours: int = 24, batch_size: int = 5000):
+        return sum(await self._gather(self.shards, 'cleanup_changes', older_than_hours, batch_size))
+
+    async def analyze(self):
+        return all(await self._gather(self.shards, 'analyze'))
+
+    async def vacuum(self):
+        return all(await self._gather(self.shards, 'vacuum'))
+
+    async def optimize(self):
+        return all(await self._gather(self.shards, 'optimize'))
+
+    async def incremental_vacuum(self, pages: int = 0):
+        return all(await self._gather(self.shards, 'incremental_vacuum', pages))
+
+    async def get_storage_info(self):
+        """Сводка по шардам: обслуживание запускается по самому большому WAL и числу свободных страниц"""
+        infos = await self._gather(self.shards, 'get_storage_info')
+        if not all(infos):
+            return None
+        return {
+            'page_size': infos[0]['page_size'],
+            'freelist_pages': max(info['freelist_pages'] for info in infos),
+            'incremental_vacuum': all(info['incremental_vacuum'] for info in infos),
+            'wal_bytes': max(info['wal_bytes'] for info in infos)
+        }
+
+    async def record_maintenance_run(self, task: str, duration_ms: float, details: str = None):
+        await self.home.record_maintenance_run(task, duration_ms, details)
+
+    async def wal_checkpoint(self, mode: str = 'TRUNCATE'):
+        results = await self._gather(self.shards, 'wal_checkpoint', mode)
+        if not all(results):
+            return None
+        return (
+            max(result[0] for result in results),
+            sum(result[1] for result in results),
+            sum(result[2] for result in results)
+        )
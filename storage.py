@@ -0,0 +1,155 @@
+"""
+Интерфейс хранилища, от которого зависят обработчики и фоновые задачи.
+
+Реализации: Database (SQLite, database.py) и InMemoryDatabase (словари в памяти процесса,
+memory_database.py), ShardedDatabase (несколько SQLite-файлов, sharded_database.py).
+Бэкенд выбирается при старте через use_storage, по умолчанию - SQLite-синглтон или шарды, если они заданы в conf.json.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Protocol, Tuple
+
+
+def room_epochs(date: str, meet_start_time: str, start_time: str, end_time: str):
+    """Границы комнаты в секундах epoch. Комнаты, начинающиеся раньше старта встречи, идут после полуночи"""
+    meet_day = datetime.strptime(date, '%d-%m-%Y')
+    starts = datetime.strptime(f"{date} {start_time}", '%d-%m-%Y %H:%M')
+    if start_time < meet_start_time:
+        starts += timedelta(days=1)
+    
+    ends = datetime.combine(starts.date(), datetime.strptime(end_time, '%H:%M').time())
+    if ends <= starts:
+        ends += timedelta(days=1)
+    
+    return int(starts.timestamp()), int(ends.timestamp())
+
+
+def overlap_message(overlap):
+    kind, title, date, room_number, start_time, end_time = overlap
+    if kind == 'organizer':
+        return f"В это время вы проводите встречу «{title}» ({date}, {start_time}-{end_time})"
+    return f"Это время пересекается с вашей записью: «{title}», комната {room_number} ({date}, {start_time}-{end_time})"
+
+
+class Storage(Protocol):
+    # Встречи и комнаты
+    async def add_meet_with_rooms(self, user_id: int, title: str, date: str, description: str,
+                                  start_time: str, rooms_data: list, max_participants: int = 1,
+                                  password: str = None) -> Tuple[Optional[int], bool]: ...
+    async def add_meet(self, user_id: int, title: str, date: str, description: str, start_time: str,
+                       password: str = None) -> Optional[int]: ...
+    async def add_rooms(self, meet_id: int, rooms_data: list, max_participants: int = 1) -> bool: ...
+    async def get_user_meets(self, user_id: int) -> List[tuple]: ...
+    async def get_meet_by_id(self, meet_id: int) -> Optional[tuple]: ...
+    async def get_meet_rooms(self, meet_id: int) -> List[tuple]: ...
+    async def get_meet_access(self, meet_id: int) -> Optional[dict]: ...
+    async def is_meet_active(self, meet_id: int) -> bool: ...
+    async def delete_meet(self, meet_id: int, user_id: int) -> bool: ...
+    async def search_meets(self, query: str, limit: int = 10, offset: int = 0) -> List[tuple]: ...
+    async def get_meets_by_date(self, date: str) -> List[tuple]: ...
+    async def get_upcoming_meets(self, target_datetime: str) -> List[tuple]: ...
+
+    # Серии встреч
+    async def add_meet_series(self, user_id: int, title: str, date: str, description: str, start_time: str,
+                              rooms_data: list, rooms_count: int, room_duration: int, max_participants: int = 1,
+                              password: str = None, frequency: str = 'weekly', interval: int = 1,
+                              until: str = None) -> Tuple[Optional[int], Optional[int]]: ...
+    async def get_series_to_materialize(self, horizon: str) -> List[tuple]: ...
+    async def materialize_series(self, series_id: int, occurrences: list, materialized_until: str) -> List[int]: ...
+    async def stop_meet_series(self, series_id: int, user_id: int) -> bool: ...
+
+    # Записи
+    async def join_room(self, room_id: int, user_id: int, user_name: str) -> Tuple[bool, str, Optional[int]]: ...
+    async def join_earliest_room(self, meet_id: int, user_id: int,
+                                 user_name: str) -> Tuple[bool, str, Optional[tuple]]: ...
+    async def join_waitlist(self, room_id: int, user_id: int, user_name: str) -> Tuple[bool, str]: ...
+    async def leave_room(self, room_id: int, user_id: int) -> Tuple[bool, str, Optional[tuple]]: ...
+    async def get_user_bookings(self, user_id: int, since: Optional[int] = None) -> List[tuple]: ...
+    async def get_archived_bookings(self, user_id: int, limit: int = 20) -> List[tuple]: ...
+    async def get_room_participants(self, room_id: int) -> List[tuple]: ...
+    async def get_room_participant_ids(self, room_id: int) -> List[int]: ...
+    async def get_room_participants_with_creator(self, room_id: int) -> List[int]: ...
+    # Синхронный генератор: выгрузка читает его в потоке export_executor
+    def iter_meet_export_rows(self, meet_id: int, batch_size: int = 500) -> Iterator[tuple]: ...
+
+    # Статистика
+    async def get_meet_stats(self, meet_id: int) -> Optional[tuple]: ...
+    async def get_organizer_stats(self, user_id: int) -> List[tuple]: ...
+    async def get_meet_fill_history(self, meet_id: int, limit: int = 24) -> List[tuple]: ...
+
+    # Уведомления
+    async def get_rooms_on_date(self, date: str) -> List[tuple]: ...
+    async def get_tomorrow_rooms(self) -> List[tuple]: ...
+    async def get_upcoming_rooms(self, minutes: int = 30) -> List[tuple]: ...
+    async def is_notification_sent(self, room_id: int, notification_type: str) -> bool: ...
+    async def mark_notification_sent(self, room_id: int, notification_type: str) -> bool: ...
+    async def cleanup_old_notifications(self, batch_size: int = 5000) -> int: ...
+    async def requeue_notifications(self, starts_from: int, starts_to: int, notification_type: str = None,
+                                    batch_size: int = 5000) -> int: ...
+
+    # Журнал изменений: позиция непрозрачна для вызывающего, ее нужно только передавать обратно
+    async def get_change_cursor(self): ...
+    async def get_changes(self, after, limit: int = 500) -> Tuple[List[tuple], object]: ...
+    def get_data_version(self) -> object: ...
+    async def cleanup_changes(self, older_than_hours: int = 24, batch_size: int = 5000) -> int: ...
+
+    # Кэш медиа и аренды
+    async def get_media_file_id(self, content_hash: str) -> Optional[str]: ...
+    async def save_media_file_id(self, content_hash: str, file_id: str) -> bool: ...
+    async def delete_media_file_id(self, content_hash: str) -> bool: ...
+    async def acquire_lease(self, name: str, holder: str, ttl: float) -> bool: ...
+    async def release_lease(self, name: str, holder: str) -> bool: ...
+
+    # Обслуживание
+    async def deactivate_user_meets(self, user_id: int, batch_size: int = 500) -> int: ...
+    async def archive_meets(self, older_than_days: int, batch_size: int = 200) -> int: ...
+    async def get_id_bounds(self) -> Dict[str, Tuple[int, int]]: ...
+    async def reconcile_room_counters(self, after_id: int, batch_size: int = 1000,
+                                      dry_run: bool = False) -> List[tuple]: ...
+    async def reconcile_meet_stats(self, after_id: int, batch_size: int = 1000) -> int: ...
+    async def analyze(self) -> bool: ...
+    async def vacuum(self) -> bool: ...
+    async def optimize(self) -> bool: ...
+    async def incremental_vacuum(self, pages: int = 0) -> bool: ...
+    # None, если у бэкенда нет файла базы и обслуживать нечего
+    async def get_storage_info(self) -> Optional[dict]: ...
+    async def record_maintenance_run(self, task: str, duration_ms: float, details: str = None) -> None: ...
+    async def wal_checkpoint(self, mode: str = 'TRUNCATE') -> Optional[tuple]: ...
+
+
+def default_storage() -> Storage:
+    """SQLite-синглтон или, если в conf.json задано "shards" больше 1, шарды поверх него"""
+    from database import db as home
+    from sharded_database import ShardedDatabase, load_shard_count
+
+    shards = load_shard_count()
+    if shards > 1:
+        return ShardedDatabase(shards, home.db_path, (home.profile_name, home.profile), home=home)
+    return home
+
+
+class StorageProxy:
+    """Общий db для всех модулей: обращения переадресуются текущему бэкенду, который можно заменить при старте"""
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self) -> Storage:
+        if self._backend is None:
+            # SQLite-база открывается только при первом обращении, если бэкенд не подставили раньше
+            self._backend = default_storage()
+        return self._backend
+
+    def use(self, backend: Storage):
+        self._backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+db: Storage = StorageProxy()
+
+
+def use_storage(backend: Storage):
+    """Подставляет бэкенд хранилища для обработчиков и фоновых задач, вызывать до запуска диспетчера"""
+    db.use(backend)
@@ -0,0 +1,207 @@
+"""
+Режим супервизора: один процесс получает апдейты из Telegram и раздает их N процессам-обработчикам,
+разбивая по user_id, чтобы состояние FSM пользователя всегда жило в одном процессе.
+Фоновые задачи (уведомления и т.п.) запускает только один обработчик, выбранный через аренду в SQLite.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from contextlib import suppress
+
+from aiogram import Bot
+from aiogram.types import Update
+
+from storage import db
+from main import create_dispatcher, start_background_jobs, start_process_jobs
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LEASE = "scheduler"
+LEASE_TTL = 30
+WATCH_INTERVAL = 5
+
+def shard_for_update(update: Update, workers: int):
+    try:
+        user = getattr(update.event, "from_user", None)
+    except Exception:
+        user = None
+    return user.id % workers if user else 0
+
+async def run_scheduler_election(bot: Bot, holder: str):
+    tasks = []
+    try:
+        while True:
+            if await db.acquire_lease(SCHEDULER_LEASE, holder, LEASE_TTL):
+                if not tasks:
+                    logger.info(f"🗳 {holder} стал планировщиком")
+                    tasks = start_background_jobs(bot)
+            elif tasks:
+                logger.warning(f"🗳 {holder} потерял аренду планировщика, фоновые задачи остановлены")
+                for task in tasks:
+                    task.cancel()
+                tasks = []
+
+            await asyncio.sleep(LEASE_TTL / 3)
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await db.release_lease(SCHEDULER_LEASE, holder)
+
+async def run_worker(token: str, index: int, updates, acks, session_factory=None):
+    bot = Bot(token=token, session=session_factory()) if session_factory else Bot(token=token)
+    dp = create_dispatcher()
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    election = asyncio.create_task(run_scheduler_election(bot, holder))
+    process_tasks = start_process_jobs()
+    pending = set()
+
+    async def handle(raw: str):
+        update = Update.model_validate_json(raw, context={"bot": bot})
+        started = time.perf_counter()
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка обработки апдейта {update.update_id} в обработчике {index}: {e}")
+        acks.put((update.update_id, time.perf_counter() - started))
+
+    acks.put((None, index))
+    logger.info(f"✅ Обработчик {index} запущен (pid {os.getpid()})")
+    try:
+        while True:
+            raw = await asyncio.to_thread(updates.get)
+            if raw is None:
+                break
+            task = asyncio.create_task(handle(raw))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending)
+    finally:
+        for task in process_tasks:
+            task.cancel()
+        election.cancel()
+        with suppress(asyncio.CancelledError):
+            await election
+        await bot.session.close()
+        logger.info(f"Обработчик {index} остановлен")
+
+def worker_main(token: str, index: int, updates, acks, session_factory=None):
+    asyncio.run(run_worker(token, index, updates, acks, session_factory))
+
+class Supervisor:
+    def __init__(self, token: str, workers: int, session_factory=None):
+        self.token = token
+        self.workers = workers
+        self.session_factory = session_factory
+        self.context = multiprocessing.get_context("spawn")
+        self.update_queues = [self.context.Queue() for _ in range(workers)]
+        self.acks = self.context.Queue()
+        self.processes = [None] * workers
+        self._waiters = {}
+        self._ready_workers = set()
+        self._ready = asyncio.Event()
+        self._tasks = []
+        self._stopping = False
+
+    def _spawn(self, index: int):
+        process = self.context.Process(
+            target=worker_main,
+            args=(self.token, index, self.update_queues[index], self.acks, self.session_factory),
+            name=f"meetsburg-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+        self._tasks = [
+            asyncio.create_task(self._read_acks()),
+            asyncio.create_task(self._watch_workers())
+        ]
+        logger.info(f"✅ Супервизор запустил {self.workers} обработчиков")
+
+    async def _read_acks(self):
+        while True:
+            ack = await asyncio.to_thread(self.acks.get)
+            if ack is None:
+                break
+            update_id, value = ack
+            if update_id is None:
+                self._ready_workers.add(value)
+                if len(self._ready_workers) == self.workers:
+                    self._ready.set()
+                continue
+
+            future = self._waiters.pop(update_id, None)
+            if future and not future.done():
+                future.set_result(value)
+
+    async def _watch_workers(self):
+        while not self._stopping:
+            for index, process in enumerate(self.processes):
+                if not process.is_alive() and not self._stopping:
+                    logger.error(f"Обработчик {index} завершился с кодом {process.exitcode}, перезапуск")
+                    self._spawn(index)
+            await asyncio.sleep(WATCH_INTERVAL)
+
+    async def wait_ready(self):
+        await self._ready.wait()
+
+    def dispatch(self, update: Update):
+        shard = shard_for_update(update, self.workers)
+        self.update_queues[shard].put(update.model_dump_json(exclude_unset=True))
+
+    async def feed(self, update: Update):
+        """Отправляет апдейт обработчику и ждет окончания его обработки, возвращает время обработки"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[update.update_id] = future
+        self.dispatch(update)
+        return await future
+
+    async def poll(self, bot: Bot, allowed_updates=None, polling_timeout: int = 30):
+        offset = None
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=polling_timeout, allowed_updates=allowed_updates)
+            except Exception as e:
+                logger.error(f"Ошибка получения апдейтов: {e}")
+                await asyncio.sleep(5)
+                continue
+
+            for update in updates:
+                self.dispatch(update)
+                offset = update.update_id + 1
+
+    async def stop(self):
+        self._stopping = True
+        for queue in self.update_queues:
+            queue.put(None)
+
+        for process in self.processes:
+            await asyncio.to_thread(process.join, 10)
+            if process.is_alive():
+                process.terminate()
+
+        self.acks.put(None)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+async def run_supervisor(token: str, workers: int):
+    bot = Bot(token=token)
+    supervisor = Supervisor(token, workers)
+    supervisor.start()
+
+    try:
+        logger.info("✅ Бот запущен в режиме супервизора")
+        await supervisor.poll(bot, create_dispatcher().resolve_used_update_types())
+    finally:
+        await supervisor.stop()
+        await bot.session.close()